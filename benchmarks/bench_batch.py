@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+'''
+@File    :   bench_batch.py
+@Time    :   2024/07/11 11:27:05
+@Desc    :   批量转换接口与逐条调用 to_protobuf/from_protobuf 的吞吐对比
+'''
+
+from common import ExampleType, bench
+
+import example2_pb2
+import example_pb2
+from models.example2_model import Example2
+from protobuf_pydantic_gen.ext import models_to_protobufs, protobufs_to_models
+
+ROWS = 1000
+
+
+def per_item_to_repeated(models):
+    response = example_pb2.Example()
+    for model in models:
+        response.examples.add().CopyFrom(model.to_protobuf())
+    return response
+
+
+def batch_to_repeated(models):
+    response = example_pb2.Example()
+    models_to_protobufs(models, out=response.examples)
+    return response
+
+
+def main():
+    models = [Example2(type=ExampleType(i % 4)) for i in range(ROWS)]
+    assert per_item_to_repeated(models) == batch_to_repeated(models)
+    protos = batch_to_repeated(models).examples
+    assert [Example2.from_protobuf(p) for p in protos] == protobufs_to_models(Example2, protos)
+
+    cases = [
+        ("models -> repeated field", lambda: per_item_to_repeated(models), lambda: batch_to_repeated(models)),
+        ("models -> list of messages", lambda: [m.to_protobuf() for m in models],
+         lambda: models_to_protobufs(models, example2_pb2.Example2)),
+        ("messages -> models", lambda: [Example2.from_protobuf(p) for p in protos],
+         lambda: protobufs_to_models(Example2, protos)),
+    ]
+    for title, per_item, batch in cases:
+        baseline = bench(per_item, number=20)
+        current = bench(batch, number=20)
+        print(f"{title:<30} per-item {ROWS / baseline * 1e6:12,.0f} rows/s  "
+              f"batch {ROWS / current * 1e6:12,.0f} rows/s  x{baseline / current:5.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+'''
+@File    :   bench_bulk_insert.py
+@Time    :   2024/07/26 09:41:12
+@Desc    :   把一批 Example 消息写入 SQLite 的 users 表: 逐条 from_protobuf + session.add(之前的做法)
+             与 orm.bulk_insert 直接由消息生成列值并分批 executemany 的对比
+
+    python benchmarks/bench_bulk_insert.py --rows 100000
+'''
+
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+from common import Example, ExampleType, make_example
+
+from sqlalchemy import func, insert
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from protobuf_pydantic_gen import orm
+
+
+def make_messages(rows: int, json_fields: bool = False):
+    template = make_example().to_protobuf()
+    if not json_fields:
+        # 逐条写入时 JSON 列中的嵌套模型实例不能直接序列化, 对比时只保留可以写入的字段
+        template.ClearField("examples")
+        template.ClearField("nested")
+    messages = []
+    for i in range(rows):
+        msg = type(template)()
+        msg.CopyFrom(template)
+        msg.name = f"user{i}"
+        msg.age = i % 100
+        messages.append(msg)
+    return messages
+
+
+def run(title: str, messages, write, baseline: float = None) -> float:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        SQLModel.metadata.create_all(engine)
+        with Session(engine) as session:
+            start = time.perf_counter()
+            write(session, messages)
+            session.commit()
+            elapsed = time.perf_counter() - start
+            count = session.exec(select(func.count()).select_from(Example)).one()
+        engine.dispose()
+    assert count == len(messages), count
+    speedup = f"  x{baseline / elapsed:5.2f}" if baseline else ""
+    print(f"{title:<36} {elapsed:8.2f}s  {len(messages) / elapsed:10.0f} rows/s{speedup}")
+    return elapsed
+
+
+def orm_add(session, messages, trusted: bool = False):
+    for msg in messages:
+        model = Example.from_protobuf(msg, trusted)
+        # 表模型的 __init__ 不做校验, 枚举列需要枚举成员
+        model.type = ExampleType(model.type)
+        session.add(model)
+
+
+def values_insert(session, messages, chunk_size: int = 1000):
+    # 多行 VALUES (...), (...) 语句, 与 bulk_insert 的 executemany 对比
+    rows = orm.protobufs_to_rows(Example, messages)
+    for i in range(0, len(rows), chunk_size):
+        session.execute(insert(Example.__table__).values(rows[i:i + chunk_size]))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    messages = make_messages(args.rows)
+    print(f"{args.rows} rows into SQLite")
+    baseline = run("from_protobuf + session.add", messages, orm_add)
+    run("insert().values() chunks", messages, lambda s, m: values_insert(s, m, args.chunk_size), baseline)
+    run("bulk_insert", messages, lambda s, m: orm.bulk_insert(s, Example, m, args.chunk_size), baseline)
+    run("from_protobuf(trusted) + add_all", messages,
+        lambda s, m: orm_add(s, m, trusted=True), baseline)
+    run("bulk_insert(upsert)", messages,
+        lambda s, m: orm.bulk_insert(s, Example, m, args.chunk_size, upsert=True), baseline)
+    run("bulk_insert(with JSON messages)", make_messages(args.rows, json_fields=True),
+        lambda s, m: orm.bulk_insert(s, Example, m, args.chunk_size), baseline)
+
+
+if __name__ == "__main__":
+    main()
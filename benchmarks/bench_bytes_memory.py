@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+'''
+@File    :   bench_bytes_memory.py
+@Time    :   2024/07/16 11:05:27
+@Desc    :   大 bytes 字段的消息: JSON dict(base64) 转换与直接转换的峰值内存和耗时对比
+'''
+
+import time
+import tracemalloc
+
+from common import make_blob
+
+from google.protobuf.json_format import MessageToDict, ParseDict
+
+from protobuf_pydantic_gen.ext import model2protobuf, protobuf2model
+
+MB = 1 << 20
+
+
+def measure(func):
+    """返回 (峰值内存 MB, 耗时 ms), 峰值相对调用前的已分配内存计算"""
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del result
+    return (peak - base) / MB, elapsed * 1e3
+
+
+def main():
+    for size in (1, 8, 32):
+        model_cls, msg = make_blob(size * MB)
+        msg_cls = type(msg)
+        payload = msg.data
+        model = model_cls(name="blob", data=payload)
+
+        cases = [
+            ("to_protobuf", lambda: ParseDict(model.model_dump(), msg_cls()),
+             lambda: model2protobuf(model, msg_cls())),
+            ("from_protobuf", lambda: model_cls.model_validate(MessageToDict(msg, preserving_proto_field_name=True)),
+             lambda: protobuf2model(model_cls, msg)),
+            ("from_protobuf trusted", None,
+             lambda: protobuf2model(model_cls, msg, trusted=True)),
+            ("to_protobuf memoryview", None,
+             lambda: model2protobuf(model_cls.model_construct(name="blob", data=memoryview(payload)), msg_cls())),
+        ]
+        for title, json_func, direct_func in cases:
+            line = f"{size:>3}MB {title:<24}"
+            if json_func is not None:
+                json_func()  # 预热, 编译转换计划等
+                peak, elapsed = measure(json_func)
+                line += f" base64 peak {peak:8.2f}MB {elapsed:8.2f}ms "
+            else:
+                line += " " * 40
+            direct_func()
+            peak, elapsed = measure(direct_func)
+            line += f" direct peak {peak:8.2f}MB {elapsed:8.2f}ms"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+'''
+@File    :   bench_dependencies.py
+@Time    :   2024/07/25 10:26:41
+@Desc    :   依赖链很深的 proto 集合: 只生成 file_to_generate 与同时生成全部传递依赖(dependencies=true, 之前的行为)的对比
+
+    python benchmarks/bench_dependencies.py --files 100
+'''
+
+import argparse
+import logging
+import time
+
+from common import make_proto_set
+
+from google.protobuf import timestamp_pb2
+from google.protobuf.compiler import plugin_pb2
+
+from protobuf_pydantic_gen import main as plugin
+
+
+def generate(proto_files, target: str, parameter: str):
+    """生成 target, proto_files 为它的全部传递依赖(按依赖顺序), 返回 (耗时秒, 生成的文件数)"""
+    request = plugin_pb2.CodeGeneratorRequest(parameter=parameter)
+    timestamp_pb2.DESCRIPTOR.CopyToProto(request.proto_file.add())
+    request.proto_file.extend(proto_files)
+    request.file_to_generate.append(target)
+    response = plugin_pb2.CodeGeneratorResponse()
+    start = time.perf_counter()
+    plugin.generate_code(request, response)
+    elapsed = time.perf_counter() - start
+    if response.error:
+        raise RuntimeError(response.error)
+    return elapsed, len(response.file)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=100, help="依赖链长度, 第 i 个文件依赖第 i-1 个文件")
+    parser.add_argument("--per-file", type=int, default=40, help="逐个文件调用插件时的链长度")
+    parser.add_argument("--messages", type=int, default=2)
+    parser.add_argument("--fields", type=int, default=8)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    # 一次调用, 只请求依赖链末端的文件
+    proto_files = make_proto_set(args.files, args.messages, args.fields)
+    target = proto_files[-1].name
+    results = {}
+    for parameter in ("dependencies=true", ""):
+        results[parameter] = generate(proto_files, target, parameter)
+    (closure, closure_files), (only, only_files) = results["dependencies=true"], results[""]
+    print(f"chain of {args.files} files, generate the last one")
+    print(f"  dependencies=true {closure * 1000:9.1f}ms {closure_files:4d} files")
+    print(f"  file_to_generate  {only * 1000:9.1f}ms {only_files:4d} files  x{closure / only:6.2f}")
+
+    # 构建系统按文件分别调用 protoc: 之前每次调用都重新生成全部依赖, 总量随链长平方增长
+    proto_files = make_proto_set(args.per_file, args.messages, args.fields)
+    print(f"chain of {args.per_file} files, one plugin invocation per file")
+    totals = {}
+    for parameter in ("dependencies=true", ""):
+        elapsed = files = 0
+        for i, proto_file in enumerate(proto_files):
+            seconds, count = generate(proto_files[:i + 1], proto_file.name, parameter)
+            elapsed += seconds
+            files += count
+        totals[parameter] = elapsed
+        print(f"  {parameter or 'file_to_generate':<17} {elapsed * 1000:9.1f}ms {files:5d} files written")
+    print(f"  x{totals['dependencies=true'] / totals['']:6.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+'''
+@File    :   bench_generate.py
+@Time    :   2024/07/18 09:36:02
+@Desc    :   插件 generate_code 在合成的大量 proto 文件上的耗时: autopep8 后处理, 串行, 进程池与缓存命中对比
+
+    python benchmarks/bench_generate.py --files 500 --messages 2 --fields 8
+'''
+
+import argparse
+import logging
+import tempfile
+import time
+import timeit
+
+from common import make_proto_set
+
+from google.protobuf import timestamp_pb2
+from google.protobuf.compiler import plugin_pb2
+from jinja2 import Template
+
+from protobuf_pydantic_gen import main as plugin
+
+
+def build_set_request(files: int, messages: int, fields: int, parameter: str) -> plugin_pb2.CodeGeneratorRequest:
+    request = plugin_pb2.CodeGeneratorRequest(parameter=parameter)
+    timestamp_pb2.DESCRIPTOR.CopyToProto(request.proto_file.add())
+    for file_proto in make_proto_set(files, messages, fields):
+        request.proto_file.add().CopyFrom(file_proto)
+        request.file_to_generate.append(file_proto.name)
+    return request
+
+
+def run(files: int, messages: int, fields: int, parameter: str, template: plugin_pb2.CodeGeneratorRequest = None):
+    if template is None:
+        request = build_set_request(files, messages, fields, parameter)
+    else:
+        # generate_code 会修改请求, 同一请求重复生成时使用副本
+        request = plugin_pb2.CodeGeneratorRequest()
+        request.CopyFrom(template)
+        request.parameter = parameter
+    response = plugin_pb2.CodeGeneratorResponse()
+    start = time.perf_counter()
+    plugin.generate_code(request, response)
+    elapsed = time.perf_counter() - start
+    if response.error:
+        raise RuntimeError(response.error)
+    # 每次调用的包名不同, 替换后比较内容
+    prefix = request.proto_file[1].package.split(".")[0]
+    return elapsed, [(f.name, f.content.replace(prefix, "bench_set")) for f in response.file]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--messages", type=int, default=2)
+    parser.add_argument("--fields", type=int, default=8)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    with open(plugin.os.path.join(plugin.os.path.dirname(plugin.__file__), "template.j2"), encoding="utf-8") as f:
+        source = f.read()
+    compile_us = min(timeit.repeat(lambda: Template(source), number=20, repeat=3)) / 20 * 1e6
+    print(f"template compile {compile_us / 1000:8.2f}ms per file saved by compiling once per run")
+
+    size = f"{args.files} files x {args.messages} messages x {args.fields} fields"
+    formatted, expected = run(args.files, args.messages, args.fields, "jobs=1,formatter=autopep8")
+    print(f"generate_code({size}) autopep8 jobs=1    {formatted:8.2f}s")
+    workers = plugin.get_jobs("auto", args.files, "autopep8")
+    parallel, files = run(args.files, args.messages, args.fields, "jobs=auto,formatter=autopep8")
+    assert files == expected, "parallel output differs from serial output"
+    print(f"generate_code({size}) autopep8 jobs={workers:<4} {parallel:8.2f}s  x{formatted / parallel:5.2f}")
+    serial, _ = run(args.files, args.messages, args.fields, "")
+    print(f"generate_code({size}) formatter=none     {serial:8.2f}s  x{formatted / serial:5.2f}")
+
+    request = build_set_request(args.files, args.messages, args.fields, "")
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cold, expected = run(args.files, args.messages, args.fields, f"cache={cache_dir}", request)
+        print(f"generate_code({size}) cache cold {cold:8.2f}s")
+        warm, files = run(args.files, args.messages, args.fields, f"cache={cache_dir}", request)
+        assert files == expected, "cached output differs from generated output"
+        print(f"generate_code({size}) cache warm {warm:8.2f}s  x{cold / warm:5.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+'''
+@File    :   bench_import.py
+@Time    :   2024/07/20 11:02:15
+@Desc    :   在新的解释器中导入 models/example3_model.py (非表模型) 的耗时和 RSS 增量,
+             与之前 ext 顶层导入 sqlmodel 的情况以及表模型 models/example_model.py 对比
+'''
+
+import os
+import subprocess
+import sys
+
+from common import ROOT
+
+# 子进程中执行: 导入前后的 RSS 和耗时, 并做一次转换, 确认转换路径不会再导入 SQLAlchemy
+_SCRIPT = """
+import sys, time
+
+
+def rss_kb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * {page_kb}
+
+
+rss = rss_kb()
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+rss = rss_kb() - rss
+import example3_pb2
+from models.example3_model import Example3
+Example3.from_protobuf(Example3(name="x").to_protobuf())
+print(elapsed * 1000, rss, len(sys.modules), "sqlalchemy" in sys.modules)
+"""
+
+
+def measure(statement: str, repeat: int = 5):
+    """返回 (最短耗时 ms, RSS 增量 MB, 模块数, 是否导入了 SQLAlchemy)"""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([ROOT, os.path.join(ROOT, "pb")]))
+    code = _SCRIPT.format(statement=statement, page_kb=os.sysconf("SC_PAGE_SIZE") // 1024)
+    best = None
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+        elapsed, rss, modules, sqlalchemy = result.stdout.split()
+        if best is None or float(elapsed) < best[0]:
+            best = (float(elapsed), int(rss) / 1024, int(modules), sqlalchemy == "True")
+    return best
+
+
+def main():
+    cases = [
+        ("example3_model", "import models.example3_model"),
+        ("example3_model, ext importing sqlmodel", "import sqlmodel\nimport models.example3_model"),
+        ("example_model (table models)", "import models.example_model"),
+    ]
+    baseline = None
+    for title, statement in cases:
+        elapsed, rss, modules, sqlalchemy = measure(statement)
+        baseline = baseline or (elapsed, rss)
+        print(f"{title:<40} {elapsed:8.1f}ms  rss +{rss:6.1f}MB  {modules:4d} modules  "
+              f"sqlalchemy {'loaded' if sqlalchemy else 'not loaded':<10}  "
+              f"x{elapsed / baseline[0]:5.2f} time  x{rss / baseline[1]:5.2f} rss")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+'''
+@File    :   bench_index.py
+@Time    :   2024/07/28 11:23:09
+@Desc    :   example.proto 中声明的 INDEX/部分索引: 用 SQLite EXPLAIN QUERY PLAN 检查查询使用的索引,
+             并对比删除这些索引后的查询耗时
+
+    python benchmarks/bench_index.py --rows 100000
+'''
+
+import argparse
+import datetime
+import logging
+import os
+import tempfile
+import time
+
+from common import Example, ExampleType, make_example
+
+from sqlalchemy import event, text
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from protobuf_pydantic_gen import orm
+
+START = datetime.datetime(2024, 1, 1)
+
+
+def make_messages(rows: int):
+    template = make_example().to_protobuf()
+    template.ClearField("examples")
+    template.ClearField("nested")
+    messages = []
+    for i in range(rows):
+        msg = type(template)()
+        msg.CopyFrom(template)
+        msg.name = f"user{i}"
+        msg.age = i % 100
+        msg.score = (i * 7) % 100
+        msg.type = i % 3 + 1
+        msg.created_at.FromDatetime(START + datetime.timedelta(seconds=i))
+        messages.append(msg)
+    return messages
+
+
+def explain(engine, statement) -> str:
+    """执行语句, 返回 SQLite 对实际发送的 SQL 和参数给出的 EXPLAIN QUERY PLAN"""
+    captured = []
+
+    def capture(conn, cursor, sql, params, context, executemany):
+        captured.append((sql, params))
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        with engine.connect() as conn:
+            conn.execute(statement).all()
+            sql, params = captured[0]
+            return "; ".join(row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}", params))
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+
+def run(engine, statement, number: int) -> float:
+    with engine.connect() as conn:
+        start = time.perf_counter()
+        for _ in range(number):
+            conn.execute(statement).all()
+        return (time.perf_counter() - start) / number * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--number", type=int, default=20)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    since = START + datetime.timedelta(seconds=args.rows - 3000)
+    queries = [
+        ("age = 42", select(Example).where(Example.age == 42), "ix_users_age_score"),
+        ("age = 42 and score > 50", select(Example).where(Example.age == 42, Example.score > 50), "ix_users_age_score"),
+        ("TYPE2 since ... order by created_at",
+         select(Example).where(Example.type == ExampleType.TYPE2, Example.created_at > since)
+         .order_by(Example.created_at), "ix_users_type2_created_at"),
+        # 不满足部分索引的条件, 不能使用该索引
+        ("TYPE3 since ... order by created_at",
+         select(Example).where(Example.type == ExampleType.TYPE3, Example.created_at > since)
+         .order_by(Example.created_at), None),
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        SQLModel.metadata.create_all(engine)
+        with Session(engine) as session:
+            orm.bulk_insert(session, Example, make_messages(args.rows))
+            session.commit()
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+
+        print(f"{args.rows} rows in users")
+        indexed = {}
+        for title, statement, index in queries:
+            plan = explain(engine, statement)
+            if index is None:
+                assert "ix_users_type2_created_at" not in plan, plan
+            else:
+                assert f"INDEX {index}" in plan, plan
+            indexed[title] = run(engine, statement, args.number)
+            print(f"  {title:<36} {indexed[title]:8.2f}ms  {plan}")
+
+        with engine.begin() as conn:
+            conn.execute(text("DROP INDEX ix_users_age_score"))
+            conn.execute(text("DROP INDEX ix_users_type2_created_at"))
+        # sqlite3 按连接缓存预编译语句, 缓存的 EXPLAIN 不会随 DROP INDEX 重新规划, 换用新连接
+        engine.dispose()
+        print("without the generated indexes")
+        for title, statement, _ in queries:
+            elapsed = run(engine, statement, args.number)
+            print(f"  {title:<36} {elapsed:8.2f}ms  x{elapsed / indexed[title]:6.2f}  {explain(engine, statement)}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
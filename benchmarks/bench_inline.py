@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+'''
+@File    :   bench_inline.py
+@Time    :   2024/07/15 17:08:44
+@Desc    :   converter=inline 生成的方法与通用(reflect)转换的对比
+'''
+
+import logging
+
+from common import Example, ExampleType, bench, generate_models, make_example
+
+from models.example2_model import Example2
+
+
+def main():
+    logging.disable(logging.CRITICAL)
+    inline = generate_models("inline_models", "converter=inline")
+    from inline_models.example2_model import Example2 as InlineExample2
+
+    reflect_model = make_example()
+    inline_model = inline.Example(**{name: getattr(reflect_model, name) for name in Example.model_fields})
+    inline_model.examples = [InlineExample2(type=item.type.value) for item in reflect_model.examples]
+    inline_model.nested = inline.Nested(full_name=reflect_model.nested.name)
+    inline_model.type = inline.ExampleType(reflect_model.type.value)
+    msg = reflect_model.to_protobuf()
+    assert inline_model.to_protobuf() == msg
+
+    small = Example2(type=ExampleType.TYPE2)
+    inline_small = InlineExample2(type=2)
+    small_msg = small.to_protobuf()
+    assert inline_small.to_protobuf() == small_msg
+
+    cases = [
+        ("Example.to_protobuf()", reflect_model.to_protobuf, inline_model.to_protobuf),
+        ("Example.from_protobuf()", lambda: Example.from_protobuf(msg), lambda: inline.Example.from_protobuf(msg)),
+        ("Example.from_protobuf(trusted)", lambda: Example.from_protobuf(msg, True),
+         lambda: inline.Example.from_protobuf(msg, True)),
+        ("Example2.to_protobuf()", small.to_protobuf, inline_small.to_protobuf),
+        ("Example2.from_protobuf()", lambda: Example2.from_protobuf(small_msg),
+         lambda: InlineExample2.from_protobuf(small_msg)),
+    ]
+    for title, reflect, inlined in cases:
+        baseline = bench(reflect, number=5000)
+        current = bench(inlined, number=5000)
+        print(f"{title:<32} reflect {baseline:8.2f}us  inline {current:8.2f}us  x{baseline / current:5.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+'''
+@File    :   bench_lazy_import.py
+@Time    :   2024/07/19 15:12:44
+@Desc    :   python -X importtime 对比: 立即导入全部模型的包与 lazy=true 生成的按需导入包
+'''
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+
+from common import ROOT, build_request
+
+import example3_pb2
+import example_pb2
+from google.protobuf.compiler import plugin_pb2
+
+from protobuf_pydantic_gen.main import generate_code
+
+_IMPORTTIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def generate(out_dir: str, package: str, parameter: str):
+    request = build_request([example_pb2.DESCRIPTOR, example3_pb2.DESCRIPTOR], f"dependencies=true,{parameter}")
+    response = plugin_pb2.CodeGeneratorResponse()
+    generate_code(request, response)
+    if response.error:
+        raise RuntimeError(response.error)
+    os.makedirs(os.path.join(out_dir, package))
+    names = []
+    for file in response.file:
+        names.append(file.name[:-3])
+        with open(os.path.join(out_dir, package, file.name), "w", encoding="utf-8") as f:
+            f.write(file.content)
+    if "__init__" not in names:
+        # 常见的手写 __init__.py: 立即导入所有模型
+        with open(os.path.join(out_dir, package, "__init__.py"), "w", encoding="utf-8") as f:
+            f.writelines(f"from .{name} import *  # noqa: F401,F403\n" for name in sorted(names))
+
+
+def importtime(out_dir: str, statement: str, package: str, repeat: int = 5):
+    """在子进程中执行 statement, 返回 (耗时 ms, 新导入的模块数, 加载的生成模块, -X importtime 的顶层条目)
+
+    importlib.import_module 导入的模块不会出现在 -X importtime 的输出中, 耗时和模块数在子进程内统计
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([out_dir, ROOT, os.path.join(ROOT, "pb")]))
+    code = (f"import sys, time\n"
+            f"before = len(sys.modules)\n"
+            f"start = time.perf_counter()\n"
+            f"{statement}\n"
+            f"print((time.perf_counter() - start) * 1000, len(sys.modules) - before)\n"
+            f"print(' '.join(sorted(m for m in sys.modules if m.startswith('{package}.'))))\n")
+    best = None
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], env=env,
+                                capture_output=True, text=True, check=True)
+        timing, loaded = result.stdout.splitlines()
+        elapsed, modules = timing.split()
+        top = [m.groups() for m in map(_IMPORTTIME.match, result.stderr.splitlines()) if m and len(m.group(3)) == 1]
+        if best is None or float(elapsed) < best[0]:
+            best = (float(elapsed), int(modules), loaded.split(), top)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--verbose", action="store_true", help="输出 -X importtime 的顶层条目")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as out_dir:
+        generate(out_dir, "eager_models", "")
+        generate(out_dir, "lazy_models", "lazy=true")
+        cases = [
+            ("from {pkg} import Example3", "package, non-table model"),
+            ("from {pkg} import Example", "package, table model"),
+            ("from {pkg}.example_model import Example", "module, table model"),
+        ]
+        for statement, title in cases:
+            results = {}
+            for package in ("eager_models", "lazy_models"):
+                results[package] = importtime(out_dir, statement.format(pkg=package), package)
+            eager, lazy = results["eager_models"], results["lazy_models"]
+            print(f"{title:<28} eager {eager[0]:8.1f}ms {eager[1]:4d} modules  "
+                  f"lazy {lazy[0]:8.1f}ms {lazy[1]:4d} modules  x{eager[0] / lazy[0]:5.2f}")
+            print(f"{'':<28} eager loads {', '.join(m.split('.')[-1] for m in eager[2])}")
+            print(f"{'':<28} lazy loads  {', '.join(m.split('.')[-1] for m in lazy[2])}")
+            if args.verbose:
+                for package, result in results.items():
+                    for _, cumulative, _, name in result[3]:
+                        print(f"{'':<28} {package:<12} {int(cumulative) / 1000:8.1f}ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+'''
+@File    :   bench_message_class.py
+@Time    :   2024/07/10 15:02:36
+@Desc    :   生成代码和 unpack_any 中每次查询 pool 与 ext.get_message_class 缓存消息类的对比(小消息)
+'''
+
+from common import ExampleType, bench, report
+
+from google.protobuf import message_factory
+from models.example2_model import Example2
+from protobuf_pydantic_gen.ext import model2protobuf, pack_any, pool, unpack_any
+
+
+def legacy_to_protobuf(model: Example2):
+    # 0.1.5 版本模板生成的 to_protobuf
+    _proto = pool.FindMessageTypeByName("pydantic_example.Example2")
+    _cls = message_factory.GetMessageClass(_proto)
+    return model2protobuf(model, _cls())
+
+
+def legacy_unpack_any(msg):
+    inner = message_factory.GetMessageClass(pool.FindMessageTypeByName(msg.TypeName()))()
+    msg.Unpack(inner)
+    return inner
+
+
+def main():
+    model = Example2(type=ExampleType.TYPE2)
+    assert model.to_protobuf() == legacy_to_protobuf(model)
+    baseline = bench(lambda: legacy_to_protobuf(model), number=20000, repeat=15)
+    current = bench(model.to_protobuf, number=20000, repeat=15)
+    report("Example2.to_protobuf()", baseline, current)
+
+    packed = pack_any(model)
+    assert unpack_any(packed) == legacy_unpack_any(packed)
+    baseline = bench(lambda: legacy_unpack_any(packed), number=20000, repeat=15)
+    current = bench(lambda: unpack_any(packed), number=20000, repeat=15)
+    report("unpack_any(Example2)", baseline, current)
+
+
+if __name__ == "__main__":
+    main()
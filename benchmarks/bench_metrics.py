@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+'''
+@File    :   bench_metrics.py
+@Time    :   2024/07/23 10:41:26
+@Desc    :   转换统计关闭, 开启, 开启并统计字节数和回调时的开销对比 (reflect 与 inline 两种转换器)
+'''
+
+import logging
+
+from common import Example, bench, generate_models, make_example
+
+from protobuf_pydantic_gen import ext
+
+
+def _callback(full_name, direction, seconds, validation_seconds, size, error):
+    pass
+
+
+def main():
+    logging.disable(logging.CRITICAL)
+    inline = generate_models("inline_models", "converter=inline")
+    from inline_models.example2_model import Example2 as InlineExample2
+
+    reflect_model = make_example()
+    inline_model = inline.Example(**{name: getattr(reflect_model, name) for name in Example.model_fields})
+    inline_model.examples = [InlineExample2(type=item.type.value) for item in reflect_model.examples]
+    inline_model.nested = inline.Nested(full_name=reflect_model.nested.name)
+    inline_model.type = inline.ExampleType(reflect_model.type.value)
+    msg = reflect_model.to_protobuf()
+
+    cases = [
+        ("reflect to_protobuf()", reflect_model.to_protobuf),
+        ("reflect from_protobuf()", lambda: Example.from_protobuf(msg)),
+        ("inline to_protobuf()", inline_model.to_protobuf),
+        ("inline from_protobuf()", lambda: inline.Example.from_protobuf(msg)),
+    ]
+    modes = [
+        ("disabled", ext.disable_metrics),
+        ("enabled", ext.enable_metrics),
+        ("bytes+callback", lambda: ext.enable_metrics(_callback, track_bytes=True)),
+    ]
+    for title, func in cases:
+        results = []
+        for _, switch in modes:
+            switch()
+            results.append(bench(func, number=5000))
+        ext.disable_metrics()
+        baseline = results[0]
+        columns = [f"{name} {elapsed:7.2f}us x{elapsed / baseline:4.2f}" for (name, _), elapsed in zip(modes, results)]
+        print(f"{title:<26} " + "  ".join(columns))
+
+    ext.reset_metrics()
+    ext.enable_metrics(track_bytes=True)
+    reflect_model.to_protobuf()
+    inline.Example.from_protobuf(msg)
+    ext.disable_metrics()
+    for full_name, directions in ext.metrics_snapshot().items():
+        for direction, stats in directions.items():
+            print(f"{full_name} {direction}: {stats}")
+    ext.reset_metrics()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+'''
+@File    :   bench_model2protobuf.py
+@Time    :   2024/07/08 10:20:11
+@Desc    :   model2protobuf 直接写字段与 dict/JSON 中转实现的对比
+'''
+
+from common import bench, make_example, report
+
+import example_pb2
+from legacy import model2protobuf as legacy_model2protobuf
+from protobuf_pydantic_gen.ext import model2protobuf
+
+
+def main():
+    model = make_example()
+    expected = legacy_model2protobuf(model, example_pb2.Example())
+    assert model2protobuf(model, example_pb2.Example()) == expected
+
+    baseline = bench(lambda: legacy_model2protobuf(model, example_pb2.Example()))
+    current = bench(lambda: model2protobuf(model, example_pb2.Example()))
+    report("model2protobuf(pydantic_example.Example)", baseline, current)
+
+
+if __name__ == "__main__":
+    main()
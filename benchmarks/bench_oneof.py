@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+'''
+@File    :   bench_oneof.py
+@Time    :   2024/07/24 09:52:17
+@Desc    :   oneof 中有几十个成员的命令信封: 逐个字段转换全部成员(之前的实现)与按 WhichOneof 只转换已设置成员的对比
+'''
+
+from common import bench, make_envelope
+
+from protobuf_pydantic_gen import ext
+
+
+def legacy_plans(model_cls, descriptor):
+    """之前的转换计划: oneof 成员与普通字段一样逐个读写"""
+    writers = [(fd.name, ext._compile_writer(fd)) for fd in descriptor.fields]
+    readers = [(fd.name, ext._compile_reader(fd, model_cls)) for fd in descriptor.fields]
+    trusted_readers = [(fd.name, ext._compile_reader(fd, model_cls, True)) for fd in descriptor.fields]
+    construct = ext._compile_constructor(model_cls, [name for name, _ in trusted_readers])
+    return (ext.ConversionPlan(model_cls, descriptor, ext.TO_PROTOBUF, writers),
+            ext.ConversionPlan(model_cls, descriptor, ext.FROM_PROTOBUF, readers),
+            ext.ConversionPlan(model_cls, descriptor, ext.FROM_PROTOBUF_TRUSTED, trusted_readers,
+                               construct=construct))
+
+
+def main():
+    for variants in (10, 40, 100):
+        model_cls, msg = make_envelope(variants)
+        msg_cls = type(msg)
+        model = ext.protobuf2model(model_cls, msg)
+        assert ext.model2protobuf(model, msg_cls()) == msg
+        to_plan, from_plan, trusted_plan = legacy_plans(model_cls, msg.DESCRIPTOR)
+
+        def legacy_read(plan):
+            return plan.construct({name: read(msg) for name, read in plan.steps})
+
+        cases = [
+            ("model2protobuf", lambda: ext._write_model(to_plan, model, msg_cls()),
+             lambda: ext.model2protobuf(model, msg_cls())),
+            ("protobuf2model", lambda: legacy_read(from_plan), lambda: ext.protobuf2model(model_cls, msg)),
+            ("protobuf2model(trusted)", lambda: legacy_read(trusted_plan),
+             lambda: ext.protobuf2model(model_cls, msg, trusted=True)),
+        ]
+        for title, legacy, current in cases:
+            baseline = bench(legacy, number=2000)
+            elapsed = bench(current, number=2000)
+            print(f"{variants:3d} variants {title:<24} per field {baseline:8.2f}us  "
+                  f"WhichOneof {elapsed:8.2f}us  x{baseline / elapsed:5.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+'''
+@File    :   bench_protobuf2model.py
+@Time    :   2024/07/09 09:41:27
+@Desc    :   protobuf2model 按描述符直接读取与 MessageToDict/ParseDict 递归实现的对比
+'''
+
+from common import Example, bench, make_chain, make_example, report
+
+from legacy import protobuf2model as legacy_protobuf2model
+from protobuf_pydantic_gen.ext import protobuf2model
+
+
+def main():
+    msg = make_example().to_protobuf()
+    assert protobuf2model(Example, msg) == legacy_protobuf2model(Example, msg)
+    baseline = bench(lambda: legacy_protobuf2model(Example, msg))
+    current = bench(lambda: protobuf2model(Example, msg))
+    report("protobuf2model(pydantic_example.Example)", baseline, current)
+
+    for depth in (4, 16, 64):
+        model_cls, msg = make_chain(depth)
+        assert protobuf2model(model_cls, msg) == legacy_protobuf2model(model_cls, msg)
+        number = max(20, 2000 // depth)
+        baseline = bench(lambda: legacy_protobuf2model(model_cls, msg), number=number)
+        current = bench(lambda: protobuf2model(model_cls, msg), number=number)
+        report(f"protobuf2model(depth={depth})", baseline, current)
+
+
+if __name__ == "__main__":
+    main()
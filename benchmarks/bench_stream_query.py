@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+'''
+@File    :   bench_stream_query.py
+@Time    :   2024/07/27 14:05:38
+@Desc    :   把 SQLite users 表的查询结果转换为分页的列表响应: 加载全部 ORM 实例再逐个 to_protobuf(之前的做法)
+             与 orm.stream_query_pages 按 yield_per 读取列值直接写入消息的耗时和峰值内存对比
+
+    python benchmarks/bench_stream_query.py --rows 10000 100000
+'''
+
+import argparse
+import logging
+import os
+import tempfile
+import time
+import tracemalloc
+
+from bench_bulk_insert import make_messages
+from common import Example
+
+from google.protobuf import descriptor_pb2, descriptor_pool, message_factory
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from protobuf_pydantic_gen import orm
+
+
+def make_response_cls():
+    """ListExamplesResponse { repeated pydantic_example.Example items = 1; }"""
+    file_proto = descriptor_pb2.FileDescriptorProto(
+        name="bench_list.proto", package="bench_list", syntax="proto3", dependency=["example.proto"])
+    msg = file_proto.message_type.add(name="ListExamplesResponse")
+    msg.field.add(name="items", number=1, type=descriptor_pb2.FieldDescriptorProto.TYPE_MESSAGE,
+                  label=descriptor_pb2.FieldDescriptorProto.LABEL_REPEATED, type_name=".pydantic_example.Example")
+    pool = descriptor_pool.Default()
+    pool.Add(file_proto)
+    return message_factory.GetMessageClass(pool.FindMessageTypeByName("bench_list.ListExamplesResponse"))
+
+
+def orm_pages(session, response_cls, page_size: int):
+    models = session.exec(select(Example)).all()
+    for start in range(0, len(models), page_size):
+        response = response_cls()
+        for model in models[start:start + page_size]:
+            response.items.append(model.to_protobuf())
+        yield response
+
+
+def stream_pages(session, response_cls, page_size: int):
+    return orm.stream_query_pages(session, select(Example), response_cls, "items", page_size)
+
+
+def measure(engine, pages, response_cls, page_size: int):
+    """返回 (耗时秒, 行数, 峰值内存 MB), 峰值内存在单独一轮中用 tracemalloc 测量"""
+    with Session(engine) as session:
+        start = time.perf_counter()
+        rows = sum(len(response.items) for response in pages(session, response_cls, page_size))
+        elapsed = time.perf_counter() - start
+    with Session(engine) as session:
+        tracemalloc.start()
+        for _ in pages(session, response_cls, page_size):
+            pass
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return elapsed, rows, peak / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--page-size", type=int, default=100)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+    response_cls = make_response_cls()
+
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+            SQLModel.metadata.create_all(engine)
+            with Session(engine) as session:
+                orm.bulk_insert(session, Example, make_messages(rows, json_fields=True))
+                session.commit()
+            results = {}
+            for title, pages in (("all() + to_protobuf", orm_pages), ("stream_query_pages", stream_pages)):
+                elapsed, count, peak = measure(engine, pages, response_cls, args.page_size)
+                assert count == rows, count
+                results[title] = elapsed
+                print(f"{rows:7d} rows {title:<22} {elapsed:7.2f}s  {rows / elapsed:9.0f} rows/s  peak {peak:8.1f}MB")
+            engine.dispose()
+        print(f"{rows:7d} rows x{results['all() + to_protobuf'] / results['stream_query_pages']:5.2f}")
+
+
+if __name__ == "__main__":
+    main()
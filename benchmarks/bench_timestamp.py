@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+'''
+@File    :   bench_timestamp.py
+@Time    :   2024/07/21 09:18:05
+@Desc    :   有 20 个 Timestamp 字段的事件消息: RFC 3339 字符串中转, protobuf 自带的 FromDatetime/ToDatetime
+             与直接读写 seconds/nanos 的对比
+'''
+
+import datetime
+
+from common import bench, make_events
+
+from google.protobuf.duration_pb2 import Duration
+from google.protobuf.timestamp_pb2 import Timestamp
+
+from protobuf_pydantic_gen import ext
+
+COUNT = 20
+
+
+def json_fill(ts: Timestamp, value: datetime.datetime) -> None:
+    # 之前的实现: 先生成 RFC 3339 字符串, 再由 ParseDict 解析回 Timestamp
+    tmp = Timestamp()
+    tmp.FromDatetime(value)
+    ts.FromJsonString(tmp.ToJsonString())
+
+
+def json_read(ts: Timestamp) -> datetime.datetime:
+    return datetime.datetime.fromisoformat(ts.ToJsonString())
+
+
+def json_fill_duration(duration: Duration, value: datetime.timedelta) -> None:
+    tmp = Duration()
+    tmp.FromTimedelta(value)
+    duration.FromJsonString(tmp.ToJsonString())
+
+
+def use_converters(timestamp, duration) -> None:
+    """替换 ext 中 well-known 类型的读写函数并清空转换计划, 用于对比不同的实现"""
+    ext._WELL_KNOWN_READERS[Timestamp.DESCRIPTOR.full_name] = timestamp[0]
+    ext._WELL_KNOWN_FILLERS[Timestamp.DESCRIPTOR.full_name] = timestamp[1]
+    ext._WELL_KNOWN_READERS[Duration.DESCRIPTOR.full_name] = duration[0]
+    ext._WELL_KNOWN_FILLERS[Duration.DESCRIPTOR.full_name] = duration[1]
+    ext.clear_conversion_plans()
+
+
+def main():
+    model_cls, msg = make_events(COUNT)
+    msg_cls = type(msg)
+    model = ext.protobuf2model(model_cls, msg)
+    values = [getattr(model, f"t{i}") for i in range(COUNT)]
+    stamps = [getattr(msg, f"t{i}") for i in range(COUNT)]
+    target = Timestamp()
+
+    print(f"{COUNT} timestamps per call")
+    fill_cases = [
+        ("json string", lambda: [json_fill(target, v) for v in values]),
+        ("FromDatetime", lambda: [target.FromDatetime(v) for v in values]),
+        ("direct", lambda: [ext.fill_timestamp(target, v) for v in values]),
+    ]
+    read_cases = [
+        ("json string", lambda: [json_read(ts) for ts in stamps]),
+        ("ToDatetime", lambda: [ts.ToDatetime() for ts in stamps]),
+        ("direct", lambda: [ext.timestamp_to_datetime(ts) for ts in stamps]),
+    ]
+    for title, cases in (("datetime -> Timestamp", fill_cases), ("Timestamp -> datetime", read_cases)):
+        baseline = None
+        for name, func in cases:
+            elapsed = bench(func, number=2000)
+            baseline = baseline or elapsed
+            print(f"{title:<24} {name:<14} {elapsed:9.2f}us  x{baseline / elapsed:5.2f}")
+
+    direct = (ext._WELL_KNOWN_READERS[Timestamp.DESCRIPTOR.full_name],
+              ext._WELL_KNOWN_FILLERS[Timestamp.DESCRIPTOR.full_name])
+    direct_duration = (ext._WELL_KNOWN_READERS[Duration.DESCRIPTOR.full_name],
+                       ext._WELL_KNOWN_FILLERS[Duration.DESCRIPTOR.full_name])
+    implementations = [
+        ("json string", (json_read, json_fill), (lambda d: d.ToTimedelta(), json_fill_duration)),
+        ("From/ToDatetime", (lambda ts: ts.ToDatetime(), lambda ts, v: ts.FromDatetime(v)),
+         (lambda d: d.ToTimedelta(), lambda d, v: d.FromTimedelta(v))),
+        ("direct", direct, direct_duration),
+    ]
+    print(f"Event message ({COUNT} Timestamp + 1 Duration fields)")
+    results = {}
+    for name, timestamp, duration in implementations:
+        use_converters(timestamp, duration)
+        to_us = bench(lambda: ext.model2protobuf(model, msg_cls()), number=2000)
+        from_us = bench(lambda: ext.protobuf2model(model_cls, msg, trusted=True), number=2000)
+        results[name] = (to_us, from_us)
+    use_converters(direct, direct_duration)
+    assert ext.protobuf2model(model_cls, ext.model2protobuf(model, msg_cls())) == model
+
+    base_to, base_from = results["json string"]
+    for name, (to_us, from_us) in results.items():
+        print(f"{name:<16} model2protobuf {to_us:8.2f}us x{base_to / to_us:5.2f}  "
+              f"protobuf2model(trusted) {from_us:8.2f}us x{base_from / from_us:5.2f}")
+
+    ext.set_timestamp_timezone(datetime.timezone.utc)
+    to_us = bench(lambda: ext.model2protobuf(model, msg_cls()), number=2000)
+    from_us = bench(lambda: ext.protobuf2model(model_cls, msg, trusted=True), number=2000)
+    print(f"{'direct, tz=UTC':<16} model2protobuf {to_us:8.2f}us x{base_to / to_us:5.2f}  "
+          f"protobuf2model(trusted) {from_us:8.2f}us x{base_from / from_us:5.2f}")
+    ext.set_timestamp_timezone(None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+'''
+@File    :   bench_trusted.py
+@Time    :   2024/07/12 16:45:50
+@Desc    :   protobuf2model 校验构造与 trusted(model_construct) 构造的对比
+'''
+
+from common import ExampleType, bench, make_wide
+
+from models.example2_model import Example2
+from protobuf_pydantic_gen.ext import protobuf2model, protobufs_to_models
+
+
+def main():
+    msg = Example2(type=ExampleType.TYPE3).to_protobuf()
+    cases = [("Example2", Example2, msg)]
+    for width in (10, 50):
+        model_cls, msg = make_wide(width)
+        cases.append((f"wide({width})", model_cls, msg))
+
+    for title, model_cls, msg in cases:
+        assert protobuf2model(model_cls, msg, trusted=True) == protobuf2model(model_cls, msg)
+        baseline = bench(lambda: protobuf2model(model_cls, msg), number=5000)
+        current = bench(lambda: protobuf2model(model_cls, msg, trusted=True), number=5000)
+        print(f"protobuf2model({title:<10}) validate {baseline:8.2f}us  trusted {current:8.2f}us  "
+              f"x{baseline / current:5.2f}")
+
+    model_cls, msg = make_wide(50)
+    rows = [msg] * 1000
+    baseline = bench(lambda: protobufs_to_models(model_cls, rows), number=5)
+    current = bench(lambda: protobufs_to_models(model_cls, rows, trusted=True), number=5)
+    print(f"protobufs_to_models(wide(50) x 1000) validate {baseline / 1000:8.2f}ms  "
+          f"trusted {current / 1000:8.2f}ms  x{baseline / current:5.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+'''
+@File    :   bench_well_known.py
+@Time    :   2024/07/22 14:05:37
+@Desc    :   well-known 类型(Struct, 包装类型, FieldMask, Any)经 json_format 转换与 ext 直接转换的对比
+'''
+
+from common import bench
+
+from google.protobuf import any_pb2, field_mask_pb2, struct_pb2, wrappers_pb2
+from google.protobuf.json_format import MessageToDict, ParseDict
+
+from protobuf_pydantic_gen import ext
+
+DOCUMENT = {
+    "name": "event",
+    "count": 3,
+    "ratio": 0.25,
+    "enabled": True,
+    "tags": ["a", "b", "c", None],
+    "owner": {"id": 42, "email": "owner@example.com", "roles": ["admin", "dev"]},
+    "items": [{"sku": f"sku-{i}", "qty": i, "price": i * 1.5} for i in range(10)],
+}
+
+
+def main():
+    struct = struct_pb2.Struct()
+    ext.fill_struct(struct, DOCUMENT)
+    assert ext.struct_to_dict(struct) == MessageToDict(struct)
+    wrapper = wrappers_pb2.Int64Value(value=1 << 40)
+    mask = field_mask_pb2.FieldMask(paths=["name", "owner.email", "items"])
+    packed = ext.pack_any(wrapper)
+
+    cases = [
+        ("Struct dict -> message", lambda: ParseDict(DOCUMENT, struct_pb2.Struct()),
+         lambda: ext.fill_struct(struct_pb2.Struct(), DOCUMENT)),
+        ("Struct message -> dict", lambda: MessageToDict(struct), lambda: ext.struct_to_dict(struct)),
+        ("Int64Value int -> message", lambda: ParseDict(str(1 << 40), wrappers_pb2.Int64Value()),
+         lambda: ext.fill_wrapper(wrappers_pb2.Int64Value(), 1 << 40)),
+        ("Int64Value message -> int", lambda: int(MessageToDict(wrapper)), lambda: ext.wrapper_value(wrapper)),
+        ("FieldMask list -> message", lambda: ParseDict("name,owner.email,items", field_mask_pb2.FieldMask()),
+         lambda: ext.fill_field_mask(field_mask_pb2.FieldMask(), ["name", "owner.email", "items"])),
+        ("FieldMask message -> list", lambda: MessageToDict(mask).split(","), lambda: ext.field_mask_to_list(mask)),
+        ("Any pack message", lambda: ParseDict(MessageToDict(packed), any_pb2.Any()),
+         lambda: ext.pack_any(wrapper)),
+    ]
+    for title, json_func, direct_func in cases:
+        baseline = bench(json_func, number=2000)
+        current = bench(direct_func, number=2000)
+        print(f"{title:<28} json_format {baseline:8.2f}us  direct {current:8.2f}us  x{baseline / current:5.2f}")
+
+
+if __name__ == "__main__":
+    main()
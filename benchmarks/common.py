@@ -0,0 +1,453 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+'''
+@File    :   common.py
+@Time    :   2024/07/08 10:12:40
+@Desc    :   基准脚本共用的路径设置, 计时函数和示例数据
+'''
+
+import os
+import sys
+import timeit
+import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# pb/*_pb2.py 之间使用顶层 import, 需要把 pb 目录也加入 sys.path
+for path in (ROOT, os.path.join(ROOT, "pb")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import example_pb2  # noqa: E402,F401  注册 pydantic_example.* 到默认 pool
+from models.constant_model import ExampleType  # noqa: E402
+from models.example2_model import Example2  # noqa: E402
+from models.example_model import Example, Nested  # noqa: E402
+
+
+def bench(func, number: int = 2000, repeat: int = 5) -> float:
+    """返回单次调用的最佳耗时(微秒)
+
+    Args:
+        func (Callable): 无参数的被测函数
+        number (int, optional): 每轮调用次数. Defaults to 2000.
+        repeat (int, optional): 轮数. Defaults to 5.
+
+    Returns:
+        float: 单次调用耗时, 单位微秒
+    """
+    best = min(timeit.repeat(func, number=number, repeat=repeat))
+    return best / number * 1e6
+
+
+def report(title: str, baseline: float, current: float) -> None:
+    print(f"{title:<40} legacy {baseline:9.2f}us  direct {current:9.2f}us  x{baseline / current:5.2f}")
+
+
+def make_example() -> Example:
+    return Example(
+        name="benchmark",
+        age=18,
+        emails=["a@example.com", "b@example.com", "c@example.com"],
+        examples=[Example2(type=ExampleType.TYPE2), Example2(type=ExampleType.TYPE3)],
+        entry={},
+        nested=Nested(full_name="nested"),
+        created_at=datetime.datetime(2024, 7, 8, 10, 12, 40, 123456),
+        type=ExampleType.TYPE2,
+        score=88.5)
+
+
+def make_chain(depth: int):
+    """构造一条嵌套深度为 depth 的合成消息链 Level0 -> Level1 -> ...
+
+    Args:
+        depth (int): 嵌套层数
+
+    Returns:
+        Tuple[Type[BaseModel], _message.Message]: 最外层模型类和填充好的最外层消息
+    """
+    from typing import Optional
+    from pydantic import create_model
+    from google.protobuf import descriptor_pb2, descriptor_pool, message_factory
+
+    package = f"bench_chain{depth}"
+    file_proto = descriptor_pb2.FileDescriptorProto(
+        name=f"{package}.proto", package=package, syntax="proto3")
+    for level in range(depth):
+        msg = file_proto.message_type.add(name=f"Level{level}")
+        msg.field.add(name="name", number=1,
+                      type=descriptor_pb2.FieldDescriptorProto.TYPE_STRING,
+                      label=descriptor_pb2.FieldDescriptorProto.LABEL_OPTIONAL)
+        if level + 1 < depth:
+            msg.field.add(name="child", number=2,
+                          type=descriptor_pb2.FieldDescriptorProto.TYPE_MESSAGE,
+                          label=descriptor_pb2.FieldDescriptorProto.LABEL_OPTIONAL,
+                          type_name=f".{package}.Level{level + 1}")
+    pool = descriptor_pool.Default()
+    pool.Add(file_proto)
+
+    module = sys.modules[__name__]
+    model_cls = None
+    for level in reversed(range(depth)):
+        fields = {"name": (str, "")}
+        if model_cls is not None:
+            fields["child"] = (Optional[model_cls], None)
+        model_cls = create_model(f"{package}_Level{level}", __module__=__name__, **fields)
+        setattr(module, model_cls.__name__, model_cls)
+
+    msg_cls = message_factory.GetMessageClass(pool.FindMessageTypeByName(f"{package}.Level0"))
+    root = msg_cls()
+    node = root
+    for level in range(depth):
+        node.name = f"level-{level}"
+        if level + 1 < depth:
+            node = node.child
+    return model_cls, root
+
+
+_WIDE_TYPES = (
+    ("TYPE_STRING", str, "value"),
+    ("TYPE_INT64", int, 1 << 40),
+    ("TYPE_DOUBLE", float, 3.5),
+    ("TYPE_BOOL", bool, True),
+)
+
+
+def make_wide(width: int):
+    """构造一个有 width 个标量字段的合成消息(string/int64/double/bool 轮换)
+
+    Args:
+        width (int): 字段数
+
+    Returns:
+        Tuple[Type[BaseModel], _message.Message]: 模型类和填充好的消息
+    """
+    from pydantic import create_model
+    from google.protobuf import descriptor_pb2, descriptor_pool, message_factory
+
+    package = f"bench_wide{width}"
+    file_proto = descriptor_pb2.FileDescriptorProto(
+        name=f"{package}.proto", package=package, syntax="proto3")
+    msg = file_proto.message_type.add(name="Wide")
+    fields = {}
+    values = {}
+    for i in range(width):
+        type_name, py_type, value = _WIDE_TYPES[i % len(_WIDE_TYPES)]
+        msg.field.add(name=f"f{i}", number=i + 1,
+                      type=getattr(descriptor_pb2.FieldDescriptorProto, type_name),
+                      label=descriptor_pb2.FieldDescriptorProto.LABEL_OPTIONAL)
+        fields[f"f{i}"] = (py_type, py_type())
+        values[f"f{i}"] = value
+    pool = descriptor_pool.Default()
+    pool.Add(file_proto)
+    model_cls = create_model(f"{package}_Wide", __module__=__name__, **fields)
+    setattr(sys.modules[__name__], model_cls.__name__, model_cls)
+    msg_cls = message_factory.GetMessageClass(pool.FindMessageTypeByName(f"{package}.Wide"))
+    return model_cls, msg_cls(**values)
+
+
+def _new_file(package: str):
+    from google.protobuf import descriptor_pb2
+    return descriptor_pb2.FileDescriptorProto(name=f"{package}.proto", package=package, syntax="proto3")
+
+
+def _add_field(msg, name: str, number: int, type_name: str, repeated: bool = False, message: str = ""):
+    from google.protobuf import descriptor_pb2
+    FD = descriptor_pb2.FieldDescriptorProto
+    field = msg.field.add(name=name, number=number, type=getattr(FD, type_name),
+                          label=FD.LABEL_REPEATED if repeated else FD.LABEL_OPTIONAL)
+    if message:
+        field.type_name = message
+    return field
+
+
+def _register(file_proto, name: str, model_cls):
+    """把 file_proto 加入默认 pool, 模型类挂到本模块上(嵌套模型按模块属性解析), 返回 (模型类, 消息类)"""
+    from google.protobuf import descriptor_pool, message_factory
+
+    pool = descriptor_pool.Default()
+    pool.Add(file_proto)
+    module = sys.modules[__name__]
+    setattr(module, model_cls.__name__, model_cls)
+    msg_cls = message_factory.GetMessageClass(pool.FindMessageTypeByName(f"{file_proto.package}.{name}"))
+    return model_cls, msg_cls
+
+
+def _item_model(package: str):
+    from pydantic import create_model
+    model_cls = create_model(f"{package}_Item", __module__=__name__, name=(str, ""), value=(int, 0))
+    setattr(sys.modules[__name__], model_cls.__name__, model_cls)
+    return model_cls
+
+
+def make_repeated(length: int):
+    """构造带 repeated 标量和 repeated 子消息的合成消息, 每个 repeated 字段 length 个元素
+
+    Args:
+        length (int): repeated 字段长度
+
+    Returns:
+        Tuple[Type[BaseModel], _message.Message]: 模型类和填充好的消息
+    """
+    from typing import List
+    from pydantic import create_model
+
+    package = f"bench_repeated{length}"
+    file_proto = _new_file(package)
+    item = file_proto.message_type.add(name="Item")
+    _add_field(item, "name", 1, "TYPE_STRING")
+    _add_field(item, "value", 2, "TYPE_INT64")
+    msg = file_proto.message_type.add(name="Repeated")
+    _add_field(msg, "ids", 1, "TYPE_INT64", repeated=True)
+    _add_field(msg, "tags", 2, "TYPE_STRING", repeated=True)
+    _add_field(msg, "items", 3, "TYPE_MESSAGE", repeated=True, message=f".{package}.Item")
+    item_cls = _item_model(package)
+    model_cls = create_model(f"{package}_Repeated", __module__=__name__,
+                             ids=(List[int], []), tags=(List[str], []), items=(List[item_cls], []))
+    model_cls, msg_cls = _register(file_proto, "Repeated", model_cls)
+    return model_cls, msg_cls(ids=range(length), tags=[f"tag{i}" for i in range(length)],
+                              items=[{"name": f"item{i}", "value": i} for i in range(length)])
+
+
+def make_map(size: int):
+    """构造带 map<string, int64> 和 map<string, Item> 的合成消息, 每个 map size 个键
+
+    Args:
+        size (int): map 键数
+
+    Returns:
+        Tuple[Type[BaseModel], _message.Message]: 模型类和填充好的消息
+    """
+    from typing import Dict
+    from pydantic import create_model
+
+    package = f"bench_map{size}"
+    file_proto = _new_file(package)
+    item = file_proto.message_type.add(name="Item")
+    _add_field(item, "name", 1, "TYPE_STRING")
+    _add_field(item, "value", 2, "TYPE_INT64")
+    msg = file_proto.message_type.add(name="Mapping")
+    for number, (name, value_type, value_message) in enumerate(
+            (("counts", "TYPE_INT64", ""), ("items", "TYPE_MESSAGE", f".{package}.Item")), start=1):
+        entry = msg.nested_type.add(name=f"{name.capitalize()}Entry")
+        entry.options.map_entry = True
+        _add_field(entry, "key", 1, "TYPE_STRING")
+        _add_field(entry, "value", 2, value_type, message=value_message)
+        _add_field(msg, name, number, "TYPE_MESSAGE", repeated=True,
+                   message=f".{package}.Mapping.{entry.name}")
+    item_cls = _item_model(package)
+    model_cls = create_model(f"{package}_Mapping", __module__=__name__,
+                             counts=(Dict[str, int], {}), items=(Dict[str, item_cls], {}))
+    model_cls, msg_cls = _register(file_proto, "Mapping", model_cls)
+    msg = msg_cls(counts={f"k{i}": i for i in range(size)})
+    for i in range(size):
+        msg.items[f"k{i}"].name = f"item{i}"
+        msg.items[f"k{i}"].value = i
+    return model_cls, msg
+
+
+def make_blob(size: int):
+    """构造带一个 size 字节 bytes 字段的合成消息
+
+    Args:
+        size (int): bytes 字段长度
+
+    Returns:
+        Tuple[Type[BaseModel], _message.Message]: 模型类和填充好的消息
+    """
+    from pydantic import create_model
+
+    package = f"bench_blob{size}"
+    file_proto = _new_file(package)
+    msg = file_proto.message_type.add(name="Blob")
+    _add_field(msg, "name", 1, "TYPE_STRING")
+    _add_field(msg, "data", 2, "TYPE_BYTES")
+    model_cls = create_model(f"{package}_Blob", __module__=__name__, name=(str, ""), data=(bytes, b""))
+    model_cls, msg_cls = _register(file_proto, "Blob", model_cls)
+    return model_cls, msg_cls(name="blob", data=b"\x01" * size)
+
+
+def make_events(count: int):
+    """构造有 count 个 Timestamp 字段和一个 Duration 字段的合成事件消息
+
+    Args:
+        count (int): Timestamp 字段数
+
+    Returns:
+        Tuple[Type[BaseModel], _message.Message]: 模型类和填充好的消息
+    """
+    from typing import Optional
+    from pydantic import create_model
+    from google.protobuf import duration_pb2, timestamp_pb2
+
+    package = f"bench_events{count}"
+    file_proto = _new_file(package)
+    file_proto.dependency.extend([timestamp_pb2.DESCRIPTOR.name, duration_pb2.DESCRIPTOR.name])
+    msg = file_proto.message_type.add(name="Event")
+    _add_field(msg, "name", 1, "TYPE_STRING")
+    fields = {"name": (str, "")}
+    for i in range(count):
+        _add_field(msg, f"t{i}", i + 2, "TYPE_MESSAGE", message=".google.protobuf.Timestamp")
+        fields[f"t{i}"] = (Optional[datetime.datetime], None)
+    _add_field(msg, "elapsed", count + 2, "TYPE_MESSAGE", message=".google.protobuf.Duration")
+    fields["elapsed"] = (Optional[datetime.timedelta], None)
+    model_cls = create_model(f"{package}_Event", __module__=__name__, **fields)
+    model_cls, msg_cls = _register(file_proto, "Event", model_cls)
+    event = msg_cls(name="event")
+    for i in range(count):
+        getattr(event, f"t{i}").FromDatetime(datetime.datetime(2024, 7, 21, 8, 30, i, 123456 + i))
+    event.elapsed.FromTimedelta(datetime.timedelta(seconds=90, microseconds=250))
+    return model_cls, event
+
+
+def make_envelope(variants: int):
+    """构造一个 oneof 中有 variants 个子消息成员的合成命令信封, 消息中设置最后一个成员
+
+    Args:
+        variants (int): oneof 成员数
+
+    Returns:
+        Tuple[Type[BaseModel], _message.Message]: 模型类和填充好的消息
+    """
+    from typing import Optional
+    from pydantic import create_model
+
+    package = f"bench_envelope{variants}"
+    file_proto = _new_file(package)
+    item = file_proto.message_type.add(name="Item")
+    _add_field(item, "name", 1, "TYPE_STRING")
+    _add_field(item, "value", 2, "TYPE_INT64")
+    msg = file_proto.message_type.add(name="Envelope")
+    _add_field(msg, "id", 1, "TYPE_STRING")
+    msg.oneof_decl.add(name="payload")
+    item_cls = _item_model(package)
+    fields = {"id": (str, "")}
+    for i in range(variants):
+        _add_field(msg, f"v{i}", i + 2, "TYPE_MESSAGE", message=f".{package}.Item").oneof_index = 0
+        fields[f"v{i}"] = (Optional[item_cls], None)
+    model_cls = create_model(f"{package}_Envelope", __module__=__name__, **fields)
+    model_cls, msg_cls = _register(file_proto, "Envelope", model_cls)
+    return model_cls, msg_cls(id="command", **{f"v{variants - 1}": {"name": "item", "value": 1}})
+
+
+_proto_sets = 0
+
+
+def make_proto_set(files: int, messages: int, fields: int):
+    """构造一组合成的 .proto 文件描述, 用于测量插件 generate_code 的耗时
+
+    每个文件 messages 个消息, 每个消息 fields 个字段(标量, 枚举, Timestamp, repeated, map 轮换),
+    第 i 个文件依赖第 i-1 个文件并引用其中的消息. 每次调用使用不同的包名, 避免与默认 pool 中已有的定义冲突.
+
+    Args:
+        files (int): 文件数
+        messages (int): 每个文件的消息数
+        fields (int): 每个消息的字段数
+
+    Returns:
+        List[descriptor_pb2.FileDescriptorProto]: 按依赖顺序排列的文件描述
+    """
+    from google.protobuf import timestamp_pb2
+
+    global _proto_sets
+    _proto_sets += 1
+    prefix = f"bench_set{_proto_sets}"
+    result = []
+    for f in range(files):
+        package = f"{prefix}.f{f}"
+        file_proto = _new_file(package)
+        file_proto.name = f"{prefix}/file{f}.proto"
+        file_proto.dependency.append(timestamp_pb2.DESCRIPTOR.name)
+        if f:
+            file_proto.dependency.append(result[-1].name)
+        enum = file_proto.enum_type.add(name=f"Kind{f}")
+        for i in range(3):
+            enum.value.add(name=f"KIND{f}_{i}", number=i)
+        for m in range(messages):
+            msg = file_proto.message_type.add(name=f"Msg{f}x{m}")
+            for i in range(fields):
+                number, kind = i + 1, i % 8
+                if kind == 0:
+                    _add_field(msg, f"name{i}", number, "TYPE_STRING")
+                elif kind == 1:
+                    _add_field(msg, f"count{i}", number, "TYPE_INT64")
+                elif kind == 2:
+                    _add_field(msg, f"score{i}", number, "TYPE_DOUBLE")
+                elif kind == 3:
+                    _add_field(msg, f"kind{i}", number, "TYPE_ENUM", message=f".{package}.Kind{f}")
+                elif kind == 4:
+                    _add_field(msg, f"created{i}", number, "TYPE_MESSAGE", message=".google.protobuf.Timestamp")
+                elif kind == 5:
+                    _add_field(msg, f"tags{i}", number, "TYPE_STRING", repeated=True)
+                elif kind == 6 and (m or f):
+                    # 引用本文件的前一个消息, 或者上一个文件的最后一个消息
+                    ref = f".{package}.Msg{f}x{m - 1}" if m else f".{prefix}.f{f - 1}.Msg{f - 1}x{messages - 1}"
+                    _add_field(msg, f"ref{i}", number, "TYPE_MESSAGE", message=ref)
+                else:
+                    entry = msg.nested_type.add(name=f"Attrs{i}Entry")
+                    entry.options.map_entry = True
+                    _add_field(entry, "key", 1, "TYPE_STRING")
+                    _add_field(entry, "value", 2, "TYPE_STRING")
+                    _add_field(msg, f"attrs{i}", number, "TYPE_MESSAGE", repeated=True,
+                               message=f".{package}.Msg{f}x{m}.{entry.name}")
+        result.append(file_proto)
+    return result
+
+
+def build_request(file_descriptors, parameter: str = ""):
+    """由已加载的 FileDescriptor 构造 CodeGeneratorRequest, 依赖文件排在前面
+
+    Args:
+        file_descriptors (List[FileDescriptor]): 需要生成的文件, 例如 [example_pb2.DESCRIPTOR]
+        parameter (str, optional): 插件参数. Defaults to "".
+
+    Returns:
+        plugin_pb2.CodeGeneratorRequest: 请求
+    """
+    from google.protobuf.compiler import plugin_pb2
+
+    request = plugin_pb2.CodeGeneratorRequest(parameter=parameter)
+    seen = set()
+
+    def visit(fd):
+        if fd.name in seen:
+            return
+        seen.add(fd.name)
+        for dep in fd.dependencies:
+            visit(dep)
+        fd.CopyToProto(request.proto_file.add())
+
+    for fd in file_descriptors:
+        visit(fd)
+        request.file_to_generate.append(fd.name)
+    return request
+
+
+def generate_models(package: str, parameter: str = ""):
+    """用插件为 protos/example*.proto 生成模型到 benchmarks 下的临时包并导入
+
+    Args:
+        package (str): 生成的包名, 例如 inline_models
+        parameter (str, optional): 插件参数. Defaults to "".
+
+    Returns:
+        ModuleType: 生成的 example_model 模块
+    """
+    import importlib
+    import example3_pb2
+    from google.protobuf.compiler import plugin_pb2
+    from protobuf_pydantic_gen.main import generate_code
+
+    # 依赖的 constant.proto, example2.proto 也需要生成
+    request = build_request([example_pb2.DESCRIPTOR, example3_pb2.DESCRIPTOR], f"dependencies=true,{parameter}")
+    response = plugin_pb2.CodeGeneratorResponse()
+    generate_code(request, response)
+    if response.error:
+        raise RuntimeError(response.error)
+    out_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), package)
+    os.makedirs(out_dir, exist_ok=True)
+    for file in response.file:
+        with open(os.path.join(out_dir, file.name), "w", encoding="utf-8") as f:
+            f.write(file.content)
+    # Example 是表模型, 同一个 MetaData 中不能重复定义 users 表
+    from sqlmodel import SQLModel
+    SQLModel.metadata.clear()
+    return importlib.import_module(f"{package}.example_model")
@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+'''
+@File    :   run.py
+@Time    :   2024/07/17 14:20:36
+@Desc    :   基准测试套件: 运行转换与代码生成的全部用例, 结果写入 JSON, 并可与上一次结果对比
+
+    python benchmarks/run.py -o results.json
+    python benchmarks/run.py -o new.json --compare results.json --threshold 0.1
+'''
+
+import argparse
+import datetime
+import json
+import platform
+import subprocess
+import sys
+import time
+import timeit
+from typing import Callable, Dict, List, Tuple
+
+from common import (ROOT, make_blob, make_chain, make_envelope, make_events, make_example, make_map, make_proto_set,
+                    make_repeated, make_wide)
+
+import example_pb2
+from google.protobuf import timestamp_pb2
+from google.protobuf.compiler import plugin_pb2
+from models.example_model import Example
+from protobuf_pydantic_gen.ext import model2protobuf, protobuf2model
+
+# (用例名, 函数工厂, 每轮调用次数); 工厂在计时前调用, 负责准备数据
+Case = Tuple[str, Callable[[], Callable[[], object]], int]
+
+
+def _conversion_cases(name: str, model_cls, msg, number: int) -> List[Case]:
+    model = protobuf2model(model_cls, msg)
+    return [
+        (f"model2protobuf/{name}", lambda: lambda: model2protobuf(model, type(msg)()), number),
+        (f"protobuf2model/{name}", lambda: lambda: protobuf2model(model_cls, msg), number),
+        (f"protobuf2model_trusted/{name}", lambda: lambda: protobuf2model(model_cls, msg, trusted=True), number),
+    ]
+
+
+def _generated_cases() -> List[Case]:
+    model = make_example()
+    msg = model.to_protobuf()
+    return [
+        ("generated/Example.to_protobuf", lambda: model.to_protobuf, 2000),
+        ("generated/Example.from_protobuf", lambda: lambda: Example.from_protobuf(msg), 2000),
+        ("generated/Example.from_protobuf_trusted", lambda: lambda: Example.from_protobuf(msg, trusted=True), 2000),
+        ("ext/model2protobuf/Example", lambda: lambda: model2protobuf(model, example_pb2.Example()), 2000),
+        ("ext/protobuf2model/Example", lambda: lambda: protobuf2model(Example, msg), 2000),
+    ]
+
+
+def _synthetic_cases(quick: bool) -> List[Case]:
+    cases = []
+    for width in ((10, 100) if quick else (10, 50, 200)):
+        cases += _conversion_cases(f"width{width}", *make_wide(width), number=max(10, 20000 // width))
+    for depth in ((4, 32) if quick else (4, 16, 64)):
+        cases += _conversion_cases(f"depth{depth}", *make_chain(depth), number=max(10, 10000 // depth))
+    for length in ((10, 1000) if quick else (10, 100, 1000)):
+        cases += _conversion_cases(f"repeated{length}", *make_repeated(length), number=max(5, 5000 // length))
+    for size in ((10, 1000) if quick else (10, 100, 1000)):
+        cases += _conversion_cases(f"map{size}", *make_map(size), number=max(5, 5000 // size))
+    for size in ((1 << 10, 1 << 20) if quick else (1 << 10, 1 << 20, 16 << 20)):
+        cases += _conversion_cases(f"bytes{size}", *make_blob(size), number=max(5, (64 << 20) // size // 64))
+    cases += _conversion_cases("events20", *make_events(20), number=2000)
+    cases += _conversion_cases("envelope40", *make_envelope(40), number=5000)
+    return cases
+
+
+def _generate_code_cases(quick: bool) -> List[Case]:
+    from protobuf_pydantic_gen.main import generate_code
+
+    def factory(files: int, messages: int, fields: int, parameter: str = ""):
+        def prepare():
+            def run():
+                # make_proto_set 每次使用新的包名, 避免重复向默认 pool 注册同名文件
+                request = plugin_pb2.CodeGeneratorRequest(parameter=parameter)
+                timestamp_pb2.DESCRIPTOR.CopyToProto(request.proto_file.add())
+                for file_proto in make_proto_set(files, messages, fields):
+                    request.proto_file.add().CopyFrom(file_proto)
+                    request.file_to_generate.append(file_proto.name)
+                response = plugin_pb2.CodeGeneratorResponse()
+                generate_code(request, response)
+                if response.error:
+                    raise RuntimeError(response.error)
+            return run
+        return prepare
+
+    sets = [(10, 10, 16)] if quick else [(10, 10, 16), (50, 10, 16), (20, 10, 64)]
+    cases = []
+    for files, messages, fields in sets:
+        cases.append((f"generate_code/{files}x{messages}x{fields}", factory(files, messages, fields), 1))
+    files, messages, fields = sets[0]
+    name = f"generate_code/{files}x{messages}x{fields}/inline"
+    cases.append((name, factory(files, messages, fields, "converter=inline"), 1))
+    return cases
+
+
+def collect_cases(quick: bool) -> List[Case]:
+    return _generated_cases() + _synthetic_cases(quick) + _generate_code_cases(quick)
+
+
+def run_case(factory: Callable[[], Callable[[], object]], number: int, repeat: int) -> Dict[str, float]:
+    """运行单个用例
+
+    Returns:
+        Dict[str, float]: best/median 为单次调用耗时(微秒)
+    """
+    func = factory()
+    func()  # 预热: 编译转换计划, 解析消息类等
+    timings = sorted(t / number * 1e6 for t in timeit.repeat(func, number=number, repeat=repeat))
+    return {"best_us": timings[0], "median_us": timings[len(timings) // 2], "number": number, "repeat": repeat}
+
+
+def _metadata() -> Dict[str, str]:
+    import google.protobuf
+    import pydantic
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = ""
+    from google.protobuf.internal import api_implementation
+    return {
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "protobuf": google.protobuf.__version__,
+        "protobuf_backend": api_implementation.Type(),
+        "pydantic": pydantic.__version__,
+    }
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline_path: str, threshold: float) -> List[str]:
+    """与上一次的结果对比, 返回 best 耗时变慢超过 threshold 的用例
+
+    Args:
+        results (Dict[str, Dict[str, float]]): 本次结果
+        baseline_path (str): 上一次 run.py 输出的 JSON
+        threshold (float): 允许的相对变慢比例, 例如 0.1 表示 10%
+
+    Returns:
+        List[str]: 变慢的用例名
+    """
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio = result["best_us"] / baseline[name]["best_us"]
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:<48} {baseline[name]['best_us']:12.2f}us -> {result['best_us']:12.2f}us  x{ratio:5.2f}{flag}")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-o", "--output", help="结果 JSON 文件")
+    parser.add_argument("-k", "--filter", default="", help="只运行名称包含该字符串的用例")
+    parser.add_argument("--repeat", type=int, default=5, help="每个用例的轮数")
+    parser.add_argument("--quick", action="store_true", help="缩小合成用例的规模")
+    parser.add_argument("--compare", help="与该 JSON 结果对比, 有变慢的用例时退出码为 1")
+    parser.add_argument("--threshold", type=float, default=0.1, help="对比时允许的相对变慢比例")
+    args = parser.parse_args(argv)
+
+    results = {}
+    start = time.perf_counter()
+    for name, factory, number in collect_cases(args.quick):
+        if args.filter not in name:
+            continue
+        repeat = args.repeat if number > 1 else max(1, args.repeat // 2)
+        results[name] = run_case(factory, number, repeat)
+        print(f"{name:<48} best {results[name]['best_us']:12.2f}us  median {results[name]['median_us']:12.2f}us")
+    print(f"{len(results)} cases in {time.perf_counter() - start:.1f}s")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"meta": _metadata(), "results": results}, f, indent=2, sort_keys=True)
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regressions over {args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,3 @@
-
 # !/usr/bin/env python
 # -*- encoding: utf-8 -*-
 '''
@@ -8,25 +7,20 @@
 '''
 
 
-from google.protobuf import message as _message, message_factory
-
-from protobuf_pydantic_gen.ext import PydanticModel, model2protobuf, pool, protobuf2model
-
+from google.protobuf import message as _message
+from protobuf_pydantic_gen.ext import PydanticModel, get_message_class, model2protobuf, protobuf2model
 from pydantic import BaseModel, ConfigDict, Field as _Field
-
 from typing import Optional, Type
 
 
 class Example3(BaseModel):
     model_config = ConfigDict(protected_namespaces=())
-
     name: Optional[str] = _Field()
 
     def to_protobuf(self) -> _message.Message:
-        _proto = pool.FindMessageTypeByName("pydantic_example.Example3")
-        _cls: Type[_message.Message] = message_factory.GetMessageClass(_proto)
+        _cls = get_message_class("pydantic_example.Example3")
         return model2protobuf(self, _cls())
 
     @classmethod
-    def from_protobuf(cls: Type[PydanticModel], src: _message.Message) -> PydanticModel:
-        return protobuf2model(cls, src)
+    def from_protobuf(cls: Type[PydanticModel], src: _message.Message, trusted: bool = False) -> PydanticModel:
+        return protobuf2model(cls, src, trusted)
@@ -20,7 +20,7 @@ import constant_pb2 as constant__pb2
 import example2_pb2 as example2__pb2
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\rexample.proto\x12\x10pydantic_example\x1a google/protobuf/descriptor.proto\x1a$protobuf_pydantic_gen/pydantic.proto\x1a\x1fgoogle/protobuf/timestamp.proto\x1a\x19google/protobuf/any.proto\x1a\x0e\x63onstant.proto\x1a\x0e\x65xample2.proto\"U\n\x06Nested\x12K\n\x04name\x18\x01 \x01(\tB=\xaa\xbb\x18\x39\n\x13Name of the example\x12\x08\'ohn Doe\x1a\x08John Doe\"\tfull_name@\x01h\x80\x01\"\xdc\x06\n\x07\x45xample\x12\x41\n\x04name\x18\x01 \x01(\tB3\xaa\xbb\x18/\n\x13Name of the example\x1a\x08John Doe\"\tfull_name@\x01h\x80\x01\x12\x35\n\x03\x61ge\x18\x02 \x01(\x05\x42#\xaa\xbb\x18\x1f\n\x12\x41ge of the example\x1a\x02\x33\x30\"\x05yearsH\x00\x88\x01\x01\x12/\n\x06\x65mails\x18\x03 \x03(\tB\x1f\xaa\xbb\x18\x1b\n\x15\x45mails of the example\x1a\x02[]\x12I\n\x08\x65xamples\x18\t \x03(\x0b\x32\x1a.pydantic_example.Example2B\x1b\xaa\xbb\x18\x17\n\x0eNested message\xa2\x01\x04JSON\x12X\n\x05\x65ntry\x18\x04 \x03(\x0b\x32$.pydantic_example.Example.EntryEntryB#\xaa\xbb\x18\x1f\n\x19Properties of the example\x1a\x02{}\x12\x45\n\x06nested\x18\x08 \x01(\x0b\x32\x18.pydantic_example.NestedB\x1b\xaa\xbb\x18\x17\n\x0eNested message\xa2\x01\x04JSON\x12m\n\ncreated_at\x18\x05 \x01(\x0b\x32\x1a.google.protobuf.TimestampB=\xaa\xbb\x18\x39\n\x1c\x43reation date of the example\x1a\x17\x64\x61tetime.datetime.now()0\x01\x12m\n\x04type\x18\x06 \x01(\x0e\x32\x1d.pydantic_example.ExampleTypeB@\xaa\xbb\x18<\n\x13Type of the example\x1a\x11\x45xampleType.TYPE1\xa2\x01\x11\x45num[ExampleType]\x12\x41\n\x05score\x18\x07 \x01(\x02\x42\x32\xaa\xbb\x18.\n\x14Score of the example\x1a\x03\x30.0Z\x07Integer\x89\x01\x00\x00\x00\x00\x00\x00Y@\x1a\x42\n\nEntryEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12#\n\x05value\x18\x02 \x01(\x0b\x32\x14.google.protobuf.Any:\x02\x38\x01:M\xca\xc1\x18I\n\x05users\x12!\n\x04name\n\x03\x61ge\x12\x06UNIQUE\x1a\x0cuni_name_age\x12\x1b\n\x04name\x12\x07PRIMARY\x1a\nindex_name\x18\x01\x42\x06\n\x04_ageb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\rexample.proto\x12\x10pydantic_example\x1a google/protobuf/descriptor.proto\x1a$protobuf_pydantic_gen/pydantic.proto\x1a\x1fgoogle/protobuf/timestamp.proto\x1a\x19google/protobuf/any.proto\x1a\x0e\x63onstant.proto\x1a\x0e\x65xample2.proto\"U\n\x06Nested\x12K\n\x04name\x18\x01 \x01(\tB=\xaa\xbb\x18\x39\n\x13Name of the example\x12\x08\'ohn Doe\x1a\x08John Doe\"\tfull_name@\x01h\x80\x01\"\xc7\x07\n\x07\x45xample\x12\x41\n\x04name\x18\x01 \x01(\tB3\xaa\xbb\x18/\n\x13Name of the example\x1a\x08John Doe\"\tfull_name@\x01h\x80\x01\x12\x35\n\x03\x61ge\x18\x02 \x01(\x05\x42#\xaa\xbb\x18\x1f\n\x12\x41ge of the example\x1a\x02\x33\x30\"\x05yearsH\x00\x88\x01\x01\x12/\n\x06\x65mails\x18\x03 \x03(\tB\x1f\xaa\xbb\x18\x1b\n\x15\x45mails of the example\x1a\x02[]\x12I\n\x08\x65xamples\x18\t \x03(\x0b\x32\x1a.pydantic_example.Example2B\x1b\xaa\xbb\x18\x17\n\x0eNested message\xa2\x01\x04JSON\x12X\n\x05\x65ntry\x18\x04 \x03(\x0b\x32$.pydantic_example.Example.EntryEntryB#\xaa\xbb\x18\x1f\n\x19Properties of the example\x1a\x02{}\x12\x45\n\x06nested\x18\x08 \x01(\x0b\x32\x18.pydantic_example.NestedB\x1b\xaa\xbb\x18\x17\n\x0eNested message\xa2\x01\x04JSON\x12m\n\ncreated_at\x18\x05 \x01(\x0b\x32\x1a.google.protobuf.TimestampB=\xaa\xbb\x18\x39\n\x1c\x43reation date of the example\x1a\x17\x64\x61tetime.datetime.now()0\x01\x12m\n\x04type\x18\x06 \x01(\x0e\x32\x1d.pydantic_example.ExampleTypeB@\xaa\xbb\x18<\n\x13Type of the example\x1a\x11\x45xampleType.TYPE1\xa2\x01\x11\x45num(ExampleType)\x12\x41\n\x05score\x18\x07 \x01(\x02\x42\x32\xaa\xbb\x18.\n\x14Score of the example\x1a\x03\x30.0Z\x07Integer\x89\x01\x00\x00\x00\x00\x00\x00Y@\x1a\x42\n\nEntryEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12#\n\x05value\x18\x02 \x01(\x0b\x32\x14.google.protobuf.Any:\x02\x38\x01:\xb7\x01\xca\xc1\x18\xb2\x01\n\x05users\x12!\n\x04name\n\x03\x61ge\x12\x06UNIQUE\x1a\x0cuni_name_age\x12\x1b\n\x04name\x12\x07PRIMARY\x1a\nindex_name\x12\'\n\x03\x61ge\n\x05score\x12\x05INDEX\x1a\x12ix_users_age_score\x12>\n\ncreated_at\x12\x05INDEX\x1a\x19ix_users_type2_created_at\"\x0etype = \'TYPE2\'\x18\x01\x42\x06\n\x04_ageb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -46,15 +46,15 @@ if _descriptor._USE_C_DESCRIPTORS == False:
   _globals['_EXAMPLE'].fields_by_name['created_at']._options = None
   _globals['_EXAMPLE'].fields_by_name['created_at']._serialized_options = b'\252\273\0309\n\034Creation date of the example\032\027datetime.datetime.now()0\001'
   _globals['_EXAMPLE'].fields_by_name['type']._options = None
-  _globals['_EXAMPLE'].fields_by_name['type']._serialized_options = b'\252\273\030<\n\023Type of the example\032\021ExampleType.TYPE1\242\001\021Enum[ExampleType]'
+  _globals['_EXAMPLE'].fields_by_name['type']._serialized_options = b'\252\273\030<\n\023Type of the example\032\021ExampleType.TYPE1\242\001\021Enum(ExampleType)'
   _globals['_EXAMPLE'].fields_by_name['score']._options = None
   _globals['_EXAMPLE'].fields_by_name['score']._serialized_options = b'\252\273\030.\n\024Score of the example\032\0030.0Z\007Integer\211\001\000\000\000\000\000\000Y@'
   _globals['_EXAMPLE']._options = None
-  _globals['_EXAMPLE']._serialized_options = b'\312\301\030I\n\005users\022!\n\004name\n\003age\022\006UNIQUE\032\014uni_name_age\022\033\n\004name\022\007PRIMARY\032\nindex_name\030\001'
+  _globals['_EXAMPLE']._serialized_options = b'\312\301\030\262\001\n\005users\022!\n\004name\n\003age\022\006UNIQUE\032\014uni_name_age\022\033\n\004name\022\007PRIMARY\032\nindex_name\022\'\n\003age\n\005score\022\005INDEX\032\022ix_users_age_score\022>\n\ncreated_at\022\005INDEX\032\031ix_users_type2_created_at\"\016type = \'TYPE2\'\030\001'
   _globals['_NESTED']._serialized_start=199
   _globals['_NESTED']._serialized_end=284
   _globals['_EXAMPLE']._serialized_start=287
-  _globals['_EXAMPLE']._serialized_end=1147
+  _globals['_EXAMPLE']._serialized_end=1254
   _globals['_EXAMPLE_ENTRYENTRY']._serialized_start=994
   _globals['_EXAMPLE_ENTRYENTRY']._serialized_end=1060
 # @@protoc_insertion_point(module_scope)
@@ -6,19 +6,22 @@
 @Desc    :
 '''
 
-from ast import mod
-import inspect
-
+import asyncio
+import functools
 import importlib
-from typing import Type, TypeVar, get_args, List, Dict, Any, Set, get_type_hints, Optional, get_origin, Union
-from pydantic import BaseModel
-from datetime import datetime
+import threading
+import time
+from typing import (Callable, Iterable, Iterator, AsyncIterable, AsyncIterator, Type, TypeVar, get_args, List, Dict,
+                    Any, Optional, Tuple, get_origin, Union, Annotated)
+from pydantic import BaseModel, WrapSerializer, WrapValidator
+from datetime import datetime, timedelta, timezone, tzinfo
 from enum import Enum
-from sqlmodel import SQLModel
 from google.protobuf.json_format import ParseDict
 from google.protobuf import message as _message
 from google.protobuf.json_format import MessageToDict
-from google.protobuf import descriptor_pool, message_factory, descriptor_pb2
+from google.protobuf import descriptor_pool, descriptor_pb2, message_factory
+from google.protobuf import any_pb2, field_mask_pb2, struct_pb2, wrappers_pb2
+from google.protobuf.duration_pb2 import Duration
 from google.protobuf.timestamp_pb2 import Timestamp
 
 
@@ -26,7 +29,229 @@ pool = descriptor_pool.Default()
 
 ProtobufMessage = TypeVar("ProtobufMessage", bound="_message.Message")
 PydanticModel = TypeVar("PydanticModel", bound="BaseModel")
-PySQLModel = TypeVar("PySQLModel", bound="SQLModel")
+
+TO_PROTOBUF = "to_protobuf"
+FROM_PROTOBUF = "from_protobuf"
+FROM_PROTOBUF_TRUSTED = "from_protobuf_trusted"
+
+
+def __getattr__(name: str):
+    # 旧版本生成的表模型从这里导入 PySQLModel, 访问时才导入 sqlmodel
+    if name == "PySQLModel":
+        from .orm import PySQLModel
+        return PySQLModel
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class ConversionPlan:
+    """(模型类, 消息描述符) 编译后的转换计划, 每个组合只编译一次
+
+    Args:
+        model_cls (Type[BaseModel]): 模型类
+        descriptor (Descriptor): 消息描述符
+        direction (str): TO_PROTOBUF, FROM_PROTOBUF 或 FROM_PROTOBUF_TRUSTED
+        steps (List[Tuple[str, Callable]]): 按字段顺序排列的 (字段名, 转换函数)
+        writers (Dict[str, Callable], optional): 所有描述符字段的写入函数, 用于 model_extra
+        construct (Callable, optional): 由字段 dict 构造模型的函数, 默认为 model_cls(**values)
+        oneofs (list, optional): oneof 成员不在 steps 中, 单独按组转换.
+            TO_PROTOBUF 时为 [(oneof 名, [(字段名, 写入函数)])], 其他方向为 [(oneof 名, {字段名: 读取函数})]
+    """
+
+    def __init__(self, model_cls, descriptor, direction: str, steps: List[Tuple[str, Callable]],
+                 writers=None, construct=None, oneofs: list = None):
+        self.model_cls = model_cls
+        self.descriptor = descriptor
+        self.direction = direction
+        self.steps = steps
+        self.writers = writers or {}
+        self.construct = construct or (lambda values: model_cls(**values))
+        self.oneofs = oneofs or []
+        # 读取时未设置的 oneof 成员为 None
+        self.oneof_defaults = {}
+        if direction != TO_PROTOBUF:
+            self.oneof_defaults = {name: None for _, readers in self.oneofs for name in readers}
+
+    @property
+    def fields(self) -> List[str]:
+        if self.direction == TO_PROTOBUF:
+            members = [name for _, group in self.oneofs for name, _ in group]
+        else:
+            members = list(self.oneof_defaults)
+        return [name for name, _ in self.steps] + members
+
+    def __repr__(self):
+        return (f"ConversionPlan({self.model_cls.__name__}, {self.descriptor.full_name}, "
+                f"{self.direction}, {self.fields})")
+
+
+# metrics 回调: callback(消息全名, 方向, 转换耗时秒, 构造/校验耗时秒, 消息字节数, 是否抛出异常)
+MetricsCallback = Callable[[str, str, float, float, int, bool], None]
+
+
+class ConversionMetrics:
+    """按消息全名和方向(TO_PROTOBUF/FROM_PROTOBUF)统计转换调用, 默认关闭
+
+    关闭时转换函数只多一次 enabled 属性检查. 开启后记录调用次数, 转换耗时,
+    from_protobuf 中构造模型(pydantic 校验)的耗时, 异常次数, 以及(track_bytes 时)消息的 ByteSize.
+    嵌套消息的转换会单独记录, 同时计入外层消息的转换耗时.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.track_bytes = False
+        self.callback: Optional[MetricsCallback] = None
+        self._stats: Dict[Tuple[str, str], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def enable(self, callback: Optional[MetricsCallback] = None, track_bytes: bool = False) -> None:
+        """开启统计
+
+        Args:
+            callback (Optional[MetricsCallback], optional): 每次调用后触发, 用于转发到 Prometheus/OpenTelemetry 等.
+                Defaults to None.
+            track_bytes (bool, optional): 是否统计消息字节数, 需要额外计算一次 ByteSize. Defaults to False.
+        """
+        self.callback = callback
+        self.track_bytes = track_bytes
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+    def snapshot(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """返回当前统计的副本
+
+        Returns:
+            Dict[str, Dict[str, Dict[str, float]]]: {消息全名: {方向: {calls, errors, seconds, validation_seconds, bytes}}}
+        """
+        result: Dict[str, Dict[str, Dict[str, float]]] = {}
+        with self._lock:
+            for (full_name, direction), (calls, errors, seconds, validation, size) in self._stats.items():
+                result.setdefault(full_name, {})[direction] = {
+                    "calls": int(calls),
+                    "errors": int(errors),
+                    "seconds": seconds,
+                    "validation_seconds": validation,
+                    "bytes": int(size),
+                }
+        return result
+
+    def record(self, full_name: str, direction: str, seconds: float, validation_seconds: float = 0.0,
+               size: int = 0, error: bool = False) -> None:
+        with self._lock:
+            stats = self._stats.get((full_name, direction))
+            if stats is None:
+                stats = self._stats[(full_name, direction)] = [0, 0, 0.0, 0.0, 0]
+            stats[0] += 1
+            stats[1] += error
+            stats[2] += seconds
+            stats[3] += validation_seconds
+            stats[4] += size
+        callback = self.callback
+        if callback is not None:
+            callback(full_name, direction, seconds, validation_seconds, size, error)
+
+    @staticmethod
+    def start() -> float:
+        return time.perf_counter()
+
+    def to_protobuf(self, proto: _message.Message, fill: Callable[..., _message.Message], *args) -> _message.Message:
+        """计时执行 fill(*args), 结果消息即 proto"""
+        start = time.perf_counter()
+        try:
+            fill(*args)
+        except Exception:
+            self.record(proto.DESCRIPTOR.full_name, TO_PROTOBUF, time.perf_counter() - start, error=True)
+            raise
+        elapsed = time.perf_counter() - start
+        self.record(proto.DESCRIPTOR.full_name, TO_PROTOBUF, elapsed, size=proto.ByteSize() if self.track_bytes else 0)
+        return proto
+
+    def read_failed(self, src: _message.Message, start: float) -> None:
+        """from_protobuf 在 start 之后读取字段时抛出异常(例如嵌套消息转换失败), 记为一次出错的调用"""
+        size = src.ByteSize() if self.track_bytes else 0
+        self.record(src.DESCRIPTOR.full_name, FROM_PROTOBUF, time.perf_counter() - start, size=size, error=True)
+
+    def from_protobuf(self, src: _message.Message, start: float, construct: Callable[..., BaseModel], *args):
+        """字段已经在 start 之后读取完成, 计时执行 construct(*args) 构造模型
+
+        Args:
+            src (_message.Message): 源消息
+            start (float): 开始读取字段时的 start()
+            construct (Callable[..., BaseModel]): 构造模型的函数, 其耗时计为 validation_seconds
+        """
+        read = time.perf_counter()
+        full_name = src.DESCRIPTOR.full_name
+        size = src.ByteSize() if self.track_bytes else 0
+        try:
+            model = construct(*args)
+        except Exception:
+            self.record(full_name, FROM_PROTOBUF, read - start, time.perf_counter() - read, size, True)
+            raise
+        self.record(full_name, FROM_PROTOBUF, read - start, time.perf_counter() - read, size)
+        return model
+
+
+conversion_metrics = ConversionMetrics()
+
+
+def enable_metrics(callback: Optional[MetricsCallback] = None, track_bytes: bool = False) -> None:
+    """开启转换统计, 见 ConversionMetrics.enable"""
+    conversion_metrics.enable(callback, track_bytes)
+
+
+def disable_metrics() -> None:
+    """关闭转换统计, 已有的统计保留"""
+    conversion_metrics.disable()
+
+
+def metrics_snapshot() -> Dict[str, Dict[str, Dict[str, float]]]:
+    """返回转换统计, 见 ConversionMetrics.snapshot"""
+    return conversion_metrics.snapshot()
+
+
+def reset_metrics() -> None:
+    """清空转换统计"""
+    conversion_metrics.reset()
+
+
+_plans: Dict[Tuple[str, type, Any], ConversionPlan] = {}
+_constructors: Dict[type, Callable[[Dict[str, Any]], BaseModel]] = {}
+_object_setattr = object.__setattr__
+
+
+@functools.lru_cache(maxsize=None)
+def get_message_class(full_name: str) -> Type[_message.Message]:
+    """按消息全名获取消息类, 结果在进程内缓存, 供生成的 to_protobuf 和 unpack_any 使用
+
+    缓存不放在模型类上: 读取 pydantic 模型的类属性要经过元类, 比查询模块级的缓存更慢
+
+    Args:
+        full_name (str): 消息全名, 例如 pydantic_example.Example
+
+    Returns:
+        Type[_message.Message]: 消息类
+    """
+    return message_factory.GetMessageClass(pool.FindMessageTypeByName(full_name))
+
+
+def import_lazy_types(namespace: Dict[str, Any], package: str, types: Dict[str, str]) -> None:
+    """把生成模块中延迟导入的模型类加入模块命名空间, 供 model_rebuild 解析字符串前向引用
+
+    Args:
+        namespace (Dict[str, Any]): 生成模块的 globals()
+        package (str): 生成模块所在的包, 用于解析相对模块名
+        types (Dict[str, str]): {类名: 相对模块名}, 例如 {"Example2": ".example2_model"};
+            以别名导入时为 "模块:原类名", 例如 {"ShopItem": ".shop_model:Item"}
+    """
+    for name, module in types.items():
+        if name not in namespace:
+            module, _, attr = module.partition(":")
+            namespace[name] = getattr(importlib.import_module(module, package), attr or name)
 
 
 def scalar_map_to_dict(scalar_map):
@@ -38,73 +263,464 @@ def is_map(fd):
     return fd.type == fd.TYPE_MESSAGE and fd.message_type.has_options and fd.message_type.GetOptions().map_entry
 
 
-def model2protobuf(model: SQLModel, proto: _message.Message) -> _message.Message:
-    def _convert_value(fd, value):
-        if value is None:
-            return _get_default_value(fd)
-        if fd.type == fd.TYPE_ENUM:
-            if isinstance(value, str):
-                return value
-            if isinstance(value, int):
-                return fd.enum_type.values_by_number[int(value)].name
-            if isinstance(value, Enum):
-                return value.name
-
-        elif fd.type == fd.TYPE_MESSAGE:
-            if fd.message_type.full_name == Timestamp.DESCRIPTOR.full_name:
-                if not value:
-                    return None
-                ts = Timestamp()
-                if isinstance(value, datetime):
-                    ts.FromDatetime(value)
-                elif isinstance(value, str):
-                    dt = datetime.fromisoformat(value)
-
-                    ts.FromDatetime(dt)
-                return ts.ToJsonString()
-            elif fd.message_type.has_options and fd.message_type.GetOptions().map_entry:
-
-                # Check if the key and value types are both strings
-                # key_field = fd.message_type.fields_by_name['key']
-                value_field = fd.message_type.fields_by_name['value']
-                # key_type = key_field.fields_by_name['key'].type
-                value_type = fd.message_type.fields_by_name['value'].type
-                if value_type == value_field.TYPE_STRING:
-                    return scalar_map_to_dict(value)
-                else:
-                    nested_proto = pool.FindMessageTypeByName(
-                        fd.message_type.full_name)
-                    nested_cls = message_factory.GetMessageClass(nested_proto)
-                    return {k: MessageToDict(model2protobuf(v, nested_cls())) for k, v in value.items()}
-            else:
-                nested_proto = pool.FindMessageTypeByName(
-                    fd.message_type.full_name)
-                nested_cls = message_factory.GetMessageClass(nested_proto)
-                return MessageToDict(model2protobuf(value, nested_cls()))
+def _is_timestamp(fd) -> bool:
+    return fd.type == fd.TYPE_MESSAGE and fd.message_type.full_name == Timestamp.DESCRIPTOR.full_name
+
+
+def _to_enum_number(fd, value) -> int:
+    if isinstance(value, str):
+        enum_value = fd.enum_type.values_by_name.get(value)
+        return enum_value.number if enum_value is not None else int(value)
+    if isinstance(value, int):
+        return int(value)
+    if isinstance(value, Enum):
+        return fd.enum_type.values_by_name[value.name].number
+    return value
+
+
+def _scalar_converter(fd) -> Callable[[Any], Any]:
+    if fd.type == fd.TYPE_ENUM:
+        return lambda value: _to_enum_number(fd, value)
+    if fd.type == fd.TYPE_BYTES:
+        return to_bytes
+    return None
+
+
+def to_bytes(value) -> bytes:
+    """把 bytes 字段的值转换为 protobuf 接受的 bytes
+
+    bytes 原样返回, 不复制; memoryview/bytearray 等 buffer 对象 protobuf 不接受,
+    在这里复制一次. 整个转换过程不经过 base64.
+
+    Args:
+        value (Any): bytes 或者支持 buffer 协议的对象
+
+    Returns:
+        bytes: 可以直接赋值给 bytes 字段的值
+    """
+    if value.__class__ is bytes:
+        return value
+    return bytes(value)
+
+
+def _keep_buffer(value, handler):
+    # bytearray/memoryview 原样保存在模型中, 到 to_protobuf 时才复制; 其他值按 bytes 校验(str 编码为 utf-8)
+    if isinstance(value, (bytearray, memoryview)):
+        return value
+    return handler(value)
+
+
+BytesLike = Annotated[bytes, WrapValidator(_keep_buffer),
+                      WrapSerializer(lambda value, handler: handler(to_bytes(value)))]
+"""生成模型中 bytes 字段的类型: 校验时接受 bytes, bytearray 和 memoryview, 序列化时按 bytes 输出"""
+
+
+def enum_number(enum_cls: Type[Enum], value) -> int:
+    """把生成的枚举成员/名称/数值转换为 protobuf 枚举数值
+
+    Args:
+        enum_cls (Type[Enum]): 生成的枚举类, 成员值即 protobuf 枚举数值
+        value (Any): 枚举成员, 成员名或者数值
+
+    Returns:
+        int: 枚举数值
+    """
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, str):
+        return enum_cls[value].value
+    return value
+
+
+_EPOCH = datetime(1970, 1, 1)
+_EPOCH_UTC = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_timestamp_tz: Optional[tzinfo] = None
+
+
+def set_timestamp_timezone(tz: Optional[tzinfo]) -> None:
+    """设置 Timestamp 与 datetime 转换使用的时区
+
+    None(默认)时读取得到 UTC 的 naive datetime, 写入的 naive datetime 按 UTC 解释;
+    设置时区后读取得到该时区的 aware datetime, 写入的 naive datetime 按该时区解释.
+    aware datetime 写入时总是按自身的时区换算.
+
+    Args:
+        tz (Optional[tzinfo]): 时区, 例如 datetime.timezone.utc 或 zoneinfo.ZoneInfo("Asia/Shanghai")
+    """
+    global _timestamp_tz
+    _timestamp_tz = tz
+
+
+def get_timestamp_timezone() -> Optional[tzinfo]:
+    """返回 set_timestamp_timezone 设置的时区"""
+    return _timestamp_tz
+
+
+def timestamp_to_datetime(ts: Timestamp) -> datetime:
+    """直接由 seconds/nanos 构造 datetime, 不经过 RFC 3339 字符串, 纳秒截断为微秒
+
+    Args:
+        ts (Timestamp): 消息
+
+    Returns:
+        datetime: set_timestamp_timezone 未设置时为 UTC 的 naive datetime, 否则为该时区的 aware datetime
+    """
+    delta = timedelta(0, ts.seconds, ts.nanos // 1000)
+    if _timestamp_tz is None:
+        return _EPOCH + delta
+    return (_EPOCH_UTC + delta).astimezone(_timestamp_tz)
+
+
+def fill_timestamp(ts: Timestamp, value) -> None:
+    """把 datetime(或 ISO 8601 字符串)直接写入 Timestamp 的 seconds/nanos
+
+    Args:
+        ts (Timestamp): 目标消息
+        value (Union[datetime, str]): naive datetime 按 set_timestamp_timezone 设置的时区(默认 UTC)解释
+    """
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    elif not isinstance(value, datetime):
+        return
+    if value.tzinfo is None:
+        if _timestamp_tz is None:
+            delta = value - _EPOCH
         else:
-            return value
-    if isinstance(model, dict):
-        d = model
+            # 等价于 value.replace(tzinfo=_timestamp_tz) - _EPOCH_UTC, 避免构造 aware datetime
+            delta = value - _EPOCH - _timestamp_tz.utcoffset(value)
     else:
-        d = model.model_dump()
-        for fd in proto.DESCRIPTOR.fields:
-            if fd.name in d:
-                field_value = getattr(model, fd.name)
-                if fd.label == fd.LABEL_REPEATED and not is_map(fd):
-                    d[fd.name] = [_convert_value(fd, item)
-                                  for item in field_value]
-                else:
-                    d[fd.name] = _convert_value(fd, field_value)
-    proto = ParseDict(d, proto)
-    return proto
+        delta = value - _EPOCH_UTC
+    ts.seconds = delta.days * 86400 + delta.seconds
+    ts.nanos = delta.microseconds * 1000
+
+
+def duration_to_timedelta(duration: Duration) -> timedelta:
+    """直接由 seconds/nanos 构造 timedelta, 纳秒向零截断为微秒
+
+    Args:
+        duration (Duration): 消息
+
+    Returns:
+        timedelta: 时长
+    """
+    nanos = duration.nanos
+    return timedelta(0, duration.seconds, nanos // 1000 if nanos >= 0 else -(-nanos // 1000))
+
+
+def fill_duration(duration: Duration, value) -> None:
+    """把 timedelta(或秒数)写入 Duration, seconds 与 nanos 同号
+
+    Args:
+        duration (Duration): 目标消息
+        value (Union[timedelta, int, float]): 时长
+    """
+    if not isinstance(value, timedelta):
+        value = timedelta(seconds=value)
+    seconds = value.days * 86400 + value.seconds
+    micros = value.microseconds
+    if seconds < 0 and micros:
+        seconds += 1
+        micros -= 1000000
+    duration.seconds = seconds
+    duration.nanos = micros * 1000
+
+
+def wrapper_value(msg: _message.Message) -> Any:
+    """读取 Int64Value/StringValue 等包装类型的值, 字段未设置时由调用方返回 None"""
+    return msg.value
+
+
+def fill_wrapper(msg: _message.Message, value) -> None:
+    """写入 Int64Value/StringValue 等包装类型的值, BytesValue 见 fill_bytes_wrapper"""
+    msg.value = value
+
+
+def fill_bytes_wrapper(msg: wrappers_pb2.BytesValue, value) -> None:
+    msg.value = to_bytes(value)
+
+
+def value_to_python(value: struct_pb2.Value) -> Any:
+    """把 google.protobuf.Value 直接转换为 Python 值
+
+    Args:
+        value (struct_pb2.Value): 消息
+
+    Returns:
+        Any: None, bool, float, str, dict 或 list; 数值按 JSON 语义为 float
+    """
+    kind = value.WhichOneof("kind")
+    if kind == "struct_value":
+        return struct_to_dict(value.struct_value)
+    if kind == "list_value":
+        return list_value_to_list(value.list_value)
+    if kind is None or kind == "null_value":
+        return None
+    return getattr(value, kind)
+
+
+def struct_to_dict(struct: struct_pb2.Struct) -> Dict[str, Any]:
+    """把 google.protobuf.Struct 直接转换为 dict"""
+    return {k: value_to_python(v) for k, v in struct.fields.items()}
+
+
+def list_value_to_list(list_value: struct_pb2.ListValue) -> List[Any]:
+    """把 google.protobuf.ListValue 直接转换为 list"""
+    return [value_to_python(v) for v in list_value.values]
+
+
+def fill_value(msg: struct_pb2.Value, value) -> None:
+    """把 Python 值写入 google.protobuf.Value
+
+    Args:
+        msg (struct_pb2.Value): 目标消息
+        value (Any): None, bool, int, float, str, dict, list/tuple 或者 pydantic 模型(按 JSON 模式导出)
+
+    Raises:
+        TypeError: 无法表示为 Value 的值
+    """
+    cls = value.__class__
+    # 先按精确类型处理常见的 JSON 值, 子类(IntEnum, OrderedDict 等)走下面的 isinstance 分支
+    if cls is str:
+        msg.string_value = value
+    elif cls is int or cls is float:
+        msg.number_value = value
+    elif cls is dict:
+        msg.struct_value.SetInParent()
+        fill_struct(msg.struct_value, value)
+    elif value is None:
+        msg.null_value = struct_pb2.NULL_VALUE
+    elif isinstance(value, bool):
+        msg.bool_value = value
+    elif isinstance(value, (int, float)):
+        msg.number_value = value
+    elif isinstance(value, str):
+        msg.string_value = value
+    elif isinstance(value, dict):
+        msg.struct_value.SetInParent()
+        fill_struct(msg.struct_value, value)
+    elif isinstance(value, (list, tuple)):
+        msg.list_value.SetInParent()
+        fill_list_value(msg.list_value, value)
+    elif isinstance(value, BaseModel):
+        msg.struct_value.SetInParent()
+        fill_struct(msg.struct_value, value.model_dump(mode="json"))
+    else:
+        raise TypeError(f"cannot convert {type(value).__name__} to google.protobuf.Value")
+
+
+def fill_struct(msg: struct_pb2.Struct, value: Dict[str, Any]) -> None:
+    """用 dict 替换 google.protobuf.Struct 的内容"""
+    msg.Clear()
+    fields = msg.fields
+    for k, v in value.items():
+        fill_value(fields[k], v)
+
+
+def fill_list_value(msg: struct_pb2.ListValue, value: Iterable[Any]) -> None:
+    """用 list 替换 google.protobuf.ListValue 的内容"""
+    msg.Clear()
+    values = msg.values
+    for v in value:
+        fill_value(values.add(), v)
+
+
+def field_mask_to_list(msg: field_mask_pb2.FieldMask) -> List[str]:
+    return list(msg.paths)
+
+
+def fill_field_mask(msg: field_mask_pb2.FieldMask, value) -> None:
+    """写入 FieldMask, value 为路径列表或者 JSON 格式的逗号分隔字符串"""
+    if isinstance(value, str):
+        value = value.split(",") if value else []
+    del msg.paths[:]
+    msg.paths.extend(value)
+
+
+def any_to_dict(msg: any_pb2.Any) -> Dict[str, Any]:
+    """把 google.protobuf.Any 读取为带 @type 的 JSON dict, 与表模型的 JSON 列兼容"""
+    return MessageToDict(msg)
+
+
+def pack_any(value) -> any_pb2.Any:
+    """把消息, 生成的模型(通过 to_protobuf)或者带 @type 的 JSON dict 打包为 google.protobuf.Any
+
+    Args:
+        value (Any): protobuf 消息, 带 to_protobuf 方法的模型, Any 消息或 dict
+
+    Returns:
+        any_pb2.Any: 打包后的消息
+    """
+    msg = any_pb2.Any()
+    fill_any(msg, value)
+    return msg
+
+
+def unpack_any(msg: any_pb2.Any) -> _message.Message:
+    """按 type_url 从默认 pool 中找到消息类并解包
+
+    Args:
+        msg (any_pb2.Any): 打包的消息
+
+    Returns:
+        _message.Message: 解包后的消息
+    """
+    inner = get_message_class(msg.TypeName())()
+    if not msg.Unpack(inner):
+        raise ValueError(f"cannot unpack {msg.type_url}")
+    return inner
+
+
+def fill_any(msg: any_pb2.Any, value) -> None:
+    """写入 google.protobuf.Any, 消息和模型直接 Pack, 只有 dict 按 JSON 格式解析
+
+    Raises:
+        TypeError: 无法打包的值
+    """
+    if isinstance(value, _message.Message):
+        if value.DESCRIPTOR.full_name == any_pb2.Any.DESCRIPTOR.full_name:
+            msg.CopyFrom(value)
+        else:
+            msg.Pack(value)
+    elif isinstance(value, dict):
+        ParseDict(value, msg)
+    elif hasattr(value, "to_protobuf"):
+        msg.Pack(value.to_protobuf())
+    else:
+        raise TypeError(f"cannot pack {type(value).__name__} into google.protobuf.Any")
+
+
+_WRAPPER_TYPES = (wrappers_pb2.DoubleValue, wrappers_pb2.FloatValue, wrappers_pb2.Int64Value,
+                  wrappers_pb2.UInt64Value, wrappers_pb2.Int32Value, wrappers_pb2.UInt32Value,
+                  wrappers_pb2.BoolValue, wrappers_pb2.StringValue, wrappers_pb2.BytesValue)
+
+# 直接转换的 well-known 类型: 消息全名 -> 读取函数/写入函数.
+# Any 读取为带 @type 的 JSON dict, 与表模型的 JSON 列兼容; 需要消息时用 unpack_any(pack_any(value))
+_WELL_KNOWN_READERS: Dict[str, Callable[[_message.Message], Any]] = {
+    Timestamp.DESCRIPTOR.full_name: timestamp_to_datetime,
+    Duration.DESCRIPTOR.full_name: duration_to_timedelta,
+    struct_pb2.Struct.DESCRIPTOR.full_name: struct_to_dict,
+    struct_pb2.Value.DESCRIPTOR.full_name: value_to_python,
+    struct_pb2.ListValue.DESCRIPTOR.full_name: list_value_to_list,
+    field_mask_pb2.FieldMask.DESCRIPTOR.full_name: field_mask_to_list,
+    any_pb2.Any.DESCRIPTOR.full_name: any_to_dict,
+}
+_WELL_KNOWN_FILLERS: Dict[str, Callable[[_message.Message, Any], None]] = {
+    Timestamp.DESCRIPTOR.full_name: fill_timestamp,
+    Duration.DESCRIPTOR.full_name: fill_duration,
+    struct_pb2.Struct.DESCRIPTOR.full_name: fill_struct,
+    struct_pb2.Value.DESCRIPTOR.full_name: fill_value,
+    struct_pb2.ListValue.DESCRIPTOR.full_name: fill_list_value,
+    field_mask_pb2.FieldMask.DESCRIPTOR.full_name: fill_field_mask,
+    any_pb2.Any.DESCRIPTOR.full_name: fill_any,
+}
+for _wrapper in _WRAPPER_TYPES:
+    _WELL_KNOWN_READERS[_wrapper.DESCRIPTOR.full_name] = wrapper_value
+    _WELL_KNOWN_FILLERS[_wrapper.DESCRIPTOR.full_name] = fill_wrapper
+_WELL_KNOWN_FILLERS[wrappers_pb2.BytesValue.DESCRIPTOR.full_name] = fill_bytes_wrapper
+
+
+def fill_message(msg: _message.Message, value) -> None:
+    """把一个嵌套值直接写入已经存在的子消息
+
+    Args:
+        msg (_message.Message): 目标子消息(字段容器中的实例)
+        value (Any): pydantic 模型、dict 或者 well-known 类型对应的 Python 值
+    """
+    fill = _WELL_KNOWN_FILLERS.get(msg.DESCRIPTOR.full_name)
+    if fill is not None:
+        fill(msg, value)
+    elif isinstance(value, dict):
+        # 没有对应模型的消息, dict 值按 JSON 格式解析
+        ParseDict(value, msg)
+    else:
+        model2protobuf(value, msg)
+
+
+def _compile_writer(fd) -> Callable[[_message.Message, Any], None]:
+    """为单个字段生成写入函数 write(proto, value)
+
+    Args:
+        fd (FieldDescriptor): 字段描述符
+
+    Returns:
+        Callable[[_message.Message, Any], None]: 写入函数
+    """
+    name = fd.name
+    if is_map(fd):
+        value_fd = fd.message_type.fields_by_name['value']
+        if value_fd.type == value_fd.TYPE_MESSAGE:
+            fill = _WELL_KNOWN_FILLERS.get(value_fd.message_type.full_name, fill_message)
+
+            def write(proto, value):
+                proto.ClearField(name)
+                if value:
+                    container = getattr(proto, name)
+                    for k, v in value.items():
+                        fill(container[k], v)
+            return write
+        convert = _scalar_converter(value_fd)
+
+        def write(proto, value):
+            proto.ClearField(name)
+            if value:
+                if convert is not None:
+                    value = {k: convert(v) for k, v in value.items()}
+                getattr(proto, name).update(value)
+        return write
+
+    if fd.label == fd.LABEL_REPEATED:
+        if fd.type == fd.TYPE_MESSAGE:
+            fill = _WELL_KNOWN_FILLERS.get(fd.message_type.full_name, fill_message)
+
+            def write(proto, value):
+                proto.ClearField(name)
+                if value:
+                    container = getattr(proto, name)
+                    for item in value:
+                        fill(container.add(), item)
+            return write
+        convert = _scalar_converter(fd)
+
+        def write(proto, value):
+            proto.ClearField(name)
+            if value:
+                if convert is not None:
+                    value = [convert(item) for item in value]
+                getattr(proto, name).extend(value)
+        return write
+
+    if _is_timestamp(fd):
+        fill = _WELL_KNOWN_FILLERS[Timestamp.DESCRIPTOR.full_name]
+
+        def write(proto, value):
+            if not value:
+                proto.ClearField(name)
+                return
+            fill(getattr(proto, name), value)
+        return write
 
+    if fd.type == fd.TYPE_MESSAGE:
+        fill = _WELL_KNOWN_FILLERS.get(fd.message_type.full_name, fill_message)
 
-def _get_class_from_path(module_path, class_name):
-    # 动态导入模块
-    module = importlib.import_module(module_path)
-    # 获取类对象
-    cls = getattr(module, class_name)
-    return cls
+        def write(proto, value):
+            if value is None:
+                proto.ClearField(name)
+                return
+            sub = getattr(proto, name)
+            sub.SetInParent()
+            fill(sub, value)
+        return write
+
+    default = _get_default_value(fd)
+    convert = _scalar_converter(fd)
+
+    def write(proto, value):
+        if value is None:
+            value = default
+        elif convert is not None:
+            value = convert(value)
+        setattr(proto, name, value)
+    return write
 
 
 def _get_detailed_type(attr_type: Type) -> Type:
@@ -150,10 +766,7 @@ def _get_default_value(fd: descriptor_pb2.FieldDescriptorProto) -> Any:
     elif fd.type == descriptor_pb2.FieldDescriptorProto.TYPE_BOOL:
         return False
     elif fd.type in [descriptor_pb2.FieldDescriptorProto.TYPE_DOUBLE,
-                     descriptor_pb2.FieldDescriptorProto.TYPE_FIXED32,
-                     descriptor_pb2.FieldDescriptorProto.TYPE_FIXED64,
                      descriptor_pb2.FieldDescriptorProto.TYPE_FLOAT,
-
                      ]:
         return 0.00
     elif fd.type in [descriptor_pb2.FieldDescriptorProto.TYPE_INT32,
@@ -161,78 +774,660 @@ def _get_default_value(fd: descriptor_pb2.FieldDescriptorProto) -> Any:
                      descriptor_pb2.FieldDescriptorProto.TYPE_UINT32,
                      descriptor_pb2.FieldDescriptorProto.TYPE_UINT64,
                      descriptor_pb2.FieldDescriptorProto.TYPE_SINT32,
-                     descriptor_pb2.FieldDescriptorProto.TYPE_SINT64
+                     descriptor_pb2.FieldDescriptorProto.TYPE_SINT64,
+                     descriptor_pb2.FieldDescriptorProto.TYPE_FIXED32,
+                     descriptor_pb2.FieldDescriptorProto.TYPE_FIXED64,
+                     descriptor_pb2.FieldDescriptorProto.TYPE_SFIXED32,
+                     descriptor_pb2.FieldDescriptorProto.TYPE_SFIXED64,
                      ]:
         return 0
     else:
         return None
 
 
-def _get_model_cls_by_field(model_cls: Type[SQLModel], field_name: str) -> Type[SQLModel]:
-    # 获取类属性的类型注释
-    annotations = model_cls.__annotations__
-    attr_type = annotations.get(field_name)
-    typ = _get_detailed_type(attr_type)
-    module = typ.__module__
-    cls = typ.__name__
-    return _get_class_from_path(module, cls)
+def _get_model_cls_by_field(model_cls: Type[BaseModel], field_name: str) -> Type[BaseModel]:
+    # 从 pydantic 已解析的字段注解中取出嵌套类型, 包含继承来的字段
+    field = model_cls.model_fields.get(field_name)
+    if field is None:
+        return None
+    return _get_detailed_type(field.annotation)
 
 
-def protobuf2model(model_cls: Type[SQLModel], proto: _message.Message) -> SQLModel:
-    def _convert_value(fd, value, model_cls):
-        if value is None:
-            return None
-        if fd.type == fd.TYPE_ENUM:
-            return value
-        elif fd.type == fd.TYPE_MESSAGE:
+def _message_reader(fd, model_cls: Type[BaseModel], trusted: bool = False) -> Callable[[_message.Message], Any]:
+    """返回读取子消息值的函数, 按子消息类型在编译时选定
 
-            if fd.message_type.full_name == Timestamp.DESCRIPTOR.full_name:
-                if value:
-                    ts = Timestamp()
-                    ts.FromJsonString(value)
-                    return ts.ToDatetime()
-            elif fd.message_type.has_options and fd.message_type.GetOptions().map_entry:
-                if not value:
-                    return {}
-                return {
-                    k: _convert_value(
-                        fd.message_type.fields_by_name['value'],
-                        v,
-                        model_cls) for k,
-                    v in value.items()}
-            else:
-                nested_proto = pool.FindMessageTypeByName(
-                    fd.message_type.full_name)
-                nested_cls = message_factory.GetMessageClass(nested_proto)
-                nested_instance = nested_cls()
-                model_cls = _get_model_cls_by_field(model_cls, fd.name)
-                if fd.label == fd.LABEL_REPEATED:
-                    values = []
-                    for item in value:
-                        nested_instance = nested_cls()
-                        ParseDict(item, nested_instance)
-                        values.append(protobuf2model(
-                            model_cls, nested_instance))
-                    return values
-                ParseDict(value, nested_instance)
-                return protobuf2model(model_cls, nested_instance)
+    Args:
+        fd (FieldDescriptor): 子消息所属字段(map 时为 value 字段)
+        model_cls (Type[BaseModel]): 子消息对应的模型类
+        trusted (bool, optional): 嵌套模型是否跳过校验. Defaults to False.
 
-        return value
+    Returns:
+        Callable[[_message.Message], Any]: 读取函数, 返回 datetime/timedelta, 嵌套模型实例, 或者(无对应模型时)JSON dict
+    """
+    read = _WELL_KNOWN_READERS.get(fd.message_type.full_name)
+    if read is not None:
+        return read
+    if isinstance(model_cls, type) and issubclass(model_cls, BaseModel):
+        return lambda msg: protobuf2model(model_cls, msg, trusted)
+    # 例如 google.protobuf.Any, 保持与 model2protobuf 的 dict 分支对称
+    return MessageToDict
+
+
+def _enum_converter(fd, model_cls: Type[BaseModel], name: str) -> Callable[[Any], Any]:
+    # 跳过校验时 pydantic 不会把 int 转为 Enum, 由这里按字段注解转换
+    if fd.type != fd.TYPE_ENUM:
+        return None
+    enum_cls = _get_model_cls_by_field(model_cls, name)
+    if not (isinstance(enum_cls, type) and issubclass(enum_cls, Enum)):
+        return None
+    members = {member.value: member for member in enum_cls}
+
+    def convert(value):
+        member = members.get(value)
+        return member if member is not None else enum_cls(value)
+    return convert
+
+
+def _compile_reader(fd, model_cls: Type[BaseModel], trusted: bool = False) -> Callable[[_message.Message], Any]:
+    """为单个字段生成读取函数 read(proto), 嵌套模型类在编译时解析
+
+    Args:
+        fd (FieldDescriptor): 字段描述符
+        model_cls (Type[BaseModel]): 声明该字段的模型类
+        trusted (bool, optional): 是否为跳过校验的计划编译. Defaults to False.
+
+    Returns:
+        Callable[[_message.Message], Any]: 读取函数
+    """
+    name = fd.name
+    if is_map(fd):
+        value_fd = fd.message_type.fields_by_name['value']
+        if value_fd.type != value_fd.TYPE_MESSAGE:
+            convert = _enum_converter(value_fd, model_cls, name) if trusted else None
+            if convert is not None:
+                return lambda proto: {k: convert(v) for k, v in getattr(proto, name).items()}
+            return lambda proto: dict(getattr(proto, name))
+        read_value = _message_reader(value_fd, _get_model_cls_by_field(model_cls, name), trusted)
+        return lambda proto: {k: read_value(v) for k, v in getattr(proto, name).items()}
+
+    if fd.type == fd.TYPE_MESSAGE:
+        read_item = _message_reader(fd, _get_model_cls_by_field(model_cls, name), trusted)
+        if fd.label == fd.LABEL_REPEATED:
+            return lambda proto: [read_item(item) for item in getattr(proto, name)]
+
+        def read(proto):
+            if not proto.HasField(name):
+                return None
+            return read_item(getattr(proto, name))
+        return read
+
+    convert = _enum_converter(fd, model_cls, name) if trusted else None
+    if fd.label == fd.LABEL_REPEATED:
+        if convert is not None:
+            return lambda proto: [convert(item) for item in getattr(proto, name)]
+        return lambda proto: list(getattr(proto, name))
+    if convert is not None:
+        return lambda proto: convert(getattr(proto, name))
+    return lambda proto: getattr(proto, name)
+
+
+def _validation_keys(model_cls: Type[BaseModel]) -> Dict[str, str]:
+    """校验时每个输入键对应的字段名
+
+    设置了 alias(或 validation_alias)的字段只接受别名, 除非模型配置了 populate_by_name/validate_by_name;
+    与 model_construct 不同, 字段名不会总被接受
+
+    Args:
+        model_cls (Type[BaseModel]): 模型类
+
+    Returns:
+        Dict[str, str]: {输入键: 字段名}
+    """
+    config = model_cls.model_config
+    by_name = config.get("populate_by_name", False) or config.get("validate_by_name", False)
+    keys = {}
+    aliases = {}
+    for name, field in model_cls.model_fields.items():
+        alias = field.validation_alias if field.validation_alias is not None else field.alias
+        choices = getattr(alias, "choices", [alias])
+        names = [choice for choice in choices if isinstance(choice, str)]
+        if not names or by_name:
+            keys[name] = name
+        for key in names:
+            aliases[key] = name
+    # 同一个键既是别名又是字段名时, 校验优先匹配别名
+    keys.update(aliases)
+    return keys
+
+
+def _compile_constructor(model_cls: Type[BaseModel], names: List[str]) -> Callable[[Dict[str, Any]], BaseModel]:
+    """生成跳过校验的构造函数, 得到的模型与校验 model_cls(**values) 的结果相同(值本身不做转换),
+    默认值和 fields_set 在编译时确定, 不再逐字段匹配别名
+
+    Args:
+        model_cls (Type[BaseModel]): 模型类
+        names (List[str]): 每次构造都会传入的键, 即消息的字段名
+
+    Returns:
+        Callable[[Dict[str, Any]], BaseModel]: 由 {字段名: 值} 构造模型的函数
+    """
+    config = model_cls.model_config
+    # sqlmodel 的表模型 __init__ 本身不做校验, 且需要初始化 SQLAlchemy 的实例状态
+    if config.get("table", False):
+        return lambda values: model_cls(**values)
+    # 与校验一致: 不被任何字段接受的键(例如按字段名传入带 alias 的字段)被忽略, 字段取默认值
+    keys = _validation_keys(model_cls)
+    renames = {key: keys[key] for key in names if key in keys}
+    if all(key == name for key, name in renames.items()) and len(renames) == len(names):
+        renames = None
+    else:
+        names = list(renames.values())
+
+    # 私有属性/model_post_init/extra 等情况交给 pydantic 自己处理
+    if model_cls.__pydantic_post_init__ or model_cls.__pydantic_root_model__ or config.get("extra") == "allow":
+        if renames is None:
+            return lambda values: model_cls.model_construct(**values)
+        return lambda values: model_cls.model_construct(
+            **{renames[key]: value for key, value in values.items() if key in renames})
+    fields = model_cls.model_fields
+    fields_set = frozenset(names)
+    missing = [(name, field) for name, field in fields.items() if name not in fields_set and not field.is_required()]
+
+    def construct(values):
+        if renames is not None:
+            values = {renames[key]: value for key, value in values.items() if key in renames}
+        for name, field in missing:
+            values[name] = field.get_default(call_default_factory=True)
+        m = model_cls.__new__(model_cls)
+        _object_setattr(m, "__dict__", values)
+        _object_setattr(m, "__pydantic_fields_set__", set(fields_set))
+        _object_setattr(m, "__pydantic_extra__", None)
+        _object_setattr(m, "__pydantic_private__", None)
+        return m
+    return construct
+
+
+def real_oneofs(descriptor) -> List[Any]:
+    """消息中声明的 oneof, 不包括 proto3 optional 字段对应的合成 oneof
+
+    Args:
+        descriptor (Descriptor): 消息描述符
+
+    Returns:
+        List[OneofDescriptor]: oneof 描述符
+    """
+    if not descriptor.oneofs:
+        return []
+    # 运行时的 FieldDescriptor 没有 proto3_optional, 从 DescriptorProto 中读取
+    proto = descriptor_pb2.DescriptorProto()
+    descriptor.CopyToProto(proto)
+    synthetic = {field.oneof_index for field in proto.field if field.proto3_optional}
+    return [oneof for oneof in descriptor.oneofs if oneof.index not in synthetic]
+
+
+def _compile_plan(model_cls, descriptor, direction: str) -> ConversionPlan:
+    # 嵌套模型类从字段注解中解析, 前向引用(例如 lazy=true 生成的模型)需要先完成 model_rebuild
+    if not model_cls.__pydantic_complete__:
+        model_cls.model_rebuild()
+    oneofs = real_oneofs(descriptor)
+    members = {fd.name for oneof in oneofs for fd in oneof.fields}
+    fields = [fd for fd in descriptor.fields if fd.name not in members]
+    if direction == TO_PROTOBUF:
+        writers = {fd.name: _compile_writer(fd) for fd in descriptor.fields}
+        steps = [(fd.name, writers[fd.name]) for fd in fields if fd.name in model_cls.model_fields]
+        # 每组 oneof 只能有一个成员不为 None, 见 _write_model
+        groups = [(oneof.name, [(fd.name, writers[fd.name]) for fd in oneof.fields
+                                if fd.name in model_cls.model_fields])
+                  for oneof in oneofs]
+        return ConversionPlan(model_cls, descriptor, direction, steps, writers,
+                              oneofs=[(name, group) for name, group in groups if group])
+    trusted = direction == FROM_PROTOBUF_TRUSTED
+    if trusted:
+        # 跳过校验时只写入模型声明过的字段
+        fields = [fd for fd in fields if fd.name in model_cls.model_fields]
+    steps = [(fd.name, _compile_reader(fd, model_cls, trusted)) for fd in fields]
+    # 每组 oneof 由 WhichOneof 选出已设置的成员, 只读取这一个字段
+    groups = [(oneof.name, {fd.name: _compile_reader(fd, model_cls, trusted) for fd in oneof.fields
+                            if not trusted or fd.name in model_cls.model_fields})
+              for oneof in oneofs]
+    groups = [(name, readers) for name, readers in groups if readers]
+    if not trusted:
+        return ConversionPlan(model_cls, descriptor, direction, steps, oneofs=groups)
+    names = [name for name, _ in steps] + [name for _, readers in groups for name in readers]
+    construct = _compile_constructor(model_cls, names)
+    return ConversionPlan(model_cls, descriptor, direction, steps, construct=construct, oneofs=groups)
+
+
+def get_conversion_plan(model_cls: Type[BaseModel], descriptor, direction: str = TO_PROTOBUF) -> ConversionPlan:
+    """获取(必要时编译并缓存)模型类与消息描述符之间的转换计划
+
+    Args:
+        model_cls (Type[BaseModel]): 模型类
+        descriptor (Descriptor): 消息描述符, 例如 Example.DESCRIPTOR
+        direction (str, optional): TO_PROTOBUF, FROM_PROTOBUF 或 FROM_PROTOBUF_TRUSTED.
+            Defaults to TO_PROTOBUF.
+
+    Returns:
+        ConversionPlan: 转换计划
+    """
+    key = (direction, model_cls, descriptor)
+    plan = _plans.get(key)
+    if plan is None:
+        plan = _compile_plan(model_cls, descriptor, direction)
+        _plans[key] = plan
+    return plan
+
+
+def cached_conversion_plans() -> List[ConversionPlan]:
+    """返回当前已缓存的转换计划"""
+    return list(_plans.values())
+
+
+def clear_conversion_plans() -> None:
+    """清空转换计划和消息类的缓存, 模型类或描述符被重新定义后需要调用"""
+    _plans.clear()
+    _constructors.clear()
+    get_message_class.cache_clear()
+
+
+def build_model(model_cls: Type[PydanticModel], values: Dict[str, Any], trusted: bool) -> PydanticModel:
+    """converter=inline 生成的 from_protobuf 在开启统计时用于构造模型, 与不统计时的构造方式相同"""
+    if trusted:
+        return construct_model(model_cls, values)
+    return model_cls(**values)
+
+
+def construct_model(model_cls: Type[PydanticModel], values: Dict[str, Any]) -> PydanticModel:
+    """不经校验地构造模型, 供 converter=inline 生成的 from_protobuf 使用
+
+    Args:
+        model_cls (Type[PydanticModel]): 模型类
+        values (Dict[str, Any]): 字段值, 同一个模型类每次传入的字段名必须相同
+
+    Returns:
+        PydanticModel: 模型实例
+    """
+    construct = _constructors.get(model_cls)
+    if construct is None:
+        construct = _compile_constructor(model_cls, list(values))
+        _constructors[model_cls] = construct
+    return construct(values)
+
+
+def _write_model(plan: ConversionPlan, model: BaseModel, proto: _message.Message) -> _message.Message:
+    for name, write in plan.steps:
+        write(proto, getattr(model, name))
+    for oneof, group in plan.oneofs:
+        which = None
+        for name, write in group:
+            value = getattr(model, name)
+            if value is not None:
+                if which is not None:
+                    # 消息中只能保留一个成员, 不能静默丢弃其余成员的数据
+                    raise _oneof_conflict(model, oneof, [name for name, _ in group])
+                which = name
+                write(proto, value)
+    extra = model.model_extra
+    if extra:
+        for name, value in extra.items():
+            write = plan.writers.get(name)
+            if write is not None:
+                write(proto, value)
+    return proto
+
+
+def _read_oneofs(plan: ConversionPlan, proto: _message.Message, values: Dict[str, Any]) -> Dict[str, Any]:
+    """把 oneof 成员写入 values: 已设置的成员按 WhichOneof 读取, 其余为 None"""
+    values.update(plan.oneof_defaults)
+    for oneof, readers in plan.oneofs:
+        which = proto.WhichOneof(oneof)
+        if which is not None:
+            read = readers.get(which)
+            if read is not None:
+                values[which] = read(proto)
+    return values
+
+
+def _read_fields(plan: ConversionPlan, proto: _message.Message) -> Dict[str, Any]:
+    values = {name: read(proto) for name, read in plan.steps}
+    if plan.oneofs:
+        _read_oneofs(plan, proto, values)
+    return values
+
+
+def _measured_protobuf2model(plan: ConversionPlan, proto: _message.Message) -> BaseModel:
+    """开启统计时的 protobuf2model, 读取字段和构造模型的异常都计入 errors"""
+    start = conversion_metrics.start()
+    try:
+        values = _read_fields(plan, proto)
+    except Exception:
+        conversion_metrics.read_failed(proto, start)
+        raise
+    return conversion_metrics.from_protobuf(proto, start, plan.construct, values)
+
+
+def _oneof_conflict(model: BaseModel, oneof: str, members) -> ValueError:
+    names = [name for name in members if getattr(model, name) is not None]
+    return ValueError(f"{type(model).__name__}: more than one member of oneof {oneof!r} is set: {', '.join(names)}")
+
+
+def oneof_error(model: BaseModel, oneof: str) -> ValueError:
+    """生成的模型中 oneof 设置了多个成员时的异常, 供 converter=inline 生成的 to_protobuf 使用"""
+    return _oneof_conflict(model, oneof, type(model)._oneofs[oneof])
+
+
+def check_oneofs(model: PydanticModel) -> PydanticModel:
+    """校验生成的模型中每个 oneof 最多设置了一个成员, 由生成的 model_validator 调用
 
-    # Convert protobuf message to dictionary
-    proto_dict = MessageToDict(
-        proto,
-        preserving_proto_field_name=True,
-        use_integers_for_enums=True) if isinstance(
-        proto,
-        _message.Message) else proto
-
-    model_data = {}
-    for fd in proto.DESCRIPTOR.fields:
-        field_name = fd.name
-        # if field_name in proto_dict:
-        value = proto_dict.get(field_name, _get_default_value(fd))
-        model_data[field_name] = _convert_value(fd, value, model_cls)
+    Args:
+        model (PydanticModel): 生成的模型实例
+
+    Raises:
+        ValueError: 某个 oneof 中有多个成员不为 None
+
+    Returns:
+        PydanticModel: model 本身
+    """
+    for oneof, members in type(model)._oneofs.items():
+        which = None
+        for name in members:
+            if getattr(model, name) is not None:
+                if which is not None:
+                    raise _oneof_conflict(model, oneof, members)
+                which = name
+    return model
+
+
+def which_one_of(model: BaseModel, oneof: str) -> Tuple[Optional[str], Any]:
+    """返回生成的模型中 oneof 已设置的成员, 即 to_protobuf 写入消息的成员
+
+    Args:
+        model (BaseModel): 生成的模型实例
+        oneof (str): oneof 名
+
+    Raises:
+        ValueError: oneof 中有多个成员不为 None
+
+    Returns:
+        Tuple[Optional[str], Any]: (字段名, 值), 都未设置时为 (None, None)
+    """
+    which, result = None, None
+    for name in type(model)._oneofs[oneof]:
+        value = getattr(model, name)
+        if value is not None:
+            if which is not None:
+                raise oneof_error(model, oneof)
+            which, result = name, value
+    return which, result
+
+
+def model2protobuf(model: BaseModel, proto: _message.Message) -> _message.Message:
+    """按缓存的转换计划把 pydantic/sqlmodel 实例逐字段直接写入 protobuf 消息,
+    不再经过 model_dump/MessageToDict/ParseDict 的 dict 中转
+
+    Args:
+        model (BaseModel): 模型实例, 传入 dict 时按 JSON 格式解析
+        proto (_message.Message): 目标消息
+
+    Returns:
+        _message.Message: 填充后的 proto
+    """
+    if isinstance(model, dict):
+        return ParseDict(model, proto)
+    plan = _plans.get((TO_PROTOBUF, type(model), proto.DESCRIPTOR))
+    if plan is None:
+        plan = get_conversion_plan(type(model), proto.DESCRIPTOR, TO_PROTOBUF)
+    if conversion_metrics.enabled:
+        return conversion_metrics.to_protobuf(proto, _write_model, plan, model, proto)
+    return _write_model(plan, model, proto)
+
+
+def protobuf2model(model_cls: Type[BaseModel], proto: _message.Message, trusted: bool = False) -> BaseModel:
+    """按缓存的转换计划直接从 protobuf 消息读取字段构造模型,
+    每个嵌套子消息只访问一次, 不再经过 MessageToDict/ParseDict
+
+    Args:
+        model_cls (Type[BaseModel]): 目标模型类
+        proto (_message.Message): 源消息
+        trusted (bool, optional): 为 True 时认为消息已经是类型正确的数据,
+            用 model_construct 构造(包括嵌套模型)并跳过 pydantic 校验. Defaults to False.
+
+    Returns:
+        BaseModel: 模型实例
+    """
+    direction = FROM_PROTOBUF_TRUSTED if trusted else FROM_PROTOBUF
+    plan = _plans.get((direction, model_cls, proto.DESCRIPTOR))
+    if plan is None:
+        plan = get_conversion_plan(model_cls, proto.DESCRIPTOR, direction)
+    if conversion_metrics.enabled:
+        return _measured_protobuf2model(plan, proto)
+    model_data = {name: read(proto) for name, read in plan.steps}
+    if plan.oneofs:
+        _read_oneofs(plan, proto, model_data)
 
     # Create and return SQLModel instance
-    return model_cls(**model_data)
+    return plan.construct(model_data)
+
+
+def _model_to_protobuf_converter(new_message: Callable[[], _message.Message]) -> Callable[[Any], _message.Message]:
+    """返回把单个模型转换为新消息的函数, 多次调用之间复用转换计划
+
+    Args:
+        new_message (Callable[[], _message.Message]): 创建空消息的函数, 例如消息类或 repeated 字段的 add
+
+    Returns:
+        Callable[[Any], _message.Message]: 转换函数
+    """
+    plan = None
+
+    def convert(model):
+        nonlocal plan
+        proto = new_message()
+        if isinstance(model, dict):
+            return ParseDict(model, proto)
+        if plan is None or plan.model_cls is not type(model):
+            plan = get_conversion_plan(type(model), proto.DESCRIPTOR, TO_PROTOBUF)
+        if conversion_metrics.enabled:
+            return conversion_metrics.to_protobuf(proto, _write_model, plan, model, proto)
+        return _write_model(plan, model, proto)
+    return convert
+
+
+def _protobuf_to_model_converter(model_cls: Type[PydanticModel], trusted: bool = False
+                                 ) -> Callable[[_message.Message], PydanticModel]:
+    """返回把单个消息转换为模型的函数, 多次调用之间复用转换计划
+
+    Args:
+        model_cls (Type[PydanticModel]): 目标模型类
+        trusted (bool, optional): 同 protobuf2model. Defaults to False.
+
+    Returns:
+        Callable[[_message.Message], PydanticModel]: 转换函数
+    """
+    direction = FROM_PROTOBUF_TRUSTED if trusted else FROM_PROTOBUF
+    plan = None
+
+    def convert(proto):
+        nonlocal plan
+        if plan is None or plan.descriptor is not proto.DESCRIPTOR:
+            plan = get_conversion_plan(model_cls, proto.DESCRIPTOR, direction)
+        if conversion_metrics.enabled:
+            return _measured_protobuf2model(plan, proto)
+        values = {name: read(proto) for name, read in plan.steps}
+        if plan.oneofs:
+            _read_oneofs(plan, proto, values)
+        return plan.construct(values)
+    return convert
+
+
+def models_to_protobufs(models: Iterable[PydanticModel],
+                        proto_cls: Type[ProtobufMessage] = None,
+                        out=None) -> List[ProtobufMessage]:
+    """批量把模型转换为 protobuf 消息, 转换计划每批只查找一次
+
+    Args:
+        models (Iterable[PydanticModel]): 模型实例序列
+        proto_cls (Type[ProtobufMessage], optional): 目标消息类, 与 out 二选一
+        out (RepeatedCompositeFieldContainer, optional): repeated 消息字段,
+            例如 response.items, 消息直接追加到该字段中
+
+    Returns:
+        List[ProtobufMessage]: 转换后的消息(传入 out 时为追加到 out 中的消息)
+    """
+    if (proto_cls is None) == (out is None):
+        raise ValueError("exactly one of proto_cls and out must be given")
+    convert = _model_to_protobuf_converter(out.add if out is not None else proto_cls)
+    return [convert(model) for model in models]
+
+
+def protobufs_to_models(model_cls: Type[PydanticModel],
+                        protos: Iterable[_message.Message],
+                        trusted: bool = False) -> List[PydanticModel]:
+    """批量把 protobuf 消息转换为模型, 转换计划每批只查找一次
+
+    Args:
+        model_cls (Type[PydanticModel]): 目标模型类
+        protos (Iterable[_message.Message]): 消息序列, 也可以是 repeated 字段
+        trusted (bool, optional): 同 protobuf2model. Defaults to False.
+
+    Returns:
+        List[PydanticModel]: 模型实例列表
+    """
+    convert = _protobuf_to_model_converter(model_cls, trusted)
+    return [convert(proto) for proto in protos]
+
+
+def stream_models_to_protobufs(models: Iterable[PydanticModel],
+                               proto_cls: Type[ProtobufMessage]) -> Iterator[ProtobufMessage]:
+    """惰性地把模型迭代器转换为消息迭代器, 适用于 gRPC server-streaming 的同步实现
+
+    Args:
+        models (Iterable[PydanticModel]): 模型迭代器
+        proto_cls (Type[ProtobufMessage]): 目标消息类
+
+    Yields:
+        Iterator[ProtobufMessage]: 转换后的消息
+    """
+    convert = _model_to_protobuf_converter(proto_cls)
+    for model in models:
+        yield convert(model)
+
+
+def stream_protobufs_to_models(model_cls: Type[PydanticModel],
+                               protos: Iterable[_message.Message],
+                               trusted: bool = False) -> Iterator[PydanticModel]:
+    """惰性地把消息迭代器(例如 client-streaming 的 request_iterator)转换为模型迭代器
+
+    Args:
+        model_cls (Type[PydanticModel]): 目标模型类
+        protos (Iterable[_message.Message]): 消息迭代器
+        trusted (bool, optional): 同 protobuf2model. Defaults to False.
+
+    Yields:
+        Iterator[PydanticModel]: 转换后的模型
+    """
+    convert = _protobuf_to_model_converter(model_cls, trusted)
+    for proto in protos:
+        yield convert(proto)
+
+
+class _StreamError:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+_STREAM_END = object()
+
+
+async def _aiterate(source) -> AsyncIterator[Any]:
+    if hasattr(source, "__aiter__"):
+        async for item in source:
+            yield item
+    else:
+        for item in source:
+            yield item
+
+
+async def _read_ahead(source, convert: Callable[[Any], Any], buffer_size: int) -> AsyncIterator[Any]:
+    """在后台任务中读取并转换 source, 最多预读 buffer_size 个结果
+
+    队列满时后台任务挂起, 不再读取 source, 以此把下游的背压传递给上游;
+    消费方提前退出(例如客户端取消 RPC)时后台任务会被取消.
+    """
+    if buffer_size <= 0:
+        async for item in _aiterate(source):
+            yield convert(item)
+        return
+
+    queue: asyncio.Queue = asyncio.Queue(maxsize=buffer_size)
+    # 后台任务结束后为 _STREAM_END 或 _StreamError, 消费方取完队列后据此结束
+    end = None
+
+    async def produce():
+        nonlocal end
+        try:
+            async for item in _aiterate(source):
+                await queue.put(convert(item))
+            end = _STREAM_END
+        except Exception as err:
+            end = _StreamError(err)
+        except BaseException as err:
+            # 例如 source 抛出 CancelledError, 同样交给消费方, 再按原样结束任务
+            end = _StreamError(err)
+            raise
+        finally:
+            # 队列满时不能等待放入(任务可能正在被取消), 消费方取完剩余结果后会检查 end;
+            # 队列为空时消费方可能正在等待, 放入 _STREAM_END 唤醒它
+            if queue.empty():
+                queue.put_nowait(_STREAM_END)
+
+    task = asyncio.ensure_future(produce())
+    try:
+        while end is None or not queue.empty():
+            item = await queue.get()
+            if item is not _STREAM_END:
+                yield item
+        if isinstance(end, _StreamError):
+            raise end.error
+    finally:
+        if not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+
+def astream_models_to_protobufs(models: Union[AsyncIterable[PydanticModel], Iterable[PydanticModel]],
+                                proto_cls: Type[ProtobufMessage],
+                                buffer_size: int = 64) -> AsyncIterator[ProtobufMessage]:
+    """把(异步)模型迭代器转换为异步消息迭代器, 可直接作为 grpc.aio server-streaming 的返回值
+
+    Args:
+        models (Union[AsyncIterable[PydanticModel], Iterable[PydanticModel]]): 模型来源,
+            同步迭代器会在事件循环中直接迭代, 不要传入会阻塞的迭代器
+        proto_cls (Type[ProtobufMessage]): 目标消息类
+        buffer_size (int, optional): 预读并已转换的消息数上限, 0 表示不预读. Defaults to 64.
+
+    Returns:
+        AsyncIterator[ProtobufMessage]: 转换后的消息
+    """
+    return _read_ahead(models, _model_to_protobuf_converter(proto_cls), buffer_size)
+
+
+def astream_protobufs_to_models(model_cls: Type[PydanticModel],
+                                protos: Union[AsyncIterable[_message.Message], Iterable[_message.Message]],
+                                trusted: bool = False,
+                                buffer_size: int = 64) -> AsyncIterator[PydanticModel]:
+    """把(异步)消息迭代器, 例如 grpc.aio client-streaming 的 request_iterator, 转换为异步模型迭代器
+
+    Args:
+        model_cls (Type[PydanticModel]): 目标模型类
+        protos (Union[AsyncIterable[_message.Message], Iterable[_message.Message]]): 消息来源
+        trusted (bool, optional): 同 protobuf2model. Defaults to False.
+        buffer_size (int, optional): 预读并已转换的模型数上限, 0 表示不预读. Defaults to 64.
+
+    Returns:
+        AsyncIterator[PydanticModel]: 转换后的模型
+    """
+    return _read_ahead(protos, _protobuf_to_model_converter(model_cls, trusted), buffer_size)
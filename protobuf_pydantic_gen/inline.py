@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+'''
+@File    :   inline.py
+@Time    :   2024/07/15 10:32:18
+@Desc    :   converter=inline 时为每个字段生成直接读写 protobuf 的代码
+'''
+
+from typing import List, Optional, Set, Tuple
+
+from google.protobuf import descriptor_pb2
+
+_FD = descriptor_pb2.FieldDescriptorProto
+
+SCALAR = "scalar"
+BYTES = "bytes"
+ENUM = "enum"
+TIMESTAMP = "timestamp"
+DURATION = "duration"
+WRAPPER = "wrapper"
+WELL_KNOWN = "well_known"
+MODEL = "model"
+MESSAGE = "message"
+
+# 由 ext 中的函数直接转换的 well-known 类型: 全名 -> (读取函数, 写入函数)
+WELL_KNOWN_FUNCTIONS = {
+    "google.protobuf.Struct": ("struct_to_dict", "fill_struct"),
+    "google.protobuf.Value": ("value_to_python", "fill_value"),
+    "google.protobuf.ListValue": ("list_value_to_list", "fill_list_value"),
+    "google.protobuf.FieldMask": ("field_mask_to_list", "fill_field_mask"),
+    "google.protobuf.Any": ("any_to_dict", "fill_any"),
+}
+WRAPPER_TYPES = {f"google.protobuf.{name}Value"
+                 for name in ("Double", "Float", "Int64", "UInt64", "Int32", "UInt32", "Bool", "String", "Bytes")}
+
+_SCALAR_DEFAULTS = {
+    _FD.TYPE_STRING: '""',
+    _FD.TYPE_BOOL: "False",
+    _FD.TYPE_DOUBLE: "0.0",
+    _FD.TYPE_FLOAT: "0.0",
+}
+
+
+def value_kind(field_type: int, type_name: str, model_types: Set[str]) -> str:
+    """判断一个值在转换时属于哪一类
+
+    Args:
+        field_type (int): FieldDescriptorProto.TYPE_*
+        type_name (str): 消息/枚举的全名, 例如 .google.protobuf.Timestamp
+        model_types (Set[str]): 生成模型的消息全名(不含前导 ".")
+
+    Returns:
+        str: SCALAR, BYTES, ENUM, TIMESTAMP, DURATION, WRAPPER, WELL_KNOWN, MODEL
+            或 MESSAGE(无对应模型, 按 JSON dict 处理)
+    """
+    if field_type == _FD.TYPE_ENUM:
+        return ENUM
+    if field_type == _FD.TYPE_BYTES:
+        return BYTES
+    if field_type != _FD.TYPE_MESSAGE:
+        return SCALAR
+    if type_name.lstrip(".") == "google.protobuf.Timestamp":
+        return TIMESTAMP
+    if type_name.lstrip(".") == "google.protobuf.Duration":
+        return DURATION
+    if type_name.lstrip(".") in WRAPPER_TYPES:
+        return WRAPPER
+    if type_name.lstrip(".") in WELL_KNOWN_FUNCTIONS:
+        return WELL_KNOWN
+    if type_name.lstrip(".") in model_types:
+        return MODEL
+    return MESSAGE
+
+
+class FieldConverter:
+    """一个字段在 to_protobuf/from_protobuf 中展开后的代码
+
+    Args:
+        name (str): 字段名
+        field_type (int): FieldDescriptorProto.TYPE_*
+        repeated (bool): 是否为 repeated(不含 map)
+        kind (str): 元素的 value_kind
+        py_type (str): 元素的 Python 类型名
+        map_value (Tuple[str, str, str], optional): map 字段的 (value_kind, Python 类型名, 消息全名)
+        type_name (str, optional): 元素的消息全名, WELL_KNOWN 时用于选择 ext 中的转换函数
+        oneof (str, optional): 所属的 oneof 名, 成员的代码只在该成员已设置时执行
+    """
+
+    def __init__(self, name: str, field_type: int, repeated: bool, kind: str, py_type: str,
+                 map_value: Optional[Tuple[str, str, str]] = None, type_name: str = "", oneof: str = ""):
+        self.name = name
+        self.field_type = field_type
+        self.repeated = repeated
+        self.kind = kind
+        self.py_type = py_type
+        self.map_value = map_value
+        self.type_name = type_name.lstrip(".")
+        self.oneof = oneof
+        self.ext_imports: Set[str] = set()
+        self.imports: Set[str] = set()
+        self.to_protobuf = self._to_protobuf_lines()
+        self.from_protobuf = self._from_protobuf_expr()
+
+    def _fill(self, kind: str, py_type: str, target: str, value: str, type_name: str = "") -> List[str]:
+        if kind == WRAPPER:
+            if type_name == "google.protobuf.BytesValue":
+                self.ext_imports.add("to_bytes")
+                return [f"{target}.value = to_bytes({value})"]
+            return [f"{target}.value = {value}"]
+        if kind == WELL_KNOWN:
+            fill = WELL_KNOWN_FUNCTIONS[type_name][1]
+            self.ext_imports.add(fill)
+            return [f"{fill}({target}, {value})"]
+        if kind == TIMESTAMP:
+            self.ext_imports.add("fill_timestamp")
+            return [f"fill_timestamp({target}, {value})"]
+        if kind == DURATION:
+            self.ext_imports.add("fill_duration")
+            return [f"fill_duration({target}, {value})"]
+        self.ext_imports.add("fill_message")
+        if kind == MODEL:
+            return [f"if isinstance({value}, {py_type}):",
+                    f"    {value}._fill_protobuf({target})",
+                    "else:",
+                    f"    fill_message({target}, {value})"]
+        return [f"fill_message({target}, {value})"]
+
+    def _read(self, kind: str, py_type: str, value: str, type_name: str = "") -> str:
+        if kind == ENUM:
+            return f"{py_type}({value})"
+        if kind == WRAPPER:
+            return f"{value}.value"
+        if kind == WELL_KNOWN:
+            read = WELL_KNOWN_FUNCTIONS[type_name][0]
+            self.ext_imports.add(read)
+            return f"{read}({value})"
+        if kind == TIMESTAMP:
+            self.ext_imports.add("timestamp_to_datetime")
+            return f"timestamp_to_datetime({value})"
+        if kind == DURATION:
+            self.ext_imports.add("duration_to_timedelta")
+            return f"duration_to_timedelta({value})"
+        if kind == MODEL:
+            return f"{py_type}.from_protobuf({value}, trusted)"
+        if kind == MESSAGE:
+            self.imports.add("from google.protobuf.json_format import MessageToDict")
+            return f"MessageToDict({value})"
+        return value
+
+    def _oneof_lines(self) -> List[str]:
+        # 模板在 _value 不为 None 时执行, 写入后该成员即为 oneof 中已设置的字段
+        name = self.name
+        if self.kind == SCALAR:
+            return [f"_proto.{name} = _value"]
+        if self.kind == BYTES:
+            self.ext_imports.add("to_bytes")
+            return [f"_proto.{name} = to_bytes(_value)"]
+        if self.kind == ENUM:
+            self.ext_imports.add("enum_number")
+            return [f"_proto.{name} = enum_number({self.py_type}, _value)"]
+        lines = [f"_sub = _proto.{name}", "_sub.SetInParent()"]
+        lines.extend(self._fill(self.kind, self.py_type, "_sub", "_value", self.type_name))
+        return lines
+
+    def _to_protobuf_lines(self) -> List[str]:
+        name = self.name
+        if self.oneof:
+            return self._oneof_lines()
+        lines = [f"_value = self.{name}"]
+        if self.map_value:
+            kind, py_type, type_name = self.map_value
+            lines.append("if _value:")
+            if kind == SCALAR:
+                lines.append(f"    _proto.{name}.update(_value)")
+            elif kind == BYTES:
+                self.ext_imports.add("to_bytes")
+                lines.append(f"    _proto.{name}.update({{_k: to_bytes(_v) for _k, _v in _value.items()}})")
+            elif kind == ENUM:
+                self.ext_imports.add("enum_number")
+                lines.append(f"    _proto.{name}.update("
+                             f"{{_k: enum_number({py_type}, _v) for _k, _v in _value.items()}})")
+            else:
+                lines.append(f"    _field = _proto.{name}")
+                lines.append("    for _k, _v in _value.items():")
+                lines.extend("        " + line for line in self._fill(kind, py_type, "_field[_k]", "_v", type_name))
+            return lines
+        if self.repeated:
+            lines.append("if _value:")
+            if self.kind == SCALAR:
+                lines.append(f"    _proto.{name}.extend(_value)")
+            elif self.kind == BYTES:
+                self.ext_imports.add("to_bytes")
+                lines.append(f"    _proto.{name}.extend([to_bytes(_v) for _v in _value])")
+            elif self.kind == ENUM:
+                self.ext_imports.add("enum_number")
+                lines.append(f"    _proto.{name}.extend([enum_number({self.py_type}, _v) for _v in _value])")
+            else:
+                lines.append(f"    _field = _proto.{name}")
+                lines.append("    for _v in _value:")
+                fill = self._fill(self.kind, self.py_type, "_field.add()", "_v", self.type_name)
+                lines.extend("        " + line for line in fill)
+            return lines
+        if self.kind == SCALAR:
+            default = _SCALAR_DEFAULTS.get(self.field_type, "0")
+            lines.append(f"_proto.{name} = _value if _value is not None else {default}")
+        elif self.kind == BYTES:
+            self.ext_imports.add("to_bytes")
+            lines.append(f"_proto.{name} = to_bytes(_value) if _value is not None else b\"\"")
+        elif self.kind == ENUM:
+            self.ext_imports.add("enum_number")
+            lines.append(f"_proto.{name} = enum_number({self.py_type}, _value) if _value is not None else 0")
+        elif self.kind == TIMESTAMP:
+            lines.append("if _value:")
+            fill = self._fill(self.kind, self.py_type, f"_proto.{name}", "_value", self.type_name)
+            lines.extend("    " + line for line in fill)
+        else:
+            lines.append("if _value is not None:")
+            lines.append(f"    _sub = _proto.{name}")
+            lines.append("    _sub.SetInParent()")
+            fill = self._fill(self.kind, self.py_type, "_sub", "_value", self.type_name)
+            lines.extend("    " + line for line in fill)
+        return lines
+
+    def _from_protobuf_expr(self) -> str:
+        name = self.name
+        if self.oneof:
+            # 模板按 WhichOneof 的结果只读取已设置的成员
+            return self._read(self.kind, self.py_type, f"src.{name}", self.type_name)
+        if self.map_value:
+            kind, py_type, type_name = self.map_value
+            if kind in (SCALAR, BYTES):
+                return f"dict(src.{name})"
+            return f"{{_k: {self._read(kind, py_type, '_v', type_name)} for _k, _v in src.{name}.items()}}"
+        if self.repeated:
+            if self.kind in (SCALAR, BYTES):
+                return f"list(src.{name})"
+            return f"[{self._read(self.kind, self.py_type, '_v', self.type_name)} for _v in src.{name}]"
+        if self.kind in (SCALAR, BYTES, ENUM):
+            return self._read(self.kind, self.py_type, f"src.{name}")
+        read = self._read(self.kind, self.py_type, f"src.{name}", self.type_name)
+        return f"{read} if src.HasField(\"{name}\") else None"
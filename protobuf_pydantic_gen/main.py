@@ -7,22 +7,28 @@
 '''
 
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from contextlib import contextmanager
+import hashlib
 import json
 import ast
 import sys
 import logging
 import os
-import autopep8
+import re
+import shlex
+import subprocess
 import inflection
 
-from typing import Iterator, Set, Tuple, List
+from typing import Any, Dict, Iterator, Set, Tuple, List
 from google.protobuf.compiler import plugin_pb2
-from google.protobuf import descriptor_pb2, descriptor_pool
+from google.protobuf import descriptor_pb2
 from google.protobuf.json_format import MessageToDict
 
-from jinja2 import Template
+from functools import partial
+from jinja2 import Environment, Template
 from protobuf_pydantic_gen import pydantic_pb2
+from protobuf_pydantic_gen.inline import FieldConverter, value_kind
 
 
 # from .template import tpl_str
@@ -31,20 +37,98 @@ from protobuf_pydantic_gen import pydantic_pb2
 __version__ = "0.0.1"
 
 logging.basicConfig(stream=sys.stderr, level=logging.DEBUG)
-pool = descriptor_pool.DescriptorPool()
+
+# converter=reflect: 生成的方法调用 ext 中通用的 model2protobuf/protobuf2model
+# converter=inline: 为每个字段生成直接读写 protobuf 的代码
+CONVERTERS = ("reflect", "inline")
+# jobs=auto 时, 待生成文件数达到该值才启用进程池
+PARALLEL_MIN_FILES = 8
+# 生成代码的最大行宽, 与 flake8 --max-line-length 一致
+MAX_LINE_LENGTH = 120
+# formatter 参数: none 直接输出模板结果, autopep8 额外执行 autopep8, 其他值作为外部格式化命令
+FORMATTERS = ("none", "autopep8")
+
+_templates: Dict[str, Template] = {}
+_generator_hash: str = None
+# 不影响生成结果的插件参数, 不参与缓存 key
+_UNKEYED_PARAMETERS = ("cache", "jobs")
+
+
+def wrap_call(head: str, args: List[str], tail: str = ")", indent: int = 4) -> str:
+    """排版 head(arg, ...) 形式的代码, 一行超过 MAX_LINE_LENGTH 时每个参数单独一行
+
+    Args:
+        head (str): 参数之前的部分, 包含左括号, 例如 "name: str = Field("
+        args (List[str]): 参数
+        tail (str, optional): 最后一个参数之后的部分. Defaults to ")".
+        indent (int, optional): 代码所在的缩进. Defaults to 4.
+
+    Returns:
+        str: 不含首行缩进的代码, 换行时后续行带有缩进
+    """
+    line = f"{head}{', '.join(args)}{tail}"
+    if not args or indent + len(line) <= MAX_LINE_LENGTH:
+        return line
+    prefix = " " * (indent + 4)
+    return head + "\n" + ",\n".join(prefix + arg for arg in args) + tail
+
+
+def wrap_expression(head: str, expr: str, tail: str = "", indent: int = 4) -> str:
+    """排版 head + 表达式 + tail 形式的代码, 一行超过 MAX_LINE_LENGTH 时表达式换到下一行
+
+    Args:
+        head (str): 表达式之前的部分, 例如 '"name": '
+        expr (str): 表达式; 以括号开始(推导式)时在括号后换行, 否则加一层括号
+        tail (str, optional): 表达式之后的部分. Defaults to "".
+        indent (int, optional): 代码所在的缩进. Defaults to 4.
+
+    Returns:
+        str: 不含首行缩进的代码, 换行时后续行带有缩进
+    """
+    line = f"{head}{expr}{tail}"
+    if indent + len(line) <= MAX_LINE_LENGTH:
+        return line
+    prefix = " " * (indent + 4)
+    if expr[0] in "[{(":
+        return f"{head}{expr[0]}\n{prefix}{expr[1:]}{tail}"
+    return f"{head}(\n{prefix}{expr}){tail}"
 
 
 class Field:
-    def __init__(self, name: str, type: str, repeated: bool, required: bool, attributes: dict):
+    def __init__(self, name: str, type: str, repeated: bool, required: bool, attributes: List[str],
+                 converter: FieldConverter = None):
         self.name = name
         self.type = type
         self.repeated = repeated
         self.required = required
         self.attributes = attributes
+        self.converter = converter
+        # lazy=true 时引用了其他文件中的模型, 注解写成字符串前向引用
+        self.forward_ref = False
+        # 所属的 oneof 名, 不属于 oneof 时为空
+        self.oneof = ""
 
         def __str__(self):
             return f"FieldItem({self.name}, {self.type}, {self.repeated}, {self.optional})"
 
+    def declaration(self, as_table: bool) -> str:
+        """字段声明, 例如 name: Optional[str] = Field(default="", ...)"""
+        annotation = f"List[{self.type}]" if self.repeated else self.type
+        if not self.required:
+            annotation = f"Optional[{annotation}]"
+        if self.forward_ref:
+            annotation = f'"{annotation}"'
+        field_func = "Field" if as_table else "_Field"
+        return wrap_call(f"{self.name}: {annotation} = {field_func}(", self.attributes)
+
+    def data_entry(self) -> str:
+        """converter=inline 时 from_protobuf 中 _data 的一项, 例如 "name": src.name,"""
+        return wrap_expression(f'"{self.name}": ', self.converter.from_protobuf, ",", indent=16)
+
+    def data_assignment(self) -> str:
+        """converter=inline 时 from_protobuf 中读取已设置的 oneof 成员, 例如 _data["name"] = src.name"""
+        return wrap_expression(f'_data["{self.name}"] = ', self.converter.from_protobuf, indent=16)
+
 
 class EnumField:
     def __init__(self, name: str, value: str):
@@ -55,6 +139,17 @@ class EnumField:
             return f"EnumField({self.name}, {self.value})"
 
 
+class Oneof:
+    def __init__(self, name: str, fields: List[Field]):
+        self.name = name
+        self.fields = fields
+
+    def members_declaration(self) -> str:
+        """_oneofs 中的一项, 例如 "payload": ("text", "num")"""
+        names = [f'"{field.name}"' for field in self.fields]
+        return wrap_call(f'"{self.name}": (', names, ",)" if len(names) == 1 else ")", indent=8)
+
+
 class Message:
     def __init__(
             self,
@@ -62,9 +157,11 @@ class Message:
             fields: list,
             message_type="class",
             table_name=None,
-            table_args=None,
+            table_args: List[str] = None,
             as_table=False,
-            full_name: str = ""):
+            full_name: str = "",
+            trusted=False,
+            oneofs: List[Oneof] = None):
         self.message_name = name
         self.fields = fields
         # self.imports = imports
@@ -72,14 +169,252 @@ class Message:
 
         self.table_name = table_name or name
         self.table_name = inflection.underscore(self.table_name)
-        self.table_args: Tuple[str] = table_args
+        self.table_args: List[str] = table_args
         self.proto_full_name = full_name
 
         self.as_table = as_table
+        self.trusted = trusted
+        self.oneofs = oneofs or []
+        # 是否有字段引用延迟导入的模型, 需要在 model_rebuild 前导入
+        self.lazy = False
 
         def __str__(self):
             return f"Message({self.messages}, {self.fields})"
 
+    def table_args_declaration(self) -> str:
+        return wrap_call("__table_args__ = (", list(self.table_args or ()), ",)")
+
+
+class ProtoType:
+    """type_index 中的一个消息或枚举
+
+    Args:
+        full_name (str): 全名, 例如 pkg.Outer.Inner
+        name (str): 生成的类名, 嵌套定义按路径拼接, 例如 OuterInner;
+            与同一文件中的其他类型重名时用下划线拼接, 例如 Outer_Inner
+        file (str): 定义所在的 proto 文件, 例如 protos/example.proto
+        package (str): proto 包名
+        is_enum (bool): 是否为枚举
+        generated (bool, optional): 是否生成模型, google/protobuf 与 pydantic.proto 中的类型为 False.
+            Defaults to True.
+    """
+
+    def __init__(self, full_name: str, name: str, file: str, package: str, is_enum: bool, generated: bool = True):
+        self.full_name = full_name
+        self.name = name
+        self.file = file
+        self.package = package
+        # 生成的模块为 {module}_model
+        self.module = os.path.basename(file).split('.')[0]
+        self.is_enum = is_enum
+        self.generated = generated
+        # 直接嵌套在该消息中的类型全名(不含 map entry)
+        self.nested: List[str] = []
+        # map entry 的 key/value 字段, 其他类型为 None
+        self.map_key: descriptor_pb2.FieldDescriptorProto = None
+        self.map_value: descriptor_pb2.FieldDescriptorProto = None
+
+    @property
+    def is_map_entry(self) -> bool:
+        return self.map_key is not None
+
+    @property
+    def python_module(self) -> str:
+        return f"{self.module.lower()}_model"
+
+    @property
+    def alias(self) -> str:
+        """与其他包中的同名类型一起导入时使用的名字, 例如 shop.v1 中的 Item -> ShopV1Item"""
+        return inflection.camelize((self.package or self.module).replace(".", "_")) + self.name
+
+
+# 请求中所有文件的消息, 枚举和 map entry, key 为带前导 "." 的全名(与 FieldDescriptorProto.type_name 一致)
+type_index: Dict[str, ProtoType] = {}
+# proto 文件名 -> 其中定义的类型(含嵌套和 map entry), 按定义顺序
+file_types: Dict[str, List[ProtoType]] = defaultdict(list)
+# 模块名 -> 在该模块中重名的生成类名(本文件定义的类型与引用的其他文件中的类型之间), 导入时使用 ProtoType.alias
+_ambiguous_names: Dict[str, Set[str]] = {}
+
+
+# applyTemplate 的参数: (文件名, 消息, 枚举, import 语句, converter, 延迟导入的 {类名: 模块 或 "模块:原类名"})
+RenderJob = Tuple[str, List[Message], List[Message], List[str], str, Dict[str, str]]
+
+
+# well-known 类型对应的 Python 类型, 由 ext 直接转换, 不生成嵌套模型的 import
+WELL_KNOWN_TYPES = {
+    ".google.protobuf.Timestamp": "datetime.datetime",
+    ".google.protobuf.Duration": "datetime.timedelta",
+    ".google.protobuf.DoubleValue": "float",
+    ".google.protobuf.FloatValue": "float",
+    ".google.protobuf.Int64Value": "int",
+    ".google.protobuf.UInt64Value": "int",
+    ".google.protobuf.Int32Value": "int",
+    ".google.protobuf.UInt32Value": "int",
+    ".google.protobuf.BoolValue": "bool",
+    ".google.protobuf.StringValue": "str",
+    ".google.protobuf.BytesValue": "BytesLike",
+    ".google.protobuf.Struct": "Dict[str, Any]",
+    ".google.protobuf.Value": "Any",
+    ".google.protobuf.ListValue": "List[Any]",
+    ".google.protobuf.FieldMask": "List[str]",
+    ".google.protobuf.Any": "Any",
+}
+WRAPPER_TYPES = {f".google.protobuf.{name}Value"
+                 for name in ("Double", "Float", "Int64", "UInt64", "Int32", "UInt32", "Bool", "String", "Bytes")}
+
+
+def walk_types(proto_file: descriptor_pb2.FileDescriptorProto) -> Iterator[Tuple[List[str], Any]]:
+    """按生成顺序遍历文件中的枚举和消息, 包括嵌套定义(map entry 除外), 嵌套消息在外层消息之前
+
+    Args:
+        proto_file (descriptor_pb2.FileDescriptorProto): proto 文件
+
+    Yields:
+        Tuple[List[str], Any]: (从顶层开始的名称路径, DescriptorProto 或 EnumDescriptorProto)
+    """
+    def walk(message, path):
+        for enum in message.enum_type:
+            yield path + [enum.name], enum
+        for nested in message.nested_type:
+            if not nested.options.map_entry:
+                yield from walk(nested, path + [nested.name])
+        yield path, message
+
+    for enum in proto_file.enum_type:
+        yield [enum.name], enum
+    for message in proto_file.message_type:
+        yield from walk(message, [message.name])
+
+
+def index_types(proto_files: List[descriptor_pb2.FileDescriptorProto]):
+    """一次遍历请求中的全部文件, 重建 type_index
+
+    生成类名, 所在模块, 嵌套类型和 map 的 key/value 在生成前确定, 字段类型只需按全名查表
+
+    Args:
+        proto_files (List[descriptor_pb2.FileDescriptorProto]): request.proto_file
+
+    Raises:
+        ValueError: 同一文件中两个类型的类名无法区分
+    """
+    type_index.clear()
+    file_types.clear()
+    for proto_file in proto_files:
+        generated = proto_file.package != "pydantic" and "google/protobuf" not in proto_file.name
+        # 全名 -> 从顶层开始的名称路径
+        paths: Dict[str, List[str]] = {}
+
+        def add(path, proto, is_enum=False):
+            full_name = ".".join([proto_file.package, *path] if proto_file.package else path)
+            info = ProtoType(full_name, "".join(path), proto_file.name, proto_file.package, is_enum, generated)
+            type_index[f".{info.full_name}"] = info
+            file_types[proto_file.name].append(info)
+            paths[full_name] = path
+            return info
+
+        def walk(message, path):
+            info = add(path, message)
+            for enum in message.enum_type:
+                info.nested.append(add(path + [enum.name], enum, True).full_name)
+            for nested in message.nested_type:
+                nested_info = walk(nested, path + [nested.name])
+                if nested.options.map_entry:
+                    fields = {field.name: field for field in nested.field}
+                    nested_info.map_key, nested_info.map_value = fields["key"], fields["value"]
+                else:
+                    info.nested.append(nested_info.full_name)
+            return info
+
+        for enum in proto_file.enum_type:
+            add([enum.name], enum, True)
+        for message in proto_file.message_type:
+            walk(message, [message.name])
+        if generated:
+            rename_colliding_types(file_types[proto_file.name], paths)
+
+    _ambiguous_names.clear()
+    for proto_file in proto_files:
+        if proto_file.package != "pydantic" and "google/protobuf" not in proto_file.name:
+            module = os.path.basename(proto_file.name).split('.')[0]
+            _ambiguous_names.setdefault(module, set()).update(find_ambiguous_names(proto_file, module))
+
+
+def rename_colliding_types(types: List[ProtoType], paths: Dict[str, List[str]]):
+    """按路径拼接的类名在同一文件中重复时(例如嵌套的 Order.Item 与顶层的 OrderItem),
+    嵌套类型改为用下划线拼接路径, 例如 Order_Item
+
+    Args:
+        types (List[ProtoType]): 一个文件中定义的类型
+        paths (Dict[str, List[str]]): 全名 -> 从顶层开始的名称路径
+
+    Raises:
+        ValueError: 改名后仍然重复
+    """
+    by_name = defaultdict(list)
+    for info in types:
+        if not info.is_map_entry:
+            by_name[info.name].append(info)
+    for same_name in by_name.values():
+        if len(same_name) > 1:
+            for info in same_name:
+                if len(paths[info.full_name]) > 1:
+                    info.name = "_".join(paths[info.full_name])
+    seen: Dict[str, ProtoType] = {}
+    for info in types:
+        if info.is_map_entry:
+            continue
+        other = seen.setdefault(info.name, info)
+        if other is not info:
+            raise ValueError(f"{info.file}: {other.full_name} and {info.full_name} "
+                             f"both generate class {info.name}")
+
+
+def find_ambiguous_names(proto_file: descriptor_pb2.FileDescriptorProto, module: str) -> Set[str]:
+    """文件引用的其他文件中的生成类型里, 与本文件的类型或彼此重名的类名
+
+    只取决于文件本身和它直接引用的类型, 与请求中其他无关的文件无关
+
+    Args:
+        proto_file (descriptor_pb2.FileDescriptorProto): proto 文件
+        module (str): 生成的模块名(文件名不含扩展名)
+
+    Returns:
+        Set[str]: 需要以 ProtoType.alias 导入的类名
+    """
+    local = {info.name for info in file_types[proto_file.name] if not info.is_map_entry}
+    # 类名 -> 引用的其他文件中的类型全名
+    imported = defaultdict(set)
+
+    def walk(message):
+        for field in message.field:
+            info = type_index.get(field.type_name)
+            if info is not None and info.generated and not info.is_map_entry and info.module != module:
+                imported[info.name].add(info.full_name)
+        for nested in message.nested_type:
+            walk(nested)
+
+    for message in proto_file.message_type:
+        walk(message)
+    return {name for name, full_names in imported.items() if len(full_names) > 1 or name in local}
+
+
+def get_type_name(type_name: str, module: str = "") -> str:
+    """消息/枚举在 module 对应的生成文件中使用的类名
+
+    Args:
+        type_name (str): 全名, 前导 "." 可有可无
+        module (str, optional): 引用该类型的 proto 文件名(不含扩展名). Defaults to "".
+
+    Returns:
+        str: 类名; 从其他文件导入且在 module 中与其他类型重名时为 ProtoType.alias, 不在 type_index 中时取最后一段
+    """
+    info = type_index.get("." + type_name.lstrip("."))
+    if info is None or not info.generated:
+        return type_name.split(".")[-1]
+    if info.module != module and info.name in _ambiguous_names.get(module, ()):
+        return info.alias
+    return info.name
+
 
 def get_field_type(field, imports: List[str], out: dict, file_name: str):
     # 这个函数用于将field.type（枚举值）转换为对应的类型名称
@@ -94,7 +429,7 @@ def get_field_type(field, imports: List[str], out: dict, file_name: str):
         descriptor_pb2.FieldDescriptorProto.TYPE_BOOL: "bool",
         descriptor_pb2.FieldDescriptorProto.TYPE_STRING: "str",
         # descriptor_pb2.FieldDescriptorProto.TYPE_MESSAGE: "message",  # 保持原样，因为指向特定消息
-        descriptor_pb2.FieldDescriptorProto.TYPE_BYTES: "bytes",
+        descriptor_pb2.FieldDescriptorProto.TYPE_BYTES: "BytesLike",
         descriptor_pb2.FieldDescriptorProto.TYPE_UINT32: "int",
         descriptor_pb2.FieldDescriptorProto.TYPE_ENUM: "Enum",  # Python 枚举类
         descriptor_pb2.FieldDescriptorProto.TYPE_SFIXED32: "int",
@@ -104,21 +439,22 @@ def get_field_type(field, imports: List[str], out: dict, file_name: str):
     }
 
     # 如果类型为消息或枚举，返回type_name，否则返回基本类型的名称
-    if hasattr(field, "type_name") and field.type == descriptor_pb2.FieldDescriptorProto.TYPE_MESSAGE:
-        if field.type_name == ".google.protobuf.Timestamp":
-            return "datetime.datetime"
-        key_type, value_type = get_map_field_types(
-            field, imports, out, file_name)
-        if key_type and value_type and check_if_map_field(field):
+    if field.type == descriptor_pb2.FieldDescriptorProto.TYPE_MESSAGE:
+        type_str = WELL_KNOWN_TYPES.get(field.type_name)
+        if type_str is not None:
+            imports.update(name for name in ("Any", "Dict", "List") if name in type_str)
+            return type_str
+        key_type, value_type = get_map_field_types(field, imports, out, file_name)
+        if key_type and value_type:
             imports.add("Dict")
-            return f"Dict[{key_type},{value_type}]"
-        out[field.type_name.split(".")[-1]] = file_name
-        return field.type_name.split(".")[-1]
-    else:
-        if field.type == descriptor_pb2.FieldDescriptorProto.TYPE_ENUM:
-            out[field.type_name.split(".")[-1]] = file_name
-            return field.type_name.split(".")[-1]
-        return field_type_mapping.get(field.type, "Any")
+            return f"Dict[{key_type}, {value_type}]"
+    if field.type in (descriptor_pb2.FieldDescriptorProto.TYPE_MESSAGE, descriptor_pb2.FieldDescriptorProto.TYPE_ENUM):
+        info = type_index.get(field.type_name)
+        if info is not None and info.generated:
+            # 引用的生成类型按全名记录, 生成 import 时区分不同包中的同名类型
+            out[info.full_name] = info
+        return get_type_name(field.type_name, file_name)
+    return field_type_mapping.get(field.type, "Any")
 
 
 @contextmanager
@@ -148,28 +484,270 @@ def code_generation() -> Iterator[Tuple[plugin_pb2.CodeGeneratorRequest, plugin_
     sys.stdout.buffer.write(output)
 
 
-def applyTemplate(filename: str, messages: List[Message], enums: List[Message], imports: List[str]) -> str:
-    filepath = os.path.join(os.path.dirname(__file__), "template.j2")
-    with open(filepath, "r", encoding="utf-8") as f:
-        tpl_str = f.read()
-        tpl = Template(tpl_str)
-        return tpl.render(name=filename, messages=messages, enums=enums, imports=imports)
+def get_template(name: str = "template.j2") -> Template:
+    """读取并编译模板, 每个进程只编译一次"""
+    template = _templates.get(name)
+    if template is None:
+        filepath = os.path.join(os.path.dirname(__file__), name)
+        with open(filepath, "r", encoding="utf-8") as f:
+            # 模板直接输出排版好的代码, 块标签所在的行不留空白
+            env = Environment(trim_blocks=True, lstrip_blocks=True, keep_trailing_newline=True)
+            template = _templates[name] = env.from_string(f.read())
+    return template
+
+
+def applyTemplate(filename: str, messages: List[Message], enums: List[Message], imports: List[str],
+                  converter: str = "reflect", lazy_types: Dict[str, str] = None) -> str:
+    return get_template().render(name=filename, messages=messages, enums=enums, imports=imports, converter=converter,
+                                 lazy_types=lazy_types or {})
+
+
+def get_exports(exported: List[ProtoType]) -> Dict[str, str]:
+    """lazy=true 时 __init__.py 导出的 {类名: 模块 或 "模块:原类名"}
+
+    Args:
+        exported (List[ProtoType]): 本次生成的全部消息和枚举
+
+    Returns:
+        Dict[str, str]: 按类名排序; 在生成的文件之间重名的类型以 ProtoType.alias 导出
+    """
+    names = defaultdict(int)
+    for info in exported:
+        names[info.name] += 1
+    exports = {}
+    for info in exported:
+        source = f".{info.python_module}"
+        if names[info.name] > 1:
+            exports[info.alias] = f"{source}:{info.name}"
+        else:
+            exports[info.name] = source
+    return dict(sorted(exports.items()))
+
+
+def apply_init_template(exports: Dict[str, str]) -> str:
+    """生成包的 __init__.py, 通过 PEP 562 __getattr__ 按需导入模型
+
+    Args:
+        exports (Dict[str, str]): {类名: 相对模块名}, 例如 {"Example": ".example_model"};
+            以别名导出时为 "模块:原类名", 例如 {"ShopItem": ".shop_model:Item"}
+
+    Returns:
+        str: __init__.py 的代码
+    """
+    names = defaultdict(list)
+    for name, module in exports.items():
+        module, _, attr = module.partition(":")
+        names[module].append(f"{attr} as {name}" if attr else name)
+    type_checking_imports = []
+    for module, module_names in sorted(names.items()):
+        line = f"from {module} import {', '.join(module_names)}"
+        if len(line) + 4 > MAX_LINE_LENGTH:
+            line = wrap_call(f"from {module} import (", module_names)
+        type_checking_imports.append(line)
+    return get_template("init_template.j2").render(exports=exports, type_checking_imports=type_checking_imports)
+
+
+def format_code(code: str, formatter: str = "none") -> str:
+    """按 formatter 参数格式化生成的代码
+
+    Args:
+        code (str): 模板输出的代码
+        formatter (str, optional): none, autopep8, 或者从 stdin 读取代码并把结果写到 stdout 的命令,
+            例如 "black -q -". Defaults to "none".
+
+    Returns:
+        str: 格式化后的代码
+    """
+    if formatter == "none":
+        return code
+    if formatter == "autopep8":
+        import autopep8
+        return autopep8.fix_code(
+            code,
+            options={
+                "max_line_length": MAX_LINE_LENGTH,
+                "in_place": True,
+                "aggressive": 5,
+            }
+        )
+    result = subprocess.run(shlex.split(formatter), input=code, capture_output=True, text=True, check=True)
+    return result.stdout
+
+
+def render_file(job: RenderJob, formatter: str = "none") -> str:
+    """渲染并格式化一个文件, 只依赖 job 本身, 可以在子进程中执行
+
+    Args:
+        job (RenderJob): applyTemplate 的参数
+        formatter (str, optional): 同 format_code. Defaults to "none".
+
+    Returns:
+        str: 生成的代码
+    """
+    return format_code(applyTemplate(*job), formatter)
+
+
+def get_generator_hash() -> str:
+    """插件版本和生成器源码(模板, main.py, inline.py)的 hash, 任一变化都会使缓存失效"""
+    global _generator_hash
+    if _generator_hash is None:
+        digest = hashlib.sha256(__version__.encode())
+        base = os.path.dirname(__file__)
+        for name in ("template.j2", "init_template.j2", "main.py", "inline.py"):
+            with open(os.path.join(base, name), "rb") as f:
+                digest.update(f.read())
+        _generator_hash = digest.hexdigest()
+    return _generator_hash
+
+
+def get_cache_keys(request: plugin_pb2.CodeGeneratorRequest, params: Dict[str, str]) -> Dict[str, str]:
+    """计算每个文件的缓存 key
+
+    key 由文件的 FileDescriptorProto, 直接依赖的 key(因此覆盖全部传递依赖), 影响输出的插件参数
+    和 get_generator_hash 决定. 文件的生成结果(包括类名和导入别名, 见 find_ambiguous_names)
+    只取决于这些输入, 与请求中其他无关的文件无关, 因此命中的缓存与重新生成的结果相同.
+
+    Args:
+        request (plugin_pb2.CodeGeneratorRequest): 插件请求
+        params (Dict[str, str]): parse_parameter 解析的参数
+
+    Returns:
+        Dict[str, str]: {proto 文件名: key}
+    """
+    options = ",".join(f"{k}={v}" for k, v in sorted(params.items()) if k not in _UNKEYED_PARAMETERS)
+    prefix = f"{get_generator_hash()}\n{options}\n".encode()
+    keys = {}
+    # protoc 保证依赖出现在依赖它的文件之前
+    for proto_file in request.proto_file:
+        digest = hashlib.sha256(prefix)
+        digest.update(proto_file.SerializeToString(deterministic=True))
+        for dep in proto_file.dependency:
+            digest.update(f"\n{dep}={keys.get(dep, '')}".encode())
+        keys[proto_file.name] = digest.hexdigest()
+    return keys
+
+
+def read_cache(cache_dir: str, key: str) -> str:
+    """读取缓存的生成结果, 不存在时返回 None"""
+    try:
+        with open(os.path.join(cache_dir, f"{key}.py"), "r", encoding="utf-8") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def write_cache(cache_dir: str, key: str, code: str):
+    """写入生成结果, 先写临时文件再改名, 并发的 protoc 进程不会读到写了一半的文件"""
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        path = os.path.join(cache_dir, f"{key}.py")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(code)
+        os.replace(tmp_path, path)
+    except OSError as err:
+        logging.warning(f"failed to write generation cache {cache_dir}: {err}")
+
+
+def get_jobs(value: str, files: int, formatter: str = "none") -> int:
+    """根据 jobs 参数计算进程数
+
+    Args:
+        value (str): jobs 参数, auto 或者进程数, 1 表示在当前进程中生成
+        files (int): 待生成的文件数
+        formatter (str, optional): formatter 参数. Defaults to "none".
+
+    Returns:
+        int: 进程数
+    """
+    if value in (None, "", "auto"):
+        # 不格式化时渲染一个文件不到 1ms, 启动进程池反而更慢
+        if files < PARALLEL_MIN_FILES or formatter == "none":
+            return 1
+        cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+        return max(1, min(cpus or 1, files))
+    return max(1, min(int(value), files))
+
+
+def render_files(jobs: List[RenderJob], workers: int, formatter: str = "none") -> List[str]:
+    """渲染全部文件, 结果顺序与 jobs 一致
+
+    Args:
+        jobs (List[RenderJob]): 每个文件的 applyTemplate 参数
+        workers (int): 进程数
+        formatter (str, optional): 同 format_code. Defaults to "none".
+
+    Returns:
+        List[str]: 每个文件生成的代码
+    """
+    render = partial(render_file, formatter=formatter)
+    if workers > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                chunksize = max(1, len(jobs) // (workers * 4))
+                return list(executor.map(render, jobs, chunksize=chunksize))
+        except (OSError, NotImplementedError) as err:
+            # 例如沙箱中不允许创建子进程
+            logging.warning(f"process pool unavailable, rendering serially: {err}")
+    return [render(job) for job in jobs]
+
+
+def parse_parameter(parameter: str) -> Dict[str, str]:
+    """解析插件参数, 例如 --pydantic_opt=converter=inline
+
+    Args:
+        parameter (str): CodeGeneratorRequest.parameter, 逗号分隔的 key=value
+
+    Returns:
+        Dict[str, str]: 参数字典
+    """
+    params = {}
+    for item in parameter.split(","):
+        if not item.strip():
+            continue
+        key, _, value = item.partition("=")
+        params[key.strip()] = value.strip()
+    return params
+
+
+def get_field_converter(field, type_str: str, is_repeated: bool, model_types: Set[str],
+                        oneof: str = "", module: str = "") -> FieldConverter:
+    """为 converter=inline 构造字段的转换代码
+
+    Args:
+        field (descriptor_pb2.FieldDescriptorProto): 字段
+        type_str (str): get_field_type 得到的 Python 类型
+        is_repeated (bool): 是否为 repeated(不含 map)
+        model_types (Set[str]): 请求中生成模型的消息全名
+        oneof (str, optional): 所属的 oneof 名. Defaults to "".
+        module (str, optional): 字段所在的 proto 文件名(不含扩展名). Defaults to "".
+
+    Returns:
+        FieldConverter: 字段转换代码
+    """
+    map_value = None
+    if check_if_map_field(field):
+        value_fd = type_index[field.type_name].map_value
+        value_type_name = value_fd.type_name.lstrip(".")
+        value_py_type = get_type_name(value_type_name, module) if value_type_name else ""
+        map_value = (value_kind(value_fd.type, value_type_name, model_types), value_py_type, value_type_name)
+    kind = value_kind(field.type, field.type_name, model_types)
+    return FieldConverter(field.name, field.type, is_repeated, kind, type_str, map_value, field.type_name, oneof)
 
 
 def get_map_field_types(field, imports: List[str], out: dict, file_name: str):
-    # 此函数假设您可以访问到整个文件的描述符，以便查找相应的嵌套类型
-    if field.type_name and field.type_name.startswith("."):
-        field.type_name = field.type_name[1:]
-    message_descriptor = pool.FindMessageTypeByName(field.type_name)
-    key_type = None
-    value_type = None
-    for field in message_descriptor.fields:
-        if field.name == "key":
-            key_type = get_field_type(field, imports, out, file_name)
-        elif field.name == "value":
-            value_type = get_field_type(field, imports, out, file_name)
-            if value_type == "Any":
-                imports.add("Any")
+    """map 字段的 key/value 类型, 从 type_index 中的 map entry 读取
+
+    Returns:
+        Tuple[str, str]: (key 类型, value 类型), 不是 map 字段时为 (None, None)
+    """
+    entry = type_index.get(field.type_name)
+    if entry is None or not entry.is_map_entry:
+        return None, None
+    key_type = get_field_type(entry.map_key, imports, out, file_name)
+    value_type = get_field_type(entry.map_value, imports, out, file_name)
+    if value_type == "Any":
+        imports.add("Any")
     return key_type, value_type
 
 
@@ -182,13 +760,16 @@ def is_valid_expression(s):
         return f'"{s}"'
 
 
-def set_default(type_str: str, ext: dict, fd: descriptor_pb2.FieldDescriptorProto):
+def set_default(type_str: str, ext: dict, fd: descriptor_pb2.FieldDescriptorProto, nullable: bool = False,
+                module: str = ""):
     """根据类型设置默认值
 
     Args:
         type_str (str): _description_
         ext (dict): _description_
         fd (descriptor_pb2.FieldDescriptorProto): _description_
+        nullable (bool, optional): 未设置时为 None, 例如 oneof 成员. Defaults to False.
+        module (str, optional): 字段所在的 proto 文件名(不含扩展名), 用于枚举类名. Defaults to "".
 
     Returns:
         _type_: _description_
@@ -204,7 +785,10 @@ def set_default(type_str: str, ext: dict, fd: descriptor_pb2.FieldDescriptorProt
             # logging.info(f"set python type:{ext['default']}")
             ext["default"] = ext["default"]
     else:
-        if type_str == "str":
+        if nullable or fd.type_name in WRAPPER_TYPES:
+            # 包装类型和 oneof 成员用 None 表示未设置
+            ext["default"] = None
+        elif type_str == "str":
             ext["default"] = '""'
         elif type_str == "int":
             ext["default"] = "0"
@@ -212,13 +796,13 @@ def set_default(type_str: str, ext: dict, fd: descriptor_pb2.FieldDescriptorProt
             ext["default"] = "0.0"
         elif type_str == "bool":
             ext["default"] = "False"
-        elif type_str == "bytes":
+        elif type_str == "BytesLike":
             ext["default"] = b""
-        elif type_str == "datetime.datetime":
+        elif type_str in ("datetime.datetime", "datetime.timedelta"):
             ext["default"] = None
         elif fd.type == descriptor_pb2.FieldDescriptorProto.TYPE_ENUM:
             # logging.debug(f"fd.type_name:{fd.DESCRIPTOR.enum_types_by_name}")
-            ext["default"] = f"{fd.type_name.split('.')[-1]}(0)"
+            ext["default"] = f"{get_type_name(fd.type_name, module)}(0)"
         elif type_str == "Any":
             ext["default"] = None
         elif type_str == "List":
@@ -239,18 +823,34 @@ def set_python_type_value(type_str: str, ext: dict):
     return ext
 
 
+def get_oneof_name(message: descriptor_pb2.DescriptorProto, field: descriptor_pb2.FieldDescriptorProto) -> str:
+    """字段所属的 oneof 名, proto3 optional 字段的合成 oneof 不算在内
+
+    Args:
+        message (descriptor_pb2.DescriptorProto): 字段所在的消息
+        field (descriptor_pb2.FieldDescriptorProto): 字段
+
+    Returns:
+        str: oneof 名, 不属于 oneof 时为空字符串
+    """
+    if not field.HasField("oneof_index") or field.proto3_optional:
+        return ""
+    return message.oneof_decl[field.oneof_index].name
+
+
 def check_if_map_field(field_descriptor):
-    # 检查字段是否是 repeated 类型
+    # map 字段是 repeated 的消息字段, 消息类型为 type_index 中的 map entry
     if field_descriptor.label != descriptor_pb2.FieldDescriptorProto.LABEL_REPEATED:
         return False
-    # 检查字段的类型是否是消息类型，因为 map 类型在 Protobuf 中实现为消息类型
     if field_descriptor.type != descriptor_pb2.FieldDescriptorProto.TYPE_MESSAGE:
         return False
-    # 检查消息类型是否以 'Entry' 结尾，这是一个通常的命名约定，用于 protobuf 中的 map entry 类型
-    return field_descriptor.type_name.endswith('Entry')
+    entry = type_index.get(field_descriptor.type_name)
+    return entry is not None and entry.is_map_entry
 
 
 def is_JSON_field(type_str):
+    if type_str == "Any":
+        return True
     field_types = ["message", "List", "Dict", "Tuple", "dict", "list", "tuple"]
     for field_type in field_types:
         if field_type in type_str:
@@ -258,7 +858,61 @@ def is_JSON_field(type_str):
     return False
 
 
-def get_table_args(ext: dict, pydantic_imports: Set[str]) -> List[str]:
+# sqlmodel 的 Field 同时传入 sa_column 时不接受这些参数, 需要写入 Column(...)
+SA_COLUMN_ARGS = ("primary_key", "nullable", "unique", "index")
+
+
+def column_declaration(column_type: str, ext: dict) -> str:
+    """sa_column 的 Column(...) 声明, ext 中只能由 Column 接受的参数从 ext 移入其中
+
+    Args:
+        column_type (str): 列类型, 例如 JSON, Enum(ExampleType)
+        ext (dict): 字段的参数
+
+    Returns:
+        str: 例如 Column(JSON, doc="Emails", index=True)
+    """
+    args = [column_type]
+    if ext.get("description"):
+        args.append(f"doc={ext['description']}")
+    for key in SA_COLUMN_ARGS:
+        if key in ext:
+            args.append(f"{key}={ext.pop(key)}")
+    return f"Column({', '.join(args)})"
+
+
+def get_index_declaration(index: dict, table_name: str, pydantic_imports: Set[str]) -> str:
+    """index_type 为 INDEX 或者带 where 的 UNIQUE 时生成 Index(...)
+
+    Args:
+        index (dict): CompoundIndex, 例如 {"indexs": ["age"], "index_type": "INDEX", "where": "age > 0"}
+        table_name (str): 表名(即 __tablename__), 未指定索引名时用于生成 ix_{表名}_{列名}
+        pydantic_imports (Set[str]): 需要从 sqlmodel 导入的名字
+
+    Returns:
+        str: 例如 Index("ix_users_age", "age", sqlite_where=text("age > 0"), postgresql_where=text("age > 0"))
+    """
+    columns = list(index["indexs"])
+    name = index.get("name") or "_".join(["ix", table_name, *columns])
+    args = [f'"{name}"'] + [f'"{column}"' for column in columns]
+    if index.get("index_type", "").lower() == "unique":
+        args.append("unique=True")
+    where = index.get("where")
+    if where:
+        # 部分索引, 只有 SQLite 和 PostgreSQL 支持
+        args.append(f"sqlite_where=text({where!r})")
+        args.append(f"postgresql_where=text({where!r})")
+        pydantic_imports.add("text")
+    include = index.get("include")
+    if include:
+        # 覆盖索引的 INCLUDE 列, 只有 PostgreSQL 支持; 其他数据库可以把列加入 indexs
+        args.append(f"postgresql_include={list(include)!r}")
+    pydantic_imports.add("Index")
+    # __table_args__ 中的每一项缩进 8 个空格
+    return wrap_call("Index(", args, indent=8)
+
+
+def get_table_args(ext: dict, table_name: str, pydantic_imports: Set[str]) -> List[str]:
     # # logging.info(f"message ext: {ext}")
     compound_indexs = ext.get("compound_index")
     args = []
@@ -266,17 +920,36 @@ def get_table_args(ext: dict, pydantic_imports: Set[str]) -> List[str]:
         for index in compound_indexs:
             arg = [f'"{i}"' for i in index["indexs"]]
             name = index.get("name")
+            index_type = index.get("index_type", "").lower()
             # arg.append(f'"{name}"')
-            if index.get("index_type", "").lower() == "UNIQUE".lower():
-                args.append(f"UniqueConstraint({','.join(arg)},name='{name}')")
+            if index_type == "index" or (index_type == "unique" and index.get("where")):
+                # 部分唯一索引不能用 UniqueConstraint 表示
+                args.append(get_index_declaration(index, table_name, pydantic_imports))
+            elif index_type == "UNIQUE".lower():
+                args.append(f"UniqueConstraint({', '.join(arg)}, name='{name}')")
                 pydantic_imports.add("UniqueConstraint")
-            if index.get("index_type", "").lower() == "PRIMARY".lower():
+            elif index_type == "PRIMARY".lower():
                 args.append(
-                    f"PrimaryKeyConstraint({','.join(arg)},name='{name}')")
+                    f"PrimaryKeyConstraint({', '.join(arg)}, name='{name}')")
                 pydantic_imports.add("PrimaryKeyConstraint")
     return args
 
 
+def mark_forward_refs(messages: List[Message], lazy_types: Dict[str, str]):
+    """把引用了延迟导入模型的字段标记为前向引用
+
+    Args:
+        messages (List[Message]): 本文件的消息
+        lazy_types (Dict[str, str]): 延迟导入的 {类名: 模块}
+    """
+    pattern = re.compile(r"\b(" + "|".join(re.escape(name) for name in lazy_types) + r")\b")
+    for message in messages:
+        for field in message.fields:
+            if pattern.search(field.type):
+                field.forward_ref = True
+                message.lazy = True
+
+
 def merge_imports(import_lines):
     """
     合并 Python import 语句，包括 `from ... import ...` 和 `import ...` 的情况，避免重复，
@@ -316,60 +989,124 @@ def merge_imports(import_lines):
     # 处理 `from ... import ...`
     for from_part, import_set in sorted(from_imports.items()):
         import_items = ", ".join(sorted(import_set))
-        merged_imports.append(f"from {from_part} import {import_items}")
+        line = f"from {from_part} import {import_items}"
+        if len(line) > MAX_LINE_LENGTH:
+            line = wrap_call(f"from {from_part} import (", sorted(import_set), indent=0)
+        merged_imports.append(line)
 
     return merged_imports
 
 
+def get_files_to_generate(request: plugin_pb2.CodeGeneratorRequest, dependencies: bool = False) -> Set[str]:
+    """需要生成模型的 proto 文件
+
+    request.proto_file 包含 file_to_generate 的全部传递依赖, 依赖只用于解析类型;
+    dependencies=true 时依赖也一起生成(google/protobuf 与 pydantic.proto 除外)
+
+    Args:
+        request (plugin_pb2.CodeGeneratorRequest): 插件请求
+        dependencies (bool, optional): 是否同时生成传递依赖. Defaults to False.
+
+    Returns:
+        Set[str]: proto 文件名
+    """
+    files = set(request.file_to_generate)
+    if dependencies:
+        deps = {proto_file.name: proto_file.dependency for proto_file in request.proto_file}
+        pending = list(files)
+        while pending:
+            for dep in deps.get(pending.pop(), ()):
+                if dep not in files:
+                    files.add(dep)
+                    pending.append(dep)
+    return files
+
+
 def generate_code(request: plugin_pb2.CodeGeneratorRequest,
                   response: plugin_pb2.CodeGeneratorResponse):
 
-    message_types = {}
+    params = parse_parameter(request.parameter)
+    converter = params.get("converter", "reflect")
+    if converter not in CONVERTERS:
+        response.error = f"unknown converter {converter!r}, expected one of {', '.join(CONVERTERS)}"
+        return
+    formatter = params.get("formatter", "none")
+    lazy = params.get("lazy", "false").lower() in ("true", "1", "yes")
+    dependencies = params.get("dependencies", "false").lower() in ("true", "1", "yes")
+    jobs_param = params.get("jobs", "auto")
+    if jobs_param != "auto" and not jobs_param.isdigit():
+        response.error = f"invalid jobs {jobs_param!r}, expected auto or a number of processes"
+        return
+    cache_dir = params.get("cache")
+    cache_keys = get_cache_keys(request, params) if cache_dir else {}
+    try:
+        index_types(request.proto_file)
+    except ValueError as err:
+        response.error = str(err)
+        return
+    # 请求中生成模型的消息全名(包括嵌套消息和不生成的依赖), 用于判断字段是否指向生成的模型
+    model_types = {info.full_name for info in type_index.values()
+                   if info.generated and not info.is_enum and not info.is_map_entry}
+    files_to_generate = get_files_to_generate(request, dependencies)
+
+    # lazy=true 时 __init__.py 导出的类型
+    exported: List[ProtoType] = []
+    render_jobs = []
+    job_keys = []
     for proto_file in request.proto_file:
         filename = os.path.basename(proto_file.name).split('.')[0]
 
         messages: List[Message] = []
         enums: List[Message] = []
-        try:
-            pool.Add(proto_file)
-        except Exception as err:
-            logging.error(
-                f"Error adding file {proto_file.name} to pool: {err}")
-            pass
         if proto_file.package == "pydantic":
             continue
         if "google/protobuf" in proto_file.name:
             continue  # 跳过 Protobuf 的内置类型文件
+        if proto_file.name not in files_to_generate:
+            continue  # 依赖文件只用于解析类型, 由单独的 protoc 调用生成
         imports = set()
         type_imports = set()
         sqlmodel_imports = set()
-        ext_message = {}
+        # 引用的生成类型 {全名: ProtoType}
+        ext_message: Dict[str, ProtoType] = {}
         ext_imports = set()
-        for enum in proto_file.enum_type:
-            message_types[enum.name] = filename
+        exported.extend(info for info in file_types[proto_file.name] if not info.is_map_entry)
+        # 嵌套的消息和枚举展开为顶层类, 类名见 index_types, 例如 Outer.Inner -> OuterInner
+        definitions = list(walk_types(proto_file))
+        for path, enum in definitions:
+            if not isinstance(enum, descriptor_pb2.EnumDescriptorProto):
+                continue
+            enum_name = type_index["." + ".".join([proto_file.package, *path] if proto_file.package else path)].name
             fields = []
             imports.add("from enum import Enum as _Enum")
 
             for value in enum.value:
                 fields.append(EnumField(value.name, value.number))
-            enums.append(Message(enum.name, fields, "enum"))
-        for message in proto_file.message_type:
+            enums.append(Message(enum_name, fields, "enum"))
+        for path, message in definitions:
+            if isinstance(message, descriptor_pb2.EnumDescriptorProto):
+                continue
             fields = []
-
-            message_types[message.name] = filename
+            full_name = ".".join([proto_file.package, *path] if proto_file.package else path)
+            message_name = type_index[f".{full_name}"].name
             message_ext = message.options.Extensions[pydantic_pb2.database]
             msg_ext = MessageToDict(message_ext)
 
+            oneofs: Dict[str, List[Field]] = {}
             for field in message.field:
                 # # logging.info(f"Field: {field.options.Extensions}")
                 field_extension = field.options.Extensions[pydantic_pb2.field]
                 ext = MessageToDict(field_extension)
                 required = False
+                oneof_name = get_oneof_name(message, field)
                 type_str = get_field_type(
                     field, type_imports, ext_message, filename)
                 # logging.info(f"field type is {type_str}")
                 if type_str in ["Any", "message"]:
                     type_imports.add("Any")
+                if "BytesLike" in type_str:
+                    # bytes 字段接受 bytearray/memoryview, 见 ext.BytesLike
+                    ext_imports.add("BytesLike")
                 is_repeated = field.label == descriptor_pb2.FieldDescriptorProto.LABEL_REPEATED and \
                     not check_if_map_field(
                         field)
@@ -383,8 +1120,11 @@ def generate_code(request: plugin_pb2.CodeGeneratorRequest,
                     if is_repeated:
                         _type_str = "List"
                     if not required:
-                        ext = set_default(_type_str, ext, field)
+                        ext = set_default(_type_str, ext, field, nullable=bool(oneof_name), module=filename)
                     ext = set_python_type_value(_type_str, ext)
+                elif oneof_name:
+                    # oneof 中未设置的成员为 None
+                    ext = {"default": None}
                 # logging.info(f"field name is {field.name}, type is {type_str}, ext is {ext}")
 
                 if ext.get("field_type") and msg_ext.get("as_table", False):
@@ -392,6 +1132,7 @@ def generate_code(request: plugin_pb2.CodeGeneratorRequest,
                     ext.pop("field_type")
                     ext["sa_type"] = field_type_str
                     sqlmodel_imports.add(field_type_str)
+                column_type = None
                 if ext and ext.get("sa_column_type") and msg_ext.get("as_table", False):
                     sqlmodel_imports.add("Column")
                     if "Enum" in ext["sa_column_type"]:
@@ -399,93 +1140,145 @@ def generate_code(request: plugin_pb2.CodeGeneratorRequest,
                     else:
                         sqlmodel_imports.add(ext["sa_column_type"])
 
-                    ext["sa_column"] = f"Column({ext['sa_column_type']}, doc={ext.get('description', '')})"
-                    ext.pop("sa_column_type")
+                    column_type = ext.pop("sa_column_type")
 
-                if is_JSON_field(type_str) and ext and msg_ext.get("as_table", False):
+                if (is_JSON_field(type_str) or is_repeated) and ext and msg_ext.get("as_table", False):
                     sqlmodel_imports.add("JSON")
                     sqlmodel_imports.add("Column")
-                    ext["sa_column"] = f"Column(JSON, doc={ext.get('description', '')})"
+                    column_type = "JSON"
+                if column_type:
+                    ext["sa_column"] = column_declaration(column_type, ext)
+                if not msg_ext.get("as_table", False):
+                    # 列参数只对表模型有意义, pydantic 的 Field 会把它们作为额外参数写入 JSON schema 并给出弃用警告
+                    for key in SA_COLUMN_ARGS:
+                        ext.pop(key, None)
                 if ext and ext.get("description") and not ext.get("sa_column") and msg_ext.get("as_table", False):
                     ext["sa_column_kwargs"] = {"comment": ext["description"].replace('"', "")}
                     # logging.info(f"sa_column_kwargs is {ext['sa_column_kwargs']}")
 
-                attr = ",".join(f'{key}={value}' for key,
-                                value in ext.items())
+                attr = [f'{key}={value}' for key, value in ext.items()]
                 if is_repeated:
                     type_imports.add("List")
                 if field.label == descriptor_pb2.FieldDescriptorProto.LABEL_OPTIONAL:
                     type_imports.add("Optional")
 
-                if type_str == "datetime.datetime":
+                if "datetime." in type_str:
                     imports.add("import datetime")
 
+                field_converter = None
+                if converter == "inline":
+                    field_converter = get_field_converter(field, type_str, is_repeated, model_types, oneof_name,
+                                                          filename)
+                    ext_imports.update(field_converter.ext_imports)
+                    imports.update(field_converter.imports)
                 f = Field(field.name, type_str, is_repeated,
-                          required, attr)
+                          required, attr, field_converter)
+                if oneof_name:
+                    f.oneof = oneof_name
+                    oneofs.setdefault(oneof_name, []).append(f)
 
                 fields.append(f)
             type_imports.add("Type")
+            if oneofs:
+                type_imports.update(("ClassVar", "Dict", "Tuple"))
+                # 生成的 model_validator 拒绝同一个 oneof 中设置了多个成员的模型
+                imports.add("from pydantic import model_validator")
+                ext_imports.add("check_oneofs")
+                if converter == "inline":
+                    ext_imports.add("oneof_error")
 
             message_ext = message.options.Extensions[pydantic_pb2.database]
             # ext = MessageToDict(message_ext)
 
-            table_args = get_table_args(msg_ext, sqlmodel_imports)
+            # 与 Message 中的 __tablename__ 一致
+            table_name = inflection.underscore(msg_ext.get("table_name") or message_name)
+            table_args = get_table_args(msg_ext, table_name, sqlmodel_imports)
             # logging.info(f"table args is {table_args}")
             sqlmodel_imports_str = ", ".join(set(sqlmodel_imports))
             sqlmodel_imports_str = f"from sqlmodel import {sqlmodel_imports_str}" if sqlmodel_imports_str else ""
             imports.add(sqlmodel_imports_str)
             if msg_ext.get("as_table", False):
                 imports.add("from sqlmodel import SQLModel, Field")
-                ext_imports.add("PySQLModel")
+                imports.add("from pydantic import ConfigDict")
+                # ext 不导入 sqlmodel, 表模型专用的部分在 orm 中
+                imports.add("from protobuf_pydantic_gen.orm import PySQLModel")
             else:
                 imports.add("from pydantic import BaseModel, ConfigDict")
                 imports.add("from pydantic import Field as _Field")
 
                 ext_imports.add("PydanticModel")
-            ext_imports.add("model2protobuf")
-            ext_imports.add("protobuf2model")
-            ext_imports.add("pool")
+            if converter == "inline":
+                ext_imports.update(("build_model", "construct_model", "conversion_metrics"))
+            else:
+                ext_imports.add("model2protobuf")
+                ext_imports.add("protobuf2model")
+            ext_imports.add("get_message_class")
             imports.add("from google.protobuf import message as _message")
-            imports.add("from google.protobuf import message_factory")
             messages.append(
                 Message(
-                    message.name,
+                    message_name,
                     fields,
                     table_name=msg_ext.get("table_name"),
                     as_table=msg_ext.get("as_table", False),
-                    table_args=",".join(table_args),
-                    full_name=f"{proto_file.package}.{message.name}"
+                    trusted=msg_ext.get("trusted", False),
+                    table_args=table_args,
+                    full_name=full_name,
+                    oneofs=[Oneof(name, members) for name, members in oneofs.items()]
                 )
             )
         type_imports_str = ", ".join(type_imports)
 
         type_imports_str = f"from typing import {type_imports_str}" if type_imports_str else ""
         imports.add(type_imports_str)
-        for msg_type in ext_message.keys():
-            import_from = message_types.get(msg_type)
-            if import_from is None:
+        lazy_types = {}
+        for info in ext_message.values():
+            if info.module == filename:
+                continue
+            # 与其他包中的类型重名时以别名导入, 例如 from .shop_model import Item as ShopV1Item
+            local_name = get_type_name(info.full_name, filename)
+            # 枚举用于字段默认值, 必须在定义模型时导入; 模型类可以延迟到 model_rebuild 时导入
+            if lazy and not info.is_enum:
+                source = f".{info.python_module}"
+                lazy_types[local_name] = source if local_name == info.name else f"{source}:{info.name}"
                 continue
-            if message_types.get(msg_type) != filename:
-                imports.add(
-                    f"from .{message_types.get(msg_type)}_model import {msg_type}")
+            alias = "" if local_name == info.name else f" as {local_name}"
+            imports.add(f"from .{info.python_module} import {info.name}{alias}")
+        if lazy_types:
+            lazy_types = dict(sorted(lazy_types.items()))
+            mark_forward_refs(messages, lazy_types)
+            # model_rebuild 的返回值注解
+            imports.add("from typing import TYPE_CHECKING, Optional")
+            ext_imports.add("import_lazy_types")
         if len(ext_imports):
             imports.add(
                 f"from protobuf_pydantic_gen.ext import {', '.join(ext_imports)}")
         imports = merge_imports(imports)
-        code = applyTemplate(filename, messages, enums, imports)
+        # 模板渲染和格式化只依赖本文件的数据, 收集后统一(可并行)处理
+        render_jobs.append((filename, messages, enums, imports, converter, lazy_types))
+        job_keys.append(cache_keys.get(proto_file.name))
 
-        code = autopep8.fix_code(
-            code,
-            options={
-                "max_line_length": 120,
-                "in_place": True,
-                "aggressive": 5,
-            }
-        )
+    codes = [read_cache(cache_dir, key) if key else None for key in job_keys]
+    misses = [i for i, code in enumerate(codes) if code is None]
+    workers = get_jobs(jobs_param, len(misses), formatter)
+    try:
+        rendered = render_files([render_jobs[i] for i in misses], workers, formatter)
+    except (OSError, subprocess.CalledProcessError) as err:
+        stderr = getattr(err, "stderr", "") or ""
+        response.error = f"formatter {formatter!r} failed: {err} {stderr}".strip()
+        return
+    for i, code in zip(misses, rendered):
+        codes[i] = code
+        if job_keys[i]:
+            write_cache(cache_dir, job_keys[i], code)
+    if cache_dir:
+        logging.info(f"generation cache {cache_dir}: {len(codes) - len(misses)} hits, {len(misses)} misses")
+    for job, code in zip(render_jobs, codes):
         response.file.add(
-            name=filename.lower() +
+            name=job[0].lower() +
             '_model.py',
             content=code)
+    if lazy:
+        response.file.add(name="__init__.py", content=apply_init_template(get_exports(exported)))
 
 
 def main():
@@ -0,0 +1,395 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+'''
+@File    :   orm.py
+@Time    :   2024/07/20 10:16:48
+@Desc    :   SQLModel 表模型相关的扩展, 只由 as_table 的生成模型导入;
+             protobuf_pydantic_gen.ext 不依赖 sqlmodel/SQLAlchemy, 纯 pydantic 模型不会加载它们
+'''
+
+import importlib
+from enum import Enum
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Sequence, Tuple, Type, TypeVar, Union
+
+from google.protobuf import message as _message
+from google.protobuf.json_format import MessageToDict, ParseDict
+from sqlalchemy import Column, Connection, Select, Table, insert
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import sqltypes
+from sqlmodel import SQLModel
+
+from protobuf_pydantic_gen.ext import ProtobufMessage, _WELL_KNOWN_READERS, fill_message, is_map
+
+PySQLModel = TypeVar("PySQLModel", bound=SQLModel)
+
+RowReader = Callable[[_message.Message], Any]
+ColumnWriter = Callable[[_message.Message, Any], None]
+
+# (表模型, 消息描述符) -> [(列名, 读取函数)]
+_row_plans: Dict[Tuple[type, Any], List[Tuple[str, RowReader]]] = {}
+# (表模型, 消息描述符) -> [(列, 写入函数)]
+_query_plans: Dict[Tuple[type, Any], List[Tuple[Column, ColumnWriter]]] = {}
+
+
+def _to_json(msg: _message.Message) -> Any:
+    # 与 ParseDict 对称; 枚举写为数字, 与 pydantic 模型 model_dump 的结果一致
+    return MessageToDict(msg, preserving_proto_field_name=True, use_integers_for_enums=True)
+
+
+def _json_reader(fd) -> RowReader:
+    """JSON 列: 子消息转为 dict, repeated/map 转为 list/dict"""
+    name = fd.name
+    if is_map(fd):
+        value_fd = fd.message_type.fields_by_name['value']
+        if value_fd.type == value_fd.TYPE_MESSAGE:
+            return lambda proto: {k: _to_json(v) for k, v in getattr(proto, name).items()}
+        return lambda proto: dict(getattr(proto, name))
+    if fd.label == fd.LABEL_REPEATED:
+        if fd.type == fd.TYPE_MESSAGE:
+            return lambda proto: [_to_json(item) for item in getattr(proto, name)]
+        return lambda proto: list(getattr(proto, name))
+    if fd.type == fd.TYPE_MESSAGE:
+        return lambda proto: _to_json(getattr(proto, name)) if proto.HasField(name) else None
+    return lambda proto: getattr(proto, name)
+
+
+def _enum_reader(fd, column_type) -> RowReader:
+    """枚举列: 有 enum_class 时转为枚举成员, 只声明了取值时转为枚举值名, 其他列类型保留数字"""
+    name = fd.name
+    if not isinstance(column_type, sqltypes.Enum):
+        return lambda proto: getattr(proto, name)
+    if column_type.enum_class is not None:
+        members = {member.value: member for member in column_type.enum_class}
+        return lambda proto: members.get(getattr(proto, name))
+    names = {value.number: value.name for value in fd.enum_type.values}
+    return lambda proto: names.get(getattr(proto, name))
+
+
+def _column_reader(fd, column) -> RowReader:
+    """为单个列生成读取函数 read(proto), 返回可以直接绑定到该列的值
+
+    Args:
+        fd (FieldDescriptor): 列对应的字段描述符
+        column (Column): 表中的列
+
+    Returns:
+        RowReader: 读取函数
+    """
+    name = fd.name
+    if isinstance(column.type, sqltypes.JSON):
+        return _json_reader(fd)
+    if fd.label == fd.LABEL_REPEATED:
+        # 非 JSON 列保存 repeated/map 字段, 例如 ARRAY
+        return _json_reader(fd)
+    if fd.type == fd.TYPE_ENUM:
+        return _enum_reader(fd, column.type)
+    if fd.type == fd.TYPE_MESSAGE:
+        # Timestamp/Duration/wrapper 等转为对应的 Python 值, 其他子消息转为 dict
+        read = _WELL_KNOWN_READERS.get(fd.message_type.full_name, _to_json)
+        return lambda proto: read(getattr(proto, name)) if proto.HasField(name) else None
+    return lambda proto: getattr(proto, name)
+
+
+def _oneof_reader(fd, read: RowReader) -> RowReader:
+    # oneof 中未设置的成员写入 NULL, 读回时不会设置该字段
+    oneof, name = fd.containing_oneof.name, fd.name
+    return lambda proto: read(proto) if proto.WhichOneof(oneof) == name else None
+
+
+def get_row_plan(model_cls: Type[SQLModel], descriptor) -> List[Tuple[str, RowReader]]:
+    """获取(必要时编译并缓存)表模型按列读取消息的计划
+
+    Args:
+        model_cls (Type[SQLModel]): as_table 生成的表模型
+        descriptor (Descriptor): 消息描述符
+
+    Returns:
+        List[Tuple[str, RowReader]]: [(列名, 读取函数)], 只包含消息中存在的列
+    """
+    key = (model_cls, descriptor)
+    plan = _row_plans.get(key)
+    if plan is not None:
+        return plan
+    plan = []
+    for column in model_cls.__table__.columns:
+        fd = descriptor.fields_by_name.get(column.key)
+        if fd is None:
+            continue
+        read = _column_reader(fd, column)
+        # 包括 proto3 optional 的合成 oneof: 未设置时写入 NULL 而不是默认值
+        if fd.containing_oneof is not None:
+            read = _oneof_reader(fd, read)
+        plan.append((column.key, read))
+    _row_plans[key] = plan
+    return plan
+
+
+def stream_protobufs_to_rows(model_cls: Type[SQLModel],
+                             protos: Iterable[_message.Message]) -> Iterator[Dict[str, Any]]:
+    """惰性地把消息转换为 {列名: 值} 字典, 不构造模型实例, 也不经过 pydantic 校验
+
+    Args:
+        model_cls (Type[SQLModel]): as_table 生成的表模型
+        protos (Iterable[_message.Message]): 消息序列, 也可以是 repeated 字段
+
+    Yields:
+        Iterator[Dict[str, Any]]: 可以直接用于 insert(table) 的行
+    """
+    plan = descriptor = None
+    for proto in protos:
+        if proto.DESCRIPTOR is not descriptor:
+            descriptor = proto.DESCRIPTOR
+            plan = get_row_plan(model_cls, descriptor)
+        yield {name: read(proto) for name, read in plan}
+
+
+def protobufs_to_rows(model_cls: Type[SQLModel], protos: Iterable[_message.Message]) -> List[Dict[str, Any]]:
+    """批量把消息转换为 {列名: 值} 字典, 见 stream_protobufs_to_rows"""
+    return list(stream_protobufs_to_rows(model_cls, protos))
+
+
+def upsert_statement(table: Table, dialect: str, columns: Sequence[str], conflict_columns: Sequence[str] = None):
+    """生成按方言冲突时更新的 INSERT 语句
+
+    Args:
+        table (Table): 目标表
+        dialect (str): 方言名, 支持 sqlite, postgresql 和 mysql
+        columns (Sequence[str]): 插入的列
+        conflict_columns (Sequence[str], optional): 判断冲突的唯一约束列, 默认为主键
+
+    Returns:
+        Insert: 冲突时用新值更新其余列的语句, 没有其余列时忽略冲突
+    """
+    if conflict_columns is None:
+        conflict_columns = [column.key for column in table.primary_key.columns]
+    if dialect in ("sqlite", "postgresql"):
+        stmt = importlib.import_module(f"sqlalchemy.dialects.{dialect}").insert(table)
+        updates = {name: stmt.excluded[name] for name in columns if name not in conflict_columns}
+        if not updates:
+            return stmt.on_conflict_do_nothing(index_elements=conflict_columns)
+        return stmt.on_conflict_do_update(index_elements=conflict_columns, set_=updates)
+    if dialect == "mysql":
+        stmt = importlib.import_module("sqlalchemy.dialects.mysql").insert(table)
+        # MySQL 按表上全部唯一约束判断冲突, 这里只用于排除不需要更新的列
+        updates = {name: stmt.inserted[name] for name in columns if name not in conflict_columns}
+        return stmt.on_duplicate_key_update(updates or {name: stmt.inserted[name] for name in conflict_columns})
+    raise ValueError(f"upsert is not supported for dialect {dialect!r}")
+
+
+def bulk_insert(session: Union[Session, Connection],
+                model_cls: Type[SQLModel],
+                protos: Iterable[_message.Message],
+                chunk_size: int = 1000,
+                upsert: bool = False,
+                conflict_columns: Sequence[str] = None) -> int:
+    """把一批消息直接写入表模型对应的表, 按 chunk_size 分批执行 executemany,
+    不构造 SQLModel 实例, 也不经过 session 的 unit of work
+
+    JSON 列中的子消息保存为 dict, 枚举列按列类型保存为枚举成员/取值名,
+    Timestamp/Duration 列保存为 datetime/timedelta. 提交事务由调用方负责.
+
+    Args:
+        session (Union[Session, Connection]): SQLAlchemy/SQLModel 的 Session 或 Connection
+        model_cls (Type[SQLModel]): as_table 生成的表模型
+        protos (Iterable[_message.Message]): 消息序列, 也可以是生成器或 repeated 字段
+        chunk_size (int, optional): 每次执行的行数. Defaults to 1000.
+        upsert (bool, optional): 冲突时更新已有的行, 见 upsert_statement. Defaults to False.
+        conflict_columns (Sequence[str], optional): upsert 判断冲突的列, 默认为主键
+
+    Returns:
+        int: 写入的行数
+    """
+    table = model_cls.__table__
+    stmt = None
+    count = 0
+    rows = stream_protobufs_to_rows(model_cls, protos)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return count
+        if stmt is None:
+            if upsert:
+                bind = session.get_bind() if isinstance(session, Session) else session
+                stmt = upsert_statement(table, bind.dialect.name, list(chunk[0]), conflict_columns)
+            else:
+                stmt = insert(table)
+        session.execute(stmt, chunk)
+        count += len(chunk)
+
+
+def _map_key(key_fd) -> Callable[[str], Any]:
+    # JSON 中 map 的 key 都是字符串
+    if key_fd.type == key_fd.TYPE_STRING:
+        return str
+    if key_fd.type == key_fd.TYPE_BOOL:
+        return lambda key: key in (True, "true")
+    return int
+
+
+def _json_writer(fd) -> ColumnWriter:
+    """JSON 列: 与 _json_reader 对称, dict 按 JSON 格式解析到子消息"""
+    name = fd.name
+    if is_map(fd):
+        key = _map_key(fd.message_type.fields_by_name['key'])
+        value_fd = fd.message_type.fields_by_name['value']
+        if value_fd.type == value_fd.TYPE_MESSAGE:
+            def write_map(proto, value):
+                field = getattr(proto, name)
+                for k, v in value.items():
+                    ParseDict(v, field[key(k)])
+            return write_map
+        return lambda proto, value: getattr(proto, name).update({key(k): v for k, v in value.items()})
+    if fd.label == fd.LABEL_REPEATED:
+        if fd.type == fd.TYPE_MESSAGE:
+            def write_items(proto, value):
+                field = getattr(proto, name)
+                for item in value:
+                    ParseDict(item, field.add())
+            return write_items
+        return lambda proto, value: getattr(proto, name).extend(value)
+    if fd.type == fd.TYPE_MESSAGE:
+        return lambda proto, value: ParseDict(value, getattr(proto, name))
+    return lambda proto, value: setattr(proto, name, value)
+
+
+def _enum_writer(fd) -> ColumnWriter:
+    """枚举列: 枚举成员, 取值名和数字都转换为枚举值"""
+    name = fd.name
+    numbers = {value.name: value.number for value in fd.enum_type.values}
+
+    def write(proto, value):
+        if isinstance(value, Enum):
+            value = value.value
+        elif isinstance(value, str):
+            value = numbers[value]
+        setattr(proto, name, value)
+    return write
+
+
+def _column_writer(fd, column) -> ColumnWriter:
+    """为单个列生成写入函数 write(proto, value), 与 _column_reader 对称; value 为 NULL 时不调用
+
+    Args:
+        fd (FieldDescriptor): 列对应的字段描述符
+        column (Column): 表中的列
+
+    Returns:
+        ColumnWriter: 写入函数
+    """
+    name = fd.name
+    if isinstance(column.type, sqltypes.JSON) or fd.label == fd.LABEL_REPEATED:
+        return _json_writer(fd)
+    if fd.type == fd.TYPE_ENUM:
+        return _enum_writer(fd)
+    if fd.type == fd.TYPE_MESSAGE:
+        # datetime/timedelta 等由 well-known 类型的写入函数处理, dict 按 JSON 格式解析
+        return lambda proto, value: fill_message(getattr(proto, name), value)
+    return lambda proto, value: setattr(proto, name, value)
+
+
+def get_query_plan(model_cls: Type[SQLModel], descriptor) -> List[Tuple[Column, ColumnWriter]]:
+    """获取(必要时编译并缓存)把表模型的列写入消息的计划
+
+    Args:
+        model_cls (Type[SQLModel]): as_table 生成的表模型
+        descriptor (Descriptor): 消息描述符
+
+    Returns:
+        List[Tuple[Column, ColumnWriter]]: [(列, 写入函数)], 只包含消息中存在的列
+    """
+    key = (model_cls, descriptor)
+    plan = _query_plans.get(key)
+    if plan is not None:
+        return plan
+    plan = []
+    for column in model_cls.__table__.columns:
+        fd = descriptor.fields_by_name.get(column.key)
+        if fd is not None:
+            plan.append((column, _column_writer(fd, column)))
+    _query_plans[key] = plan
+    return plan
+
+
+def _execute_columns(session: Union[Session, Connection], statement: Select, descriptor, yield_per: int):
+    """把 select(表模型) 改为只查询消息中存在的列, 以 yield_per 分批从游标读取
+
+    Returns:
+        Tuple[Result, List[ColumnWriter]]: 结果(每行为列值元组)和与列顺序一致的写入函数
+    """
+    # select(Example) 的 type 为表模型; select(Example.name) 的 entity 也是 Example, type 为列类型
+    entity = statement.column_descriptions[0].get("type") if statement.column_descriptions else None
+    if getattr(entity, "__table__", None) is None:
+        raise ValueError("statement must select a table model, e.g. select(Example)")
+    plan = get_query_plan(entity, descriptor)
+    # 保留原语句的 where/order_by/limit/join, 只替换查询的列
+    statement = statement.with_only_columns(*[column for column, _ in plan], maintain_column_froms=True)
+    result = session.execute(statement, execution_options={"yield_per": yield_per})
+    return result, [write for _, write in plan]
+
+
+def stream_query_to_protobufs(session: Union[Session, Connection],
+                              statement: Select,
+                              proto_cls: Type[ProtobufMessage],
+                              yield_per: int = 1000) -> Iterator[ProtobufMessage]:
+    """执行 select(表模型), 把每行的列值直接写入消息, 不构造 ORM 实例;
+    行以 yield_per 分批从游标读取, 内存占用与结果集大小无关. 适用于 gRPC server-streaming
+
+    Args:
+        session (Union[Session, Connection]): SQLAlchemy/SQLModel 的 Session 或 Connection
+        statement (Select): 查询语句, 例如 select(Example).where(Example.age > 18)
+        proto_cls (Type[ProtobufMessage]): 目标消息类
+        yield_per (int, optional): 每次从游标读取的行数. Defaults to 1000.
+
+    Yields:
+        Iterator[ProtobufMessage]: 每行对应的消息
+    """
+    result, writers = _execute_columns(session, statement, proto_cls.DESCRIPTOR, yield_per)
+    try:
+        for row in result:
+            proto = proto_cls()
+            for write, value in zip(writers, row):
+                if value is not None:
+                    write(proto, value)
+            yield proto
+    finally:
+        result.close()
+
+
+def stream_query_pages(session: Union[Session, Connection],
+                       statement: Select,
+                       response_cls: Type[ProtobufMessage],
+                       field: str,
+                       page_size: int = 100,
+                       yield_per: int = 1000) -> Iterator[ProtobufMessage]:
+    """执行 select(表模型), 把行直接写入响应消息的 repeated 字段, 每 page_size 行生成一个响应
+
+    Args:
+        session (Union[Session, Connection]): SQLAlchemy/SQLModel 的 Session 或 Connection
+        statement (Select): 查询语句, 例如 select(Example).order_by(Example.name)
+        response_cls (Type[ProtobufMessage]): 响应消息类, 例如 ListExamplesResponse
+        field (str): 响应中的 repeated 消息字段, 例如 "items"
+        page_size (int, optional): 每个响应的行数, 最后一个响应可能不足. Defaults to 100.
+        yield_per (int, optional): 每次从游标读取的行数. Defaults to 1000.
+
+    Yields:
+        Iterator[ProtobufMessage]: 响应消息, 查询没有结果时不生成响应
+    """
+    descriptor = response_cls.DESCRIPTOR.fields_by_name[field].message_type
+    result, writers = _execute_columns(session, statement, descriptor, yield_per)
+    try:
+        response = response_cls()
+        items = getattr(response, field)
+        for row in result:
+            proto = items.add()
+            for write, value in zip(writers, row):
+                if value is not None:
+                    write(proto, value)
+            if len(items) >= page_size:
+                yield response
+                response = response_cls()
+                items = getattr(response, field)
+        if len(items):
+            yield response
+    finally:
+        result.close()
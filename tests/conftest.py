@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+'''
+@File    :   conftest.py
+@Time    :   2024/07/29 10:02:17
+@Desc    :   测试共用的路径设置(与 benchmarks/common.py 一样导入 models 和 pb 中的示例),
+             以及在临时目录中编译 proto, 运行插件并导入生成模型的 protoc fixture
+'''
+
+import importlib
+import os
+import re
+import sys
+from typing import Dict, List
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# pb/*_pb2.py 之间使用顶层 import, 需要把 pb 目录也加入 sys.path
+for path in (ROOT, os.path.join(ROOT, "pb")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import example_pb2  # noqa: E402,F401  注册 pydantic_example.* 到默认 pool
+from google.protobuf import descriptor_pb2  # noqa: E402
+from google.protobuf.compiler import plugin_pb2  # noqa: E402
+from grpc_tools import protoc as grpc_protoc  # noqa: E402
+
+from protobuf_pydantic_gen.main import generate_code  # noqa: E402
+
+
+class Protoc:
+    """在临时目录中编译 proto 并运行插件
+
+    proto 文件会被 import 到默认 pool 中, 不同测试需要使用不同的文件名和包名
+
+    Args:
+        root (str): 临时目录
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.proto_dir = os.path.join(root, "protos")
+        self.pb_dir = os.path.join(root, "pb")
+        os.makedirs(self.proto_dir, exist_ok=True)
+        os.makedirs(self.pb_dir, exist_ok=True)
+
+    def request(self, sources: Dict[str, str], files: List[str] = None,
+                parameter: str = "") -> plugin_pb2.CodeGeneratorRequest:
+        """编译 proto, 构造与 protoc 调用插件时相同的请求
+
+        Args:
+            sources (Dict[str, str]): {文件名: proto 源码}, 可以 import protos/ 下的示例和 pydantic.proto
+            files (List[str], optional): file_to_generate, 默认为 sources 中的全部文件
+            parameter (str, optional): 插件参数. Defaults to "".
+
+        Returns:
+            plugin_pb2.CodeGeneratorRequest: 插件请求, proto_file 中依赖在前
+        """
+        for name, source in sources.items():
+            with open(os.path.join(self.proto_dir, name), "w", encoding="utf-8") as f:
+                f.write(source)
+        files = list(files or sources)
+        descriptor_set = os.path.join(self.root, "descriptor_set.pb")
+        include = os.path.join(os.path.dirname(grpc_protoc.__file__), "_proto")
+        args = ["protoc", f"-I{self.proto_dir}", f"-I{os.path.join(ROOT, 'protos')}", f"-I{ROOT}", f"-I{include}",
+                f"--descriptor_set_out={descriptor_set}", "--include_imports", f"--python_out={self.pb_dir}",
+                *files]
+        if grpc_protoc.main(args) != 0:
+            raise RuntimeError(f"protoc failed: {' '.join(args)}")
+        file_set = descriptor_pb2.FileDescriptorSet()
+        with open(descriptor_set, "rb") as f:
+            file_set.ParseFromString(f.read())
+        request = plugin_pb2.CodeGeneratorRequest(parameter=parameter, file_to_generate=files)
+        request.proto_file.extend(file_set.file)
+        return request
+
+    def generate(self, sources: Dict[str, str], files: List[str] = None, parameter: str = "") -> Dict[str, str]:
+        """运行插件, 返回 {生成的文件名: 代码}"""
+        response = plugin_pb2.CodeGeneratorResponse()
+        generate_code(self.request(sources, files, parameter), response)
+        if response.error:
+            raise RuntimeError(response.error)
+        return {file.name: file.content for file in response.file}
+
+    def load(self, sources: Dict[str, str], module: str, files: List[str] = None, parameter: str = ""):
+        """生成模型到临时包中, 导入 sources 对应的 *_pb2 后返回生成的模块
+
+        Args:
+            sources (Dict[str, str]): 同 request
+            module (str): 生成的模块名, 例如 order_model
+            files (List[str], optional): 同 request
+            parameter (str, optional): 插件参数. Defaults to "".
+        """
+        outputs = self.generate(sources, files, parameter)
+        package = re.sub(r"\W", "_", f"gen_{os.path.basename(self.root)}")
+        package_dir = os.path.join(self.root, package)
+        os.makedirs(package_dir, exist_ok=True)
+        for name, code in outputs.items():
+            with open(os.path.join(package_dir, name), "w", encoding="utf-8") as f:
+                f.write(code)
+        for path in (self.root, self.pb_dir):
+            if path not in sys.path:
+                sys.path.insert(0, path)
+        for name in sources:
+            # 注册消息到默认 pool, 生成的 to_protobuf 按全名查找消息类
+            importlib.import_module(f"{os.path.splitext(name)[0]}_pb2")
+        return importlib.import_module(f"{package}.{module}")
+
+
+@pytest.fixture
+def protoc(tmp_path) -> Protoc:
+    return Protoc(str(tmp_path))
+
+
+@pytest.fixture(scope="session")
+def make_protoc(tmp_path_factory):
+    """返回在新临时目录中创建 Protoc 的函数, 供 module 级的 fixture 只生成一次模型(表模型不能重复定义)"""
+    return lambda name: Protoc(str(tmp_path_factory.mktemp(name)))
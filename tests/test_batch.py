@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+'''
+@File    :   test_batch.py
+@Time    :   2024/07/31 17:32:08
+@Desc    :   ext 中的批量转换: models_to_protobufs 返回列表或追加到 repeated 字段, protobufs_to_models,
+             结果与逐个调用 to_protobuf/from_protobuf 相同
+'''
+
+import importlib
+
+import pytest
+from pydantic import BaseModel
+
+from protobuf_pydantic_gen.ext import models_to_protobufs, protobufs_to_models
+
+BATCH_PROTO = '''
+syntax = "proto3";
+package {package};
+
+enum Kind {{
+    KIND_UNSET = 0;
+    BOOK = 1;
+    PEN = 2;
+}}
+message Item {{
+    string sku = 1;
+    int32 qty = 2;
+    Kind kind = 3;
+    map<string, string> labels = 4;
+}}
+message ListItemsResponse {{
+    repeated Item items = 1;
+    int32 total = 2;
+}}
+'''
+
+
+@pytest.fixture(scope="module", params=["reflect", "inline"])
+def batch_models(make_protoc, request):
+    package = f"batch_{request.param}"
+    models = make_protoc(package).load({f"{package}.proto": BATCH_PROTO.format(package=package)},
+                                       f"{package}_model", parameter=f"converter={request.param}")
+    return models, importlib.import_module(f"{package}_pb2")
+
+
+def make_items(models, count):
+    return [models.Item(sku=f"sku-{i}", qty=i, kind=models.Kind(i % 3), labels={"i": str(i)}) for i in range(count)]
+
+
+def test_models_to_protobufs_list(batch_models):
+    models, pb = batch_models
+    items = make_items(models, 5)
+    protos = models_to_protobufs(items, pb.Item)
+    assert protos == [item.to_protobuf() for item in items]
+    assert models_to_protobufs([], pb.Item) == []
+
+
+def test_models_to_protobufs_appends_to_repeated_field(batch_models):
+    models, pb = batch_models
+    items = make_items(models, 3)
+    response = pb.ListItemsResponse(items=[pb.Item(sku="first")], total=4)
+    appended = models_to_protobufs(items, out=response.items)
+    assert list(response.items) == [pb.Item(sku="first")] + [item.to_protobuf() for item in items]
+    # 返回的是追加到 response 中的消息本身
+    appended[0].qty = 100
+    assert response.items[1].qty == 100 and response.total == 4
+
+
+def test_models_to_protobufs_requires_one_target(batch_models):
+    models, pb = batch_models
+    response = pb.ListItemsResponse()
+    with pytest.raises(ValueError, match="exactly one of proto_cls and out must be given"):
+        models_to_protobufs(make_items(models, 1))
+    with pytest.raises(ValueError, match="exactly one of proto_cls and out must be given"):
+        models_to_protobufs(make_items(models, 1), pb.Item, out=response.items)
+
+
+class ItemRef(BaseModel):
+    sku: str = ""
+
+
+def test_models_to_protobufs_mixed_inputs(batch_models):
+    # 同一批中的不同模型类和 dict 分别按自己的方式转换
+    models, pb = batch_models
+    first, last = make_items(models, 2)
+    batch = [first, ItemRef(sku="b"), {"sku": "c", "kind": "PEN"}, last]
+    assert models_to_protobufs(iter(batch), pb.Item) == [
+        first.to_protobuf(), pb.Item(sku="b"), pb.Item(sku="c", kind=pb.PEN), last.to_protobuf()]
+
+
+@pytest.mark.parametrize("trusted", [False, True])
+def test_protobufs_to_models(batch_models, trusted):
+    models, pb = batch_models
+    response = pb.ListItemsResponse()
+    models_to_protobufs(make_items(models, 4), out=response.items)
+    converted = protobufs_to_models(models.Item, response.items, trusted=trusted)
+    assert converted == [models.Item.from_protobuf(item) for item in response.items] == make_items(models, 4)
+    assert all(type(item.kind) is models.Kind for item in converted)
+    assert protobufs_to_models(models.Item, [], trusted=trusted) == []
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+'''
+@File    :   test_bulk_insert.py
+@Time    :   2024/07/30 11:06:24
+@Desc    :   orm 中绕过 ORM 实例的批量写入: bulk_insert 和 upsert_statement, 在 SQLite 上验证
+'''
+
+import datetime
+import importlib
+
+import pytest
+from google.protobuf.timestamp_pb2 import Timestamp
+from sqlalchemy import select
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, create_engine
+
+from protobuf_pydantic_gen import orm
+
+BULK_PROTO = '''
+syntax = "proto3";
+import "google/protobuf/timestamp.proto";
+import "protobuf_pydantic_gen/pydantic.proto";
+package bulk_test;
+
+enum Status {
+    STATUS_UNSET = 0;
+    OPEN = 1;
+    DONE = 2;
+}
+message Note {
+    string text = 1;
+}
+message Task {
+    option (pydantic.database) = { as_table: true, table_name: "bulk_tasks" };
+    int64 id = 1 [(pydantic.field) = {primary_key: true}];
+    string title = 2;
+    optional int32 priority = 3;
+    Status status = 4 [(pydantic.field) = {sa_column_type: "Enum(Status)"}];
+    Note note = 5 [(pydantic.field) = {sa_column_type: "JSON"}];
+    google.protobuf.Timestamp due = 6;
+    oneof target {
+        string email = 7;
+        int64 user_id = 8;
+    }
+}
+'''
+
+DUE = datetime.datetime(2024, 7, 30, 12, 0, 0)
+
+
+@pytest.fixture(scope="module")
+def bulk_models(make_protoc):
+    models = make_protoc("bulk_test").load({"bulk_test.proto": BULK_PROTO}, "bulk_test_model")
+    return models, importlib.import_module("bulk_test_pb2")
+
+
+@pytest.fixture
+def engine(bulk_models):
+    models, _ = bulk_models
+    engine = create_engine("sqlite://")
+    models.Task.metadata.create_all(engine, tables=[models.Task.__table__])
+    yield engine
+    engine.dispose()
+
+
+def make_tasks(pb, count):
+    tasks = []
+    for i in range(1, count + 1):
+        due = Timestamp()
+        due.FromDatetime(DUE + datetime.timedelta(days=i))
+        task = pb.Task(id=i, title=f"task {i}", status=pb.OPEN if i % 2 else pb.DONE,
+                       note=pb.Note(text=f"note {i}"), due=due)
+        if i % 2:
+            task.priority = i
+            task.email = f"{i}@example.com"
+        else:
+            task.user_id = i * 10
+        tasks.append(task)
+    return tasks
+
+
+def test_bulk_insert_writes_rows(bulk_models, engine):
+    models, pb = bulk_models
+    table = models.Task.__table__
+    with Session(engine) as session:
+        assert orm.bulk_insert(session, models.Task, make_tasks(pb, 5), chunk_size=2) == 5
+        session.commit()
+        rows = session.execute(select(table).order_by(table.c.id)).mappings().all()
+    assert [row["id"] for row in rows] == [1, 2, 3, 4, 5]
+    first, second = rows[0], rows[1]
+    assert (first["title"], first["priority"], first["email"], first["user_id"]) == ("task 1", 1, "1@example.com", None)
+    # 未设置的 optional 字段和 oneof 成员写入 NULL, 而不是默认值
+    assert (second["priority"], second["email"], second["user_id"]) == (None, None, 20)
+    assert first["status"] == models.Status.OPEN and second["status"] == models.Status.DONE
+    assert first["note"] == {"text": "note 1"}
+    assert first["due"] == DUE + datetime.timedelta(days=1)
+
+
+def test_bulk_insert_upsert(bulk_models, engine):
+    models, pb = bulk_models
+    table = models.Task.__table__
+    with Session(engine) as session:
+        orm.bulk_insert(session, models.Task, make_tasks(pb, 3))
+        changed = make_tasks(pb, 4)
+        changed[0].title = "renamed"
+        assert orm.bulk_insert(session, models.Task, changed, upsert=True) == 4
+        session.commit()
+        titles = session.execute(select(table.c.title).order_by(table.c.id)).scalars().all()
+    assert titles == ["renamed", "task 2", "task 3", "task 4"]
+    with pytest.raises(IntegrityError, match="UNIQUE constraint failed"):
+        with Session(engine) as session:
+            orm.bulk_insert(session, models.Task, make_tasks(pb, 1))
+
+
+def test_upsert_statement(bulk_models):
+    models, _ = bulk_models
+    table = models.Task.__table__
+    sqlite_sql = str(orm.upsert_statement(table, "sqlite", ["id", "title"]).compile(dialect=sqlite.dialect()))
+    assert "ON CONFLICT (id) DO UPDATE SET title = excluded.title" in sqlite_sql
+    # 只有冲突列时没有可以更新的列
+    assert "ON CONFLICT (id) DO NOTHING" in str(
+        orm.upsert_statement(table, "sqlite", ["id"]).compile(dialect=sqlite.dialect()))
+    assert "ON CONFLICT (title) DO UPDATE SET id = excluded.id" in str(
+        orm.upsert_statement(table, "sqlite", ["id", "title"], ["title"]).compile(dialect=sqlite.dialect()))
+    mysql_sql = str(orm.upsert_statement(table, "mysql", ["id", "title"]).compile(dialect=mysql.dialect()))
+    assert "ON DUPLICATE KEY UPDATE title = VALUES(title)" in mysql_sql
+    with pytest.raises(ValueError, match="upsert is not supported for dialect 'mssql'"):
+        orm.upsert_statement(table, "mssql", ["id"])
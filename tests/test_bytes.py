@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+'''
+@File    :   test_bytes.py
+@Time    :   2024/07/31 15:40:22
+@Desc    :   bytes 字段: 校验构造的模型接受并保存 bytearray/memoryview, to_protobuf 复制为 bytes, 不经过 base64
+'''
+
+import importlib
+
+import pytest
+from pydantic import ValidationError
+
+BYTES_PROTO = '''
+syntax = "proto3";
+import "google/protobuf/wrappers.proto";
+import "protobuf_pydantic_gen/pydantic.proto";
+package {package};
+
+message Blob {{
+    bytes data = 1 [(pydantic.field) = {{description: "data"}}];
+    repeated bytes chunks = 2 [(pydantic.field) = {{description: "chunks"}}];
+    map<string, bytes> parts = 3 [(pydantic.field) = {{description: "parts"}}];
+    optional bytes extra = 4 [(pydantic.field) = {{description: "extra"}}];
+    google.protobuf.BytesValue wrapped = 5 [(pydantic.field) = {{description: "wrapped"}}];
+}}
+'''
+
+
+@pytest.fixture(scope="module", params=["reflect", "inline"])
+def bytes_models(make_protoc, request):
+    package = f"bytes_{request.param}"
+    protoc = make_protoc(package)
+    sources = {f"{package}.proto": BYTES_PROTO.format(package=package)}
+    parameter = f"converter={request.param}"
+    code = protoc.generate(sources, parameter=parameter)[f"{package}_model.py"]
+    models = protoc.load(sources, f"{package}_model", parameter=parameter)
+    return code, models, importlib.import_module(f"{package}_pb2")
+
+
+def test_bytes_fields_use_bytes_like(bytes_models):
+    code, _, _ = bytes_models
+    assert "data: Optional[BytesLike] = _Field(description=\"data\", default=b'')" in code
+    assert "chunks: Optional[List[BytesLike]]" in code and "parts: Optional[Dict[str, BytesLike]]" in code
+    assert "wrapped: Optional[BytesLike]" in code
+    assert "BytesLike" in code.split("from protobuf_pydantic_gen.ext import")[1]
+
+
+def test_validated_model_keeps_buffers(bytes_models):
+    _, models, pb = bytes_models
+    payload = bytearray(b"payload")
+    view = memoryview(payload)[1:4]
+    blob = models.Blob(data=view, chunks=[payload, b"c"], parts={"a": view}, extra=payload, wrapped=view)
+    # 校验构造时不复制缓冲区
+    assert blob.data is view and blob.chunks[0] is payload and blob.parts["a"] is view
+    assert blob.to_protobuf() == pb.Blob(data=b"ayl", chunks=[b"payload", b"c"], parts={"a": b"ayl"},
+                                         extra=b"payload", wrapped=pb.google_dot_protobuf_dot_wrappers__pb2.BytesValue(
+                                             value=b"ayl"))
+    assert blob.model_dump() == {"data": b"ayl", "chunks": [b"payload", b"c"], "parts": {"a": b"ayl"},
+                                 "extra": b"payload", "wrapped": b"ayl"}
+    assert models.Blob.model_validate_json(blob.model_dump_json()).data == b"ayl"
+
+
+def test_bytes_validation(bytes_models):
+    _, models, pb = bytes_models
+    assert models.Blob(data="text", parts={}).data == b"text"
+    with pytest.raises(ValidationError):
+        models.Blob(data=1, parts={})
+    msg = pb.Blob(data=b"\x00\xff", chunks=[b"x"], extra=b"")
+    blob = models.Blob.from_protobuf(msg)
+    assert (blob.data, blob.chunks, blob.extra, blob.wrapped) == (b"\x00\xff", [b"x"], b"", None)
+    assert blob.to_protobuf() == msg
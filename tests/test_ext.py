@@ -0,0 +1,251 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+'''
+@File    :   test_ext.py
+@Time    :   2024/07/31 16:20:45
+@Desc    :   ext 直接转换与旧的 json_format 转换结果一致: 标量, map, repeated 消息, 枚举, Timestamp 和未设置的字段
+             与 benchmarks/legacy.py(0.1.5 版本)对比; 消息 map, Duration, 包装类型, Struct/Value/Any 旧版本不支持,
+             与 MessageToDict/ParseDict 的输出对比; 转换计划的缓存
+'''
+
+import datetime
+import importlib
+import os
+import sys
+
+import pytest
+from google.protobuf.json_format import MessageToDict, ParseDict
+from pydantic import BaseModel, Field
+
+import example_pb2
+from protobuf_pydantic_gen import ext
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+import legacy  # noqa: E402
+
+PARITY_PROTO = '''
+syntax = "proto3";
+import "google/protobuf/timestamp.proto";
+import "protobuf_pydantic_gen/pydantic.proto";
+package {package};
+
+enum Color {{
+    COLOR_UNSET = 0;
+    RED = 1;
+    BLUE = 2;
+}}
+message Item {{
+    string name = 1 [(pydantic.field) = {{description: "name"}}];
+    int32 qty = 2 [(pydantic.field) = {{description: "qty"}}];
+}}
+message Record {{
+    string name = 1 [(pydantic.field) = {{description: "name"}}];
+    int64 big = 2 [(pydantic.field) = {{description: "big"}}];
+    double ratio = 3 [(pydantic.field) = {{description: "ratio"}}];
+    bool flag = 4 [(pydantic.field) = {{description: "flag"}}];
+    uint32 small = 5 [(pydantic.field) = {{description: "small"}}];
+    Color color = 6 [(pydantic.field) = {{description: "color"}}];
+    repeated Color colors = 7 [(pydantic.field) = {{description: "colors"}}];
+    Item item = 8 [(pydantic.field) = {{description: "item"}}];
+    repeated Item items = 9 [(pydantic.field) = {{description: "items"}}];
+    repeated string tags = 10 [(pydantic.field) = {{description: "tags"}}];
+    map<string, string> labels = 11 [(pydantic.field) = {{description: "labels"}}];
+    google.protobuf.Timestamp created = 12 [(pydantic.field) = {{description: "created"}}];
+}}
+'''
+
+WKT_PROTO = '''
+syntax = "proto3";
+import "google/protobuf/any.proto";
+import "google/protobuf/duration.proto";
+import "google/protobuf/struct.proto";
+import "google/protobuf/timestamp.proto";
+import "google/protobuf/wrappers.proto";
+import "protobuf_pydantic_gen/pydantic.proto";
+package {package};
+
+message Payload {{
+    string name = 1 [(pydantic.field) = {{description: "name"}}];
+}}
+message Event {{
+    google.protobuf.Timestamp created = 1 [(pydantic.field) = {{description: "created"}}];
+    google.protobuf.Duration timeout = 2 [(pydantic.field) = {{description: "timeout"}}];
+    google.protobuf.Int64Value limit = 3 [(pydantic.field) = {{description: "limit"}}];
+    google.protobuf.DoubleValue score = 4 [(pydantic.field) = {{description: "score"}}];
+    google.protobuf.BoolValue enabled = 5 [(pydantic.field) = {{description: "enabled"}}];
+    google.protobuf.StringValue label = 6 [(pydantic.field) = {{description: "label"}}];
+    google.protobuf.Struct meta = 7 [(pydantic.field) = {{description: "meta"}}];
+    google.protobuf.Value value = 8 [(pydantic.field) = {{description: "value"}}];
+    google.protobuf.ListValue values = 9 [(pydantic.field) = {{description: "values"}}];
+    google.protobuf.Any payload = 10 [(pydantic.field) = {{description: "payload"}}];
+    map<string, Payload> by_name = 11 [(pydantic.field) = {{description: "by_name"}}];
+}}
+'''
+
+WKT_FIELDS = ["created", "timeout", "limit", "score", "enabled", "label", "meta", "value", "values", "payload"]
+
+
+def load(make_protoc, proto, name, converter):
+    package = f"{name}_{converter}"
+    models = make_protoc(package).load({f"{package}.proto": proto.format(package=package)}, f"{package}_model",
+                                       parameter=f"converter={converter}")
+    return models, importlib.import_module(f"{package}_pb2")
+
+
+@pytest.fixture(scope="module", params=["reflect", "inline"])
+def parity_models(make_protoc, request):
+    return load(make_protoc, PARITY_PROTO, "ext_parity", request.param)
+
+
+@pytest.fixture(scope="module", params=["reflect", "inline"])
+def wkt_models(make_protoc, request):
+    return load(make_protoc, WKT_PROTO, "ext_wkt", request.param)
+
+
+def make_records(pb):
+    full = pb.Record(name="a", big=1 << 40, ratio=0.5, flag=True, small=7, color=pb.RED, colors=[pb.RED, pb.BLUE],
+                     item=pb.Item(name="i", qty=1), items=[pb.Item(name="j"), pb.Item(qty=2)], tags=["x", "y"],
+                     labels={"k": "v"})
+    full.created.FromDatetime(datetime.datetime(2024, 7, 31, 8, 30, 0, 123000))
+    # 只设置了部分字段, 以及全部未设置
+    partial = pb.Record(color=pb.BLUE, items=[pb.Item()])
+    return [full, partial, pb.Record()]
+
+
+def test_from_protobuf_matches_legacy(parity_models):
+    models, pb = parity_models
+    for msg in make_records(pb):
+        model = models.Record.from_protobuf(msg)
+        assert model == legacy.protobuf2model(models.Record, msg)
+        assert model.model_dump() == legacy.protobuf2model(models.Record, msg).model_dump()
+        assert models.Record.from_protobuf(msg, trusted=True) == model
+
+
+def test_to_protobuf_matches_legacy(parity_models):
+    models, pb = parity_models
+    for msg in make_records(pb):
+        model = models.Record.from_protobuf(msg)
+        assert model.to_protobuf() == legacy.model2protobuf(model, pb.Record())
+        assert models.Record.from_protobuf(model.to_protobuf()) == model
+
+
+def test_none_fields_match_legacy(parity_models):
+    # 显式为 None 的消息和 Timestamp 字段不写入消息
+    models, pb = parity_models
+    model = models.Record(item=None, created=None, colors=[], items=[], tags=[], labels={})
+    proto = model.to_protobuf()
+    assert proto == legacy.model2protobuf(model, pb.Record())
+    assert not proto.HasField("item") and not proto.HasField("created")
+    assert models.Record.from_protobuf(proto) == model
+    # 旧实现在 repeated 字段为 None(默认值)时报错, 现在按空列表处理
+    assert models.Record(item=None, colors=[], labels={}).to_protobuf() == pb.Record()
+
+
+def make_event(pb):
+    event = pb.Event()
+    event.created.FromDatetime(datetime.datetime(2024, 7, 31, 8, 30, 0, 5000))
+    event.timeout.FromTimedelta(datetime.timedelta(seconds=90, microseconds=500))
+    event.limit.value = 1 << 40
+    event.score.value = 0.25
+    event.enabled.value = False
+    event.label.value = ""
+    event.meta.update({"count": 3, "tags": ["a", None, True], "owner": {"id": 1.5}})
+    event.value.string_value = "v"
+    event.values.extend([1, "x", None])
+    event.payload.Pack(pb.Payload(name="p"))
+    event.by_name["k"].name = "n"
+    return event
+
+
+def test_from_protobuf_matches_json_format(wkt_models):
+    models, pb = wkt_models
+    event = make_event(pb)
+    model = models.Event.from_protobuf(event)
+    assert model.created == event.created.ToDatetime() and model.timeout == event.timeout.ToTimedelta()
+    # 包装类型的值与 MessageToDict 相同(int64 在 JSON 中是字符串); 设置为默认值的包装类型也不是 None
+    assert (model.limit, model.score, model.enabled, model.label) == (
+        int(MessageToDict(event.limit)), MessageToDict(event.score), False, "")
+    for name in ("meta", "value", "values", "payload"):
+        assert getattr(model, name) == MessageToDict(getattr(event, name)), name
+    assert model.by_name == {"k": models.Payload(**MessageToDict(event)["byName"]["k"])}
+
+
+def test_to_protobuf_matches_json_format(wkt_models):
+    models, pb = wkt_models
+    event = make_event(pb)
+    model = models.Event.from_protobuf(event)
+    proto = model.to_protobuf()
+    assert proto == event
+    assert MessageToDict(proto) == MessageToDict(event)
+    assert proto.meta == ParseDict(model.meta, type(event.meta)())
+    assert proto.payload == ParseDict(model.payload, type(event.payload)())
+    assert ext.unpack_any(proto.payload) == pb.Payload(name="p")
+    assert proto.by_name == ParseDict(model.model_dump(include={"by_name"}), pb.Event()).by_name
+
+
+def test_well_known_unset_fields(wkt_models):
+    models, pb = wkt_models
+    model = models.Event.from_protobuf(pb.Event())
+    assert all(getattr(model, name) is None for name in WKT_FIELDS) and model.by_name == {}
+    proto = models.Event(by_name={}, **{name: None for name in WKT_FIELDS}).to_protobuf()
+    assert proto == pb.Event()
+    assert not any(proto.HasField(name) for name in WKT_FIELDS)
+
+
+class Plain(BaseModel):
+    name: str = "plain"
+
+
+class Aliased(BaseModel):
+    name: str = Field("aliased", alias="full_name")
+
+
+def test_plan_is_reused(monkeypatch):
+    compiled = []
+    compile_plan = ext._compile_plan
+    monkeypatch.setattr(ext, "_compile_plan", lambda *args: compiled.append(args) or compile_plan(*args))
+    descriptor = example_pb2.Nested.DESCRIPTOR
+    plan = ext.get_conversion_plan(Plain, descriptor)
+    assert ext.get_conversion_plan(Plain, descriptor) is plan
+    for _ in range(3):
+        assert ext.model2protobuf(Plain(name="p"), example_pb2.Nested()) == example_pb2.Nested(name="p")
+        assert ext.protobuf2model(Plain, example_pb2.Nested(name="x")) == Plain(name="x")
+    assert ext.get_conversion_plan(Plain, descriptor) is plan
+    # 每个 (方向, 模型类, 描述符) 最多编译一次
+    assert len(compiled) == len(set(compiled)) <= 2
+    from_plan = ext.get_conversion_plan(Plain, descriptor, ext.FROM_PROTOBUF)
+    assert from_plan is not plan and (from_plan.direction, plan.direction) == (ext.FROM_PROTOBUF, ext.TO_PROTOBUF)
+
+
+def test_models_sharing_descriptor():
+    descriptor = example_pb2.Nested.DESCRIPTOR
+    plain = ext.get_conversion_plan(Plain, descriptor, ext.FROM_PROTOBUF)
+    aliased = ext.get_conversion_plan(Aliased, descriptor, ext.FROM_PROTOBUF)
+    assert plain is not aliased
+    assert (plain.model_cls, aliased.model_cls) == (Plain, Aliased)
+    assert plain.descriptor is aliased.descriptor is descriptor
+    msg = example_pb2.Nested(name="x")
+    # 交替转换, 每个模型类使用自己的计划: 带 alias 的字段校验时不接受字段名, 取默认值
+    for _ in range(2):
+        assert ext.protobuf2model(Plain, msg) == Plain(name="x")
+        assert ext.protobuf2model(Aliased, msg) == Aliased()
+        assert ext.protobuf2model(Aliased, msg, trusted=True) == Aliased()
+        assert ext.model2protobuf(Plain(name="p"), example_pb2.Nested()) == example_pb2.Nested(name="p")
+        assert ext.model2protobuf(Aliased(full_name="a"), example_pb2.Nested()) == example_pb2.Nested(name="a")
+
+
+def test_clear_conversion_plans():
+    msg = example_pb2.Nested(name="x")
+    assert ext.protobuf2model(Plain, msg) == Plain(name="x")
+    plan = ext.get_conversion_plan(Plain, msg.DESCRIPTOR, ext.FROM_PROTOBUF)
+    assert plan in ext.cached_conversion_plans()
+    assert repr(plan) == "ConversionPlan(Plain, pydantic_example.Nested, from_protobuf, ['name'])"
+    ext.clear_conversion_plans()
+    assert ext.cached_conversion_plans() == []
+    # 清空后按需重新编译
+    assert ext.protobuf2model(Plain, msg) == Plain(name="x")
+    assert ext.protobuf2model(Plain, msg, trusted=True) == Plain(name="x")
+    assert ext.model2protobuf(Plain(name="p"), example_pb2.Nested()) == example_pb2.Nested(name="p")
+    assert plan not in ext.cached_conversion_plans()
+    assert {(p.model_cls, p.direction) for p in ext.cached_conversion_plans()} == {
+        (Plain, ext.FROM_PROTOBUF), (Plain, ext.FROM_PROTOBUF_TRUSTED), (Plain, ext.TO_PROTOBUF)}
@@ -0,0 +1,488 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+'''
+@File    :   test_generate.py
+@Time    :   2024/07/29 16:04:33
+@Desc    :   插件生成结果: 嵌套类型的类名, 重名类型的导入别名, 生成缓存, to_protobuf 使用缓存的消息类,
+             converter=inline 生成的转换代码, 知名类型的映射, jobs 并行生成,
+             dependencies 与只生成 file_to_generate, formatter 与不格式化时的排版, lazy=true 按需导入
+'''
+
+import importlib
+import os
+import subprocess
+import sys
+
+import pytest
+from google.protobuf.field_mask_pb2 import FieldMask
+from google.protobuf.json_format import MessageToDict
+from google.protobuf.wrappers_pb2 import Int64Value
+
+from protobuf_pydantic_gen import ext
+from protobuf_pydantic_gen.main import get_files_to_generate, get_jobs
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 嵌套的 Order.Item 与顶层的 OrderItem 按路径拼接后同名, 之前后生成的 Order.Item 覆盖了 OrderItem,
+# Order.lines 绑定到 Order.Item, from_protobuf 报 sku Field required
+COLLIDE_PROTO = '''
+syntax = "proto3";
+package {package};
+
+message OrderItem {{
+    int32 quantity = 1;
+}}
+message Order {{
+    message Item {{
+        string sku = 1;
+    }}
+    Item summary = 1;
+    repeated OrderItem lines = 2;
+}}
+'''
+
+
+@pytest.mark.parametrize("converter", ["reflect", "inline"])
+def test_nested_name_collision_uses_qualified_name(protoc, converter):
+    package = f"collide_{converter}"
+    sources = {f"{package}.proto": COLLIDE_PROTO.format(package=package)}
+    code = protoc.generate(sources, parameter=f"converter={converter}")[f"{package}_model.py"]
+    assert code.count("class OrderItem(") == 1
+    assert "class Order_Item(" in code
+    assert "summary: Optional[Order_Item]" in code
+    assert "lines: Optional[List[OrderItem]]" in code
+
+    models = protoc.load(sources, f"{package}_model", parameter=f"converter={converter}")
+    pb = importlib.import_module(f"{package}_pb2")
+    msg = pb.Order(summary=pb.Order.Item(sku="A-1"), lines=[pb.OrderItem(quantity=2), pb.OrderItem(quantity=3)])
+    order = models.Order.from_protobuf(msg)
+    assert isinstance(order.summary, models.Order_Item)
+    assert order.summary.sku == "A-1"
+    assert [type(line) for line in order.lines] == [models.OrderItem] * 2
+    assert [line.quantity for line in order.lines] == [2, 3]
+    assert order.to_protobuf() == msg
+
+
+def test_unresolvable_name_collision_fails_generation(protoc):
+    source = COLLIDE_PROTO.format(package="collide_error") + '''
+message Order_Item {
+    string name = 1;
+}
+'''
+    with pytest.raises(RuntimeError, match="collide_error.Order.Item and collide_error.Order_Item both generate class "
+                                           "Order_Item"):
+        protoc.generate({"collide_error.proto": source})
+
+
+ALIAS_SOURCES = {
+    "alias_shop.proto": 'syntax = "proto3"; package alias.shop; message Item { string sku = 1; }',
+    "alias_catalog.proto": 'syntax = "proto3"; package alias.catalog; message Item { string title = 1; }',
+    "alias_order.proto": '''
+syntax = "proto3";
+import "alias_shop.proto";
+package alias.order;
+message Order {
+    alias.shop.Item item = 1;
+}
+''',
+}
+
+
+def test_alias_does_not_depend_on_unrelated_files(protoc):
+    # 之前重名按整个请求计算: 命令行上多了一个无关的 alias_catalog.proto, alias_order_model.py 就改用别名
+    files = ["alias_shop.proto", "alias_order.proto"]
+    alone = protoc.generate(ALIAS_SOURCES, files=files)
+    together = protoc.generate(ALIAS_SOURCES, files=files + ["alias_catalog.proto"])
+    assert together["alias_order_model.py"] == alone["alias_order_model.py"]
+    assert "from .alias_shop_model import Item\n" in alone["alias_order_model.py"]
+
+    exports = protoc.generate(ALIAS_SOURCES, files=files + ["alias_catalog.proto"], parameter="lazy=true")
+    init = exports["__init__.py"]
+    assert "AliasShopItem" in init and "AliasCatalogItem" in init and "Order" in init
+
+
+def test_alias_when_names_collide_in_module(protoc):
+    sources = dict(ALIAS_SOURCES)
+    sources["alias_order.proto"] = '''
+syntax = "proto3";
+import "alias_shop.proto";
+import "alias_catalog.proto";
+package alias.order;
+message Item {
+    int32 quantity = 1;
+}
+message Order {
+    alias.shop.Item item = 1;
+    alias.catalog.Item entry = 2;
+    map<string, alias.shop.Item> items = 3;
+    Item line = 4;
+}
+'''
+    code = protoc.generate(sources)["alias_order_model.py"]
+    assert "from .alias_shop_model import Item as AliasShopItem" in code
+    assert "from .alias_catalog_model import Item as AliasCatalogItem" in code
+    assert "item: Optional[AliasShopItem]" in code
+    assert "entry: Optional[AliasCatalogItem]" in code
+    assert "items: Optional[Dict[str, AliasShopItem]]" in code
+    assert "line: Optional[Item]" in code
+
+
+def test_cache_hit_matches_cold_run(protoc, tmp_path):
+    # 缓存 key 不包含请求中的其他文件, 这些文件不能影响生成结果
+    cache = f"cache={tmp_path / 'cache'}"
+    files = ["alias_shop.proto", "alias_order.proto"]
+    warm = protoc.generate(ALIAS_SOURCES, files=files + ["alias_catalog.proto"], parameter=cache)
+    assert os.listdir(tmp_path / "cache")
+    hit = protoc.generate(ALIAS_SOURCES, files=files, parameter=cache)
+    cold = protoc.generate(ALIAS_SOURCES, files=files)
+    assert hit == cold
+    assert hit["alias_order_model.py"] == warm["alias_order_model.py"]
+
+
+@pytest.mark.parametrize("converter", ["reflect", "inline"])
+def test_to_protobuf_uses_cached_message_class(protoc, converter):
+    package = f"message_class_{converter}"
+    source = f'syntax = "proto3"; package {package}; message Ping {{ string id = 1; }}'
+    sources = {f"{package}.proto": source}
+    code = protoc.generate(sources, parameter=f"converter={converter}")[f"{package}_model.py"]
+    assert f'get_message_class("{package}.Ping")' in code
+    assert "FindMessageTypeByName" not in code
+
+    models = protoc.load(sources, f"{package}_model", parameter=f"converter={converter}")
+    pb = importlib.import_module(f"{package}_pb2")
+    assert models.Ping(id="a").to_protobuf() == pb.Ping(id="a")
+    hits = ext.get_message_class.cache_info().hits
+    assert models.Ping(id="b").to_protobuf() == pb.Ping(id="b")
+    assert ext.get_message_class.cache_info().hits == hits + 1
+    assert ext.get_message_class(f"{package}.Ping") is pb.Ping
+    assert ext.unpack_any(ext.pack_any(pb.Ping(id="c"))) == pb.Ping(id="c")
+
+
+INLINE_PROTO = '''
+syntax = "proto3";
+import "google/protobuf/timestamp.proto";
+package {package};
+
+enum Kind {{
+    KIND_UNSET = 0;
+    BOOK = 1;
+}}
+message Part {{
+    string name = 1;
+}}
+message Doc {{
+    string title = 1;
+    Kind kind = 2;
+    Part part = 3;
+    repeated Part parts = 4;
+    map<string, Part> by_name = 5;
+    map<string, int32> counts = 6;
+    repeated Kind kinds = 7;
+    google.protobuf.Timestamp created = 8;
+    oneof target {{
+        string email = 9;
+        int64 user_id = 10;
+    }}
+}}
+'''
+
+
+def test_inline_converter_is_straight_line(protoc):
+    package = "inline_code"
+    code = protoc.generate({f"{package}.proto": INLINE_PROTO.format(package=package)},
+                           parameter="converter=inline")[f"{package}_model.py"]
+    # 运行时不遍历描述符, 不检查注解, 不动态导入
+    for name in ("model2protobuf", "protobuf2model", "DESCRIPTOR", "get_origin", "importlib", "ListFields"):
+        assert name not in code, name
+    assert '_proto.title = _value if _value is not None else ""' in code
+    assert "_proto.kind = enum_number(Kind, _value) if _value is not None else 0" in code
+    assert "_proto.counts.update(_value)" in code
+    assert '"parts": [Part.from_protobuf(_v, trusted) for _v in src.parts],' in code
+    assert '"created": timestamp_to_datetime(src.created) if src.HasField("created") else None,' in code
+
+
+def test_inline_matches_reflect(protoc):
+    converted = {}
+    for converter in ("reflect", "inline"):
+        package = f"inline_same_{converter}"
+        sources = {f"{package}.proto": INLINE_PROTO.format(package=package)}
+        models = protoc.load(sources, f"{package}_model", parameter=f"converter={converter}")
+        pb = importlib.import_module(f"{package}_pb2")
+        full = pb.Doc(title="t", kind=pb.BOOK, part=pb.Part(name="p"), parts=[pb.Part(name="a"), pb.Part()],
+                      by_name={"k": pb.Part(name="v")}, counts={"x": 1}, kinds=[pb.BOOK, pb.KIND_UNSET], user_id=7)
+        full.created.FromSeconds(1722400000)
+        results = []
+        for msg in (full, pb.Doc(email="e"), pb.Doc()):
+            doc = models.Doc.from_protobuf(msg)
+            assert models.Doc.from_protobuf(msg, trusted=True) == doc
+            assert doc.to_protobuf() == msg
+            results.append(doc.model_dump(mode="json"))
+        converted[converter] = results
+    assert converted["inline"] == converted["reflect"]
+
+
+def test_unknown_converter_fails_generation(protoc):
+    with pytest.raises(RuntimeError, match="unknown converter 'fast', expected one of reflect, inline"):
+        protoc.generate({"inline_error.proto": 'syntax = "proto3"; package inline_error; message A {}'},
+                        parameter="converter=fast")
+
+
+WKT_PROTO = """
+syntax = "proto3";
+import "google/protobuf/any.proto";
+import "google/protobuf/field_mask.proto";
+import "google/protobuf/struct.proto";
+import "google/protobuf/wrappers.proto";
+package {package};
+
+message Tag {{
+    string name = 1;
+}}
+message Patch {{
+    google.protobuf.Int32Value count = 1;
+    google.protobuf.UInt64Value total = 2;
+    google.protobuf.FloatValue ratio = 3;
+    google.protobuf.StringValue note = 4;
+    google.protobuf.FieldMask mask = 5;
+    google.protobuf.Struct meta = 6;
+    google.protobuf.ListValue values = 7;
+    google.protobuf.Value value = 8;
+    google.protobuf.Any detail = 9;
+    map<string, google.protobuf.Any> extras = 10;
+    repeated google.protobuf.Any details = 11;
+    repeated google.protobuf.Int64Value ids = 12;
+}}
+"""
+
+
+@pytest.mark.parametrize("converter", ["reflect", "inline"])
+def test_well_known_types(protoc, converter):
+    package = f"wkt_{converter}"
+    sources = {f"{package}.proto": WKT_PROTO.format(package=package)}
+    code = protoc.generate(sources, parameter=f"converter={converter}")[f"{package}_model.py"]
+    for annotation in ("count: Optional[int]", "total: Optional[int]", "ratio: Optional[float]",
+                       "note: Optional[str]", "mask: Optional[List[str]]", "meta: Optional[Dict[str, Any]]",
+                       "values: Optional[List[Any]]", "value: Optional[Any]", "detail: Optional[Any]",
+                       "extras: Optional[Dict[str, Any]]", "details: Optional[List[Any]]", "ids: Optional[List[int]]"):
+        assert annotation in code, annotation
+    # 知名类型不生成模型, 也不导入不存在的 *_model 模块
+    assert "_model import" not in code and "class Int32Value(" not in code
+    assert "json_format" not in code
+
+    models = protoc.load(sources, f"{package}_model", parameter=f"converter={converter}")
+    pb = importlib.import_module(f"{package}_pb2")
+    msg = pb.Patch(mask=FieldMask(paths=["a.b", "c"]), extras={"t": ext.pack_any(pb.Tag(name="x"))},
+                   details=[ext.pack_any(pb.Tag(name="y"))], ids=[Int64Value(value=1 << 40), Int64Value()])
+    msg.count.value = 0
+    msg.total.value = (1 << 64) - 1
+    msg.ratio.value = 0.5
+    msg.meta.update({"n": 1, "list": [True, None]})
+    msg.values.extend(["s", 2])
+    msg.value.bool_value = False
+    msg.detail.Pack(pb.Tag(name="z"))
+    patch = models.Patch.from_protobuf(msg)
+    # 设置为默认值的包装类型不是 None, 未设置的是 None
+    assert (patch.count, patch.total, patch.ratio, patch.note) == (0, (1 << 64) - 1, 0.5, None)
+    assert patch.mask == ["a.b", "c"] and patch.ids == [1 << 40, 0]
+    assert (patch.meta, patch.values, patch.value) == ({"n": 1, "list": [True, None]}, ["s", 2], False)
+    tag = f"type.googleapis.com/{package}.Tag"
+    assert patch.detail == {"@type": tag, "name": "z"}
+    assert patch.extras == {"t": {"@type": tag, "name": "x"}} and patch.details == [{"@type": tag, "name": "y"}]
+    for name in ("detail", "extras", "details"):
+        assert getattr(patch, name) == MessageToDict(msg, preserving_proto_field_name=True)[name], name
+    assert models.Patch.from_protobuf(msg, trusted=True) == patch
+    assert patch.to_protobuf() == msg
+    # Any 字段也可以直接赋值为消息或模型
+    fields = dict.fromkeys(models.Patch.model_fields, None)
+    fields.update(detail=pb.Tag(name="m"), extras={"t": models.Tag(name="n")}, details=[], ids=[])
+    written = models.Patch(**fields).to_protobuf()
+    assert ext.unpack_any(written.detail) == pb.Tag(name="m")
+    assert ext.unpack_any(written.extras["t"]) == pb.Tag(name="n")
+    assert not written.HasField("count") and not written.HasField("mask")
+
+
+def make_sources(prefix, count):
+    """count 个互相独立的 proto 文件, 每个文件一个消息"""
+    source = 'syntax = "proto3"; package {prefix}.p{i}; message M{i} {{ string a = 1; int32 b = 2; }}'
+    return {f"{prefix}_{i}.proto": source.format(prefix=prefix, i=i) for i in range(count)}
+
+
+def test_jobs_output_matches_serial(protoc):
+    sources = make_sources("jobs", 6)
+    serial = protoc.generate(sources, parameter="jobs=1")
+    # formatter 不为 none 时才会启动进程池
+    parallel = protoc.generate(sources, parameter="jobs=3,formatter=autopep8")
+    assert list(parallel) == list(serial) == [f"jobs_{i}_model.py" for i in range(6)]
+    assert parallel == serial
+    assert protoc.generate(sources, parameter="jobs=auto") == serial
+    with pytest.raises(RuntimeError, match="invalid jobs 'many', expected auto or a number of processes"):
+        protoc.generate(sources, parameter="jobs=many")
+
+
+def test_get_jobs():
+    assert get_jobs("auto", 100, "none") == 1
+    assert get_jobs("auto", 1, "autopep8") == 1
+    assert get_jobs("8", 3) == 3
+    assert get_jobs("0", 3) == 1
+
+
+DEPS_SOURCES = {
+    "deps_a.proto": 'syntax = "proto3"; package deps.a; message A { string name = 1; }',
+    "deps_b.proto": 'syntax = "proto3"; import "deps_a.proto"; package deps.b; message B { deps.a.A a = 1; }',
+    "deps_c.proto": '''
+syntax = "proto3";
+import "google/protobuf/timestamp.proto";
+import "protobuf_pydantic_gen/pydantic.proto";
+import "deps_b.proto";
+package deps.c;
+message C {
+    deps.b.B b = 1 [(pydantic.field) = {description: "b"}];
+    google.protobuf.Timestamp at = 2 [(pydantic.field) = {description: "at"}];
+}
+''',
+}
+
+
+def test_only_files_to_generate(protoc):
+    # 依赖只用于解析类型, 生成的代码从依赖的模块导入
+    outputs = protoc.generate(DEPS_SOURCES, files=["deps_c.proto"])
+    assert list(outputs) == ["deps_c_model.py"]
+    assert "\nfrom .deps_b_model import B\n" in outputs["deps_c_model.py"]
+    assert "b: Optional[B]" in outputs["deps_c_model.py"]
+    request = protoc.request(DEPS_SOURCES, files=["deps_c.proto"])
+    assert get_files_to_generate(request) == {"deps_c.proto"}
+    assert get_files_to_generate(request, dependencies=True) >= {"deps_a.proto", "deps_b.proto", "deps_c.proto"}
+
+
+def test_dependencies_generates_transitive_closure(protoc):
+    outputs = protoc.generate(DEPS_SOURCES, files=["deps_c.proto"], parameter="dependencies=true")
+    # google/protobuf 和 pydantic.proto 不生成
+    assert sorted(outputs) == ["deps_a_model.py", "deps_b_model.py", "deps_c_model.py"]
+    # 与把依赖也传给 protoc 时生成的结果相同
+    assert outputs == protoc.generate(DEPS_SOURCES)
+    assert "\nfrom .deps_a_model import A\n" in outputs["deps_b_model.py"]
+
+
+FORMAT_PROTO = '''
+syntax = "proto3";
+import "protobuf_pydantic_gen/pydantic.proto";
+package format_test;
+
+enum Kind {
+    KIND_UNSET = 0;
+    BOOK = 1;
+}
+message Part {
+    string name = 1 [(pydantic.field) = {description: "a long description of the name field that has to be wrapped",
+                                         example: "'abc'", max_length: 128, min_length: 1}];
+}
+message FormatTaskWithAVeryLongMessageName {
+    option (pydantic.database) = {
+        as_table: true,
+        table_name: "format_tasks_with_a_very_long_table_name",
+        compound_index: {indexs: ["title", "kind"], index_type: "UNIQUE", name: "uq_format_tasks_title_and_kind"}
+    };
+    int64 id = 1 [(pydantic.field) = {primary_key: true, description: "primary key with a long description to wrap"}];
+    string title = 2 [(pydantic.field) = {description: "title", max_length: 256, index: true, example: "'a title'"}];
+    Kind kind = 3 [(pydantic.field) = {sa_column_type: "Enum(Kind)", description: "kind of the task"}];
+    map<string, Part> parts_by_a_rather_long_field_name = 4 [(pydantic.field) = {description: "parts"}];
+}
+'''
+
+
+@pytest.mark.parametrize("converter", ["reflect", "inline"])
+def test_unformatted_output_passes_flake8(protoc, tmp_path, converter):
+    pytest.importorskip("flake8")
+    sources = {"format_test.proto": FORMAT_PROTO}
+    parameter = f"converter={converter}"
+    code = protoc.generate(sources, parameter=parameter)["format_test_model.py"]
+    # 不格式化时输出就是排版好的代码, 与 autopep8 的结果相同, 多次生成结果一致
+    assert protoc.generate(sources, parameter=f"{parameter},formatter=autopep8")["format_test_model.py"] == code
+    assert protoc.generate(sources, parameter=parameter)["format_test_model.py"] == code
+    path = tmp_path / "format_test_model.py"
+    path.write_text(code, encoding="utf-8")
+    result = subprocess.run([sys.executable, "-m", "flake8", "--max-line-length", "120", str(path)],
+                            capture_output=True, text=True)
+    assert result.returncode == 0, result.stdout
+
+
+def test_external_formatter(protoc):
+    sources = {"format_test.proto": FORMAT_PROTO}
+    code = protoc.generate(sources)["format_test_model.py"]
+    # formatter 为命令时从 stdin 读取代码, 输出写到 stdout
+    assert protoc.generate(sources, parameter="formatter=cat")["format_test_model.py"] == code
+    upper = f"formatter={sys.executable} -c 'import sys; sys.stdout.write(sys.stdin.read().upper())'"
+    assert protoc.generate(sources, parameter=upper)["format_test_model.py"] == code.upper()
+    with pytest.raises(RuntimeError, match="formatter 'false' failed"):
+        protoc.generate(sources, parameter="formatter=false")
+    with pytest.raises(RuntimeError, match="formatter 'no-such-formatter' failed"):
+        protoc.generate(sources, parameter="formatter=no-such-formatter")
+
+
+LAZY_SOURCES = {
+    "lazy_a.proto": 'syntax = "proto3"; package lazy.a; message A { string name = 1; }',
+    "lazy_b.proto": '''
+syntax = "proto3";
+import "lazy_a.proto";
+package lazy.b;
+message B {
+    lazy.a.A a = 1;
+    repeated lazy.a.A items = 2;
+    map<string, lazy.a.A> by_name = 3;
+}
+''',
+    "lazy_c.proto": 'syntax = "proto3"; package lazy.c; message C { string id = 1; }',
+}
+
+# 在子进程中检查 sys.modules, 参数为生成的包名
+LAZY_SCRIPT = '''
+import sys
+package = sys.argv[1]
+
+def loaded():
+    return sorted(name[len(package) + 1:] for name in sys.modules if name.startswith(package + "."))
+
+models = __import__(package)
+assert loaded() == [], loaded()
+B = models.B
+assert loaded() == ["lazy_b_model"], loaded()
+
+import lazy_b_pb2
+import lazy_a_pb2
+msg = lazy_b_pb2.B(a=lazy_a_pb2.A(name="a"), items=[lazy_a_pb2.A(name="i")], by_name={"k": lazy_a_pb2.A()})
+b = B.from_protobuf(msg)
+assert loaded() == ["lazy_a_model", "lazy_b_model"], loaded()
+assert type(b.a) is models.A and [type(item) for item in b.items] == [models.A]
+assert b.to_protobuf() == msg
+assert B(a=models.A(name="x"), items=[], by_name={}).to_protobuf() == lazy_b_pb2.B(a=lazy_a_pb2.A(name="x"))
+assert "C" in dir(models) and "lazy_c_model" not in loaded()
+try:
+    models.Missing
+except AttributeError:
+    pass
+else:
+    raise AssertionError("Missing should not be exported")
+'''
+
+
+@pytest.mark.parametrize("converter", ["reflect", "inline"])
+def test_lazy_package_imports_on_demand(protoc, tmp_path, converter):
+    outputs = protoc.generate(LAZY_SOURCES, parameter=f"lazy=true,converter={converter}")
+    assert "def __getattr__(name: str):" in outputs["__init__.py"]
+    assert '"A": ".lazy_a_model"' in outputs["lazy_b_model.py"]
+    assert "\nfrom .lazy_a_model import A\n" not in outputs["lazy_b_model.py"]
+    package = f"lazy_{converter}"
+    os.makedirs(tmp_path / package)
+    for name, code in outputs.items():
+        (tmp_path / package / name).write_text(code, encoding="utf-8")
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([str(tmp_path), protoc.pb_dir, ROOT]))
+    result = subprocess.run([sys.executable, "-c", LAZY_SCRIPT, package], cwd=tmp_path, env=env,
+                            capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+
+def test_without_lazy_imports_eagerly(protoc):
+    outputs = protoc.generate(LAZY_SOURCES)
+    assert "__init__.py" not in outputs
+    assert "\nfrom .lazy_a_model import A\n" in outputs["lazy_b_model.py"]
+    assert "model_rebuild" not in outputs["lazy_b_model.py"]
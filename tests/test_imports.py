@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+'''
+@File    :   test_imports.py
+@Time    :   2024/08/01 10:14:36
+@Desc    :   只用非表模型时不导入 sqlmodel/SQLAlchemy, 表模型和 orm 才导入; 在子进程中检查 sys.modules
+'''
+
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PLAIN_SCRIPT = '''
+import sys
+import example2_pb2
+import example3_pb2
+from models.constant_model import ExampleType
+from models.example2_model import Example2
+from models.example3_model import Example3
+from protobuf_pydantic_gen import ext
+
+assert Example3.from_protobuf(Example3(name="x").to_protobuf()) == Example3(name="x")
+models = [Example2(type=ExampleType.TYPE2)]
+assert ext.protobufs_to_models(Example2, ext.models_to_protobufs(models, example2_pb2.Example2)) == models
+assert ext.unpack_any(ext.pack_any(Example3(name="y"))) == example3_pb2.Example3(name="y")
+print(sorted(name for name in sys.modules if name.split(".")[0] in ("sqlmodel", "sqlalchemy")))
+'''
+
+TABLE_SCRIPT = '''
+import sys
+from protobuf_pydantic_gen import ext
+assert "sqlmodel" not in sys.modules
+from models.example_model import Example
+assert "sqlmodel" in sys.modules and "protobuf_pydantic_gen.orm" in sys.modules
+# 旧版本生成的表模型从 ext 导入 PySQLModel
+from protobuf_pydantic_gen.ext import PySQLModel
+from protobuf_pydantic_gen.orm import PySQLModel as OrmPySQLModel
+assert PySQLModel is OrmPySQLModel
+'''
+
+
+def run_script(script: str) -> str:
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([ROOT, os.path.join(ROOT, "pb")]))
+    result = subprocess.run([sys.executable, "-c", script], cwd=ROOT, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    return result.stdout.strip()
+
+
+def test_plain_models_do_not_import_sqlmodel():
+    assert run_script(PLAIN_SCRIPT) == "[]"
+
+
+def test_table_models_import_sqlmodel():
+    run_script(TABLE_SCRIPT)
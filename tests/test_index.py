@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+'''
+@File    :   test_index.py
+@Time    :   2024/07/30 10:21:36
+@Desc    :   compound_index 生成的 Index(...): 默认索引名, 部分索引和覆盖列的 DDL, SQLite 的查询计划;
+             非表模型不生成列参数
+'''
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.schema import CreateIndex
+
+INDEX_PROTO = '''
+syntax = "proto3";
+import "protobuf_pydantic_gen/pydantic.proto";
+package index_test;
+
+message Tag {
+    string name = 1 [(pydantic.field) = {primary_key: true, index: true, unique: true, nullable: true}];
+}
+message IndexTask {
+    option (pydantic.database) = {
+        as_table: true,
+        compound_index: {indexs: ["status"], index_type: "INDEX"},
+        compound_index: {indexs: ["score"], index_type: "INDEX", where: "status = 'open'", include: ["status"]},
+        compound_index: {indexs: ["owner"], index_type: "UNIQUE", where: "status = 'open'", name: "uq_open_owner"}
+    };
+    int64 id = 1 [(pydantic.field) = {primary_key: true}];
+    string status = 2;
+    int32 score = 3;
+    string owner = 4;
+}
+message IndexJob {
+    option (pydantic.database) = {
+        as_table: true,
+        compound_index: {indexs: ["status"], index_type: "INDEX"}
+    };
+    int64 id = 1 [(pydantic.field) = {primary_key: true}];
+    string status = 2;
+}
+'''
+
+
+@pytest.fixture(scope="module")
+def index_models(make_protoc):
+    protoc = make_protoc("index_test")
+    sources = {"index_test.proto": INDEX_PROTO}
+    code = protoc.generate(sources)["index_test_model.py"]
+    return code, protoc.load(sources, "index_test_model")
+
+
+@pytest.fixture
+def engine(index_models):
+    _, models = index_models
+    engine = create_engine("sqlite://")
+    tables = [models.IndexTask.__table__, models.IndexJob.__table__]
+    models.IndexTask.metadata.create_all(engine, tables=tables)
+    yield engine
+    engine.dispose()
+
+
+def get_index(model, name):
+    return next(index for index in model.__table__.indexes if index.name == name)
+
+
+def test_default_index_name_uses_table_name(index_models, engine):
+    # 之前没有 table_name 时默认名是 ix_status, 两个表的索引重名, create_all 失败
+    _, models = index_models
+    assert models.IndexTask.__tablename__ == "index_task"
+    assert {index.name for index in models.IndexTask.__table__.indexes} == {
+        "ix_index_task_status", "ix_index_task_score", "uq_open_owner"}
+    assert {index.name for index in models.IndexJob.__table__.indexes} == {"ix_index_job_status"}
+    with engine.connect() as conn:
+        names = conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'")).scalars().all()
+    assert {"ix_index_task_status", "ix_index_job_status", "ix_index_task_score", "uq_open_owner"} <= set(names)
+
+
+def test_partial_index_ddl(index_models):
+    _, models = index_models
+    score = get_index(models.IndexTask, "ix_index_task_score")
+    assert str(CreateIndex(score).compile(dialect=sqlite.dialect())) == (
+        "CREATE INDEX ix_index_task_score ON index_task (score) WHERE status = 'open'")
+    assert str(CreateIndex(score).compile(dialect=postgresql.dialect())) == (
+        "CREATE INDEX ix_index_task_score ON index_task (score) INCLUDE (status) WHERE status = 'open'")
+    owner = get_index(models.IndexTask, "uq_open_owner")
+    assert str(CreateIndex(owner).compile(dialect=sqlite.dialect())) == (
+        "CREATE UNIQUE INDEX uq_open_owner ON index_task (owner) WHERE status = 'open'")
+
+
+def query_plan(engine, sql):
+    with engine.connect() as conn:
+        return " ".join(row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")))
+
+
+def test_sqlite_uses_partial_index(index_models, engine):
+    _, models = index_models
+    # 空表上 ix_index_task_status 与部分索引代价相同, 选择哪个取决于建索引的顺序; 用统计信息让 score 更有选择性
+    with engine.begin() as conn:
+        conn.execute(models.IndexTask.__table__.insert(),
+                     [{"id": i, "status": "open", "score": i, "owner": str(i)} for i in range(200)])
+        conn.execute(text("ANALYZE"))
+    plan = query_plan(engine, "SELECT id FROM index_task WHERE status = 'open' AND score = 5")
+    assert "USING INDEX ix_index_task_score (score=?)" in plan
+    # 条件不蕴含索引的 where 时不能使用部分索引
+    plan = query_plan(engine, "SELECT id FROM index_task WHERE score = 5")
+    assert "ix_index_task_score" not in plan
+
+
+def test_unique_partial_index_only_covers_matching_rows(index_models, engine):
+    _, models = index_models
+    table = models.IndexTask.__table__
+    with engine.begin() as conn:
+        conn.execute(table.insert(), [{"id": 1, "status": "open", "score": 1, "owner": "a"},
+                                      {"id": 2, "status": "done", "score": 1, "owner": "a"}])
+    with pytest.raises(IntegrityError, match="UNIQUE constraint failed"):
+        with engine.begin() as conn:
+            conn.execute(table.insert(), {"id": 3, "status": "open", "score": 1, "owner": "a"})
+
+
+def test_non_table_model_drops_column_args(index_models):
+    code, models = index_models
+    tag = code[code.index("class Tag("):code.index("class IndexTask(")]
+    for key in ("primary_key", "index", "unique", "nullable"):
+        assert f"{key}=" not in tag
+    assert models.Tag.model_json_schema()["properties"]["name"].keys().isdisjoint(
+        {"primary_key", "index", "unique", "nullable"})
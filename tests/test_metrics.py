@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+'''
+@File    :   test_metrics.py
+@Time    :   2024/07/29 11:18:05
+@Desc    :   转换统计: 读取字段(例如嵌套消息转换)失败时也要计入 calls/errors 并触发回调
+'''
+
+import pytest
+
+from protobuf_pydantic_gen import ext
+
+METRICS_PROTO = '''
+syntax = "proto3";
+package metrics_test;
+
+enum Color {
+    COLOR_UNSET = 0;
+    RED = 1;
+}
+message Inner {
+    Color color = 1;
+}
+message Outer {
+    string name = 1;
+    Inner inner = 2;
+}
+'''
+
+
+@pytest.fixture
+def metrics():
+    calls = []
+    ext.reset_metrics()
+    ext.enable_metrics(lambda *args: calls.append(args))
+    yield calls
+    ext.disable_metrics()
+    ext.reset_metrics()
+
+
+@pytest.mark.parametrize("converter", ["reflect", "inline"])
+def test_nested_read_failure_is_recorded(protoc, metrics, converter):
+    models = protoc.load({"metrics_test.proto": METRICS_PROTO}, "metrics_test_model",
+                         parameter=f"converter={converter}")
+    import metrics_test_pb2
+
+    ok = metrics_test_pb2.Outer(name="ok", inner=metrics_test_pb2.Inner(color=1))
+    assert models.Outer.from_protobuf(ok).inner.color == models.Color.RED
+    # proto3 的开放枚举可以携带未声明的值, 嵌套的 Inner 转换失败
+    broken = metrics_test_pb2.Outer(name="broken", inner=metrics_test_pb2.Inner(color=7))
+    with pytest.raises(ValueError):
+        models.Outer.from_protobuf(broken)
+
+    stats = ext.metrics_snapshot()["metrics_test.Outer"][ext.FROM_PROTOBUF]
+    assert (stats["calls"], stats["errors"]) == (2, 1)
+    outer_calls = [call for call in metrics if call[0] == "metrics_test.Outer"]
+    assert [call[-1] for call in outer_calls] == [False, True]
+
+
+def test_to_protobuf_failure_is_recorded(protoc, metrics):
+    models = protoc.load({"metrics_test2.proto": METRICS_PROTO.replace("metrics_test;", "metrics_test2;")},
+                         "metrics_test2_model")
+    import metrics_test2_pb2  # noqa: F401
+
+    model = models.Outer(name="x", inner=models.Inner(color=models.Color.RED))
+    model.name = 1
+    with pytest.raises(TypeError):
+        model.to_protobuf()
+    stats = ext.metrics_snapshot()["metrics_test2.Outer"][ext.TO_PROTOBUF]
+    assert (stats["calls"], stats["errors"]) == (1, 1)
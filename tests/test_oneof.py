@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+'''
+@File    :   test_oneof.py
+@Time    :   2024/07/29 14:36:50
+@Desc    :   oneof 成员: 最多只能设置一个, 设置多个时校验和 to_protobuf 都要报错, 不能静默丢弃数据
+'''
+
+import importlib
+
+import pydantic
+import pytest
+
+from protobuf_pydantic_gen import ext
+
+ONEOF_PROTO = '''
+syntax = "proto3";
+import "protobuf_pydantic_gen/pydantic.proto";
+package {package};
+
+message Item {{
+    string name = 1;
+}}
+message Command {{
+    string id = 1;
+    oneof payload {{
+        string text = 2;
+        int32 num = 3;
+        Item item = 4;
+    }}
+}}
+message CommandRow {{
+    option (pydantic.database) = {{ as_table: true, table_name: "{package}_rows" }};
+    int64 id = 1 [(pydantic.field) = {{primary_key: true}}];
+    oneof payload {{
+        string text = 2;
+        int32 num = 3;
+    }}
+}}
+'''
+
+
+@pytest.fixture(scope="module", params=["reflect", "inline"])
+def oneof_models(make_protoc, request):
+    package = f"oneof_{request.param}"
+    models = make_protoc(package).load({f"{package}.proto": ONEOF_PROTO.format(package=package)},
+                                       f"{package}_model", parameter=f"converter={request.param}")
+    return models, importlib.import_module(f"{package}_pb2")
+
+
+def test_single_member_round_trip(oneof_models):
+    models, pb = oneof_models
+    model = models.Command(id="c", item=models.Item(name="x"))
+    proto = model.to_protobuf()
+    assert proto.WhichOneof("payload") == "item"
+    assert ext.which_one_of(model, "payload") == ("item", models.Item(name="x"))
+    back = models.Command.from_protobuf(proto)
+    assert (back.text, back.num, back.item.name) == (None, None, "x")
+    assert models.Command.from_protobuf(pb.Command(id="c")).item is None
+
+
+def test_validation_rejects_two_members(oneof_models):
+    models, _ = oneof_models
+    with pytest.raises(pydantic.ValidationError, match="more than one member of oneof 'payload' is set: text, num"):
+        models.Command(id="c", text="a", num=1)
+    with pytest.raises(pydantic.ValidationError, match="payload"):
+        models.Command.model_validate({"id": "c", "num": 1, "item": {"name": "x"}})
+
+
+def test_to_protobuf_raises_instead_of_dropping(oneof_models):
+    models, _ = oneof_models
+    # model_construct 和赋值都不经过校验, 写入消息时必须报错
+    model = models.Command.model_construct(id="c", text="a", num=None, item=models.Item(name="x"))
+    with pytest.raises(ValueError, match="text, item"):
+        model.to_protobuf()
+    with pytest.raises(ValueError, match="text, item"):
+        ext.which_one_of(model, "payload")
+
+    model = models.Command(id="c", num=1)
+    model.text = "late"
+    with pytest.raises(ValueError, match="text, num"):
+        model.to_protobuf()
+
+
+def test_table_model_to_protobuf_raises(oneof_models):
+    models, pb = oneof_models
+    # sqlmodel 的表模型 __init__ 不做校验
+    row = models.CommandRow(id=1, text="a", num=2)
+    with pytest.raises(ValueError, match="CommandRow: more than one member of oneof 'payload' is set: text, num"):
+        row.to_protobuf()
+    assert models.CommandRow(id=1, num=2).to_protobuf() == pb.CommandRow(id=1, num=2)
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+'''
+@File    :   test_orm.py
+@Time    :   2024/07/30 14:52:10
+@Desc    :   orm 中绕过 ORM 实例的流式查询: stream_query_to_protobufs 和 stream_query_pages, 在 SQLite 上验证;
+             测试数据用 bulk_insert 写入
+'''
+
+import datetime
+import importlib
+
+import pytest
+from google.protobuf.timestamp_pb2 import Timestamp
+from sqlalchemy import select
+from sqlmodel import Session, create_engine
+
+from protobuf_pydantic_gen import orm
+
+ORM_PROTO = '''
+syntax = "proto3";
+import "google/protobuf/timestamp.proto";
+import "protobuf_pydantic_gen/pydantic.proto";
+package orm_test;
+
+enum Status {
+    STATUS_UNSET = 0;
+    OPEN = 1;
+    DONE = 2;
+}
+message Note {
+    string text = 1;
+}
+message Task {
+    option (pydantic.database) = { as_table: true, table_name: "orm_tasks" };
+    int64 id = 1 [(pydantic.field) = {primary_key: true}];
+    string title = 2;
+    optional int32 priority = 3;
+    Status status = 4 [(pydantic.field) = {sa_column_type: "Enum(Status)"}];
+    Note note = 5 [(pydantic.field) = {sa_column_type: "JSON"}];
+    google.protobuf.Timestamp due = 6;
+    oneof target {
+        string email = 7;
+        int64 user_id = 8;
+    }
+}
+message ListTasksResponse {
+    repeated Task items = 1;
+}
+'''
+
+DUE = datetime.datetime(2024, 7, 30, 12, 0, 0)
+
+
+@pytest.fixture(scope="module")
+def orm_models(make_protoc):
+    models = make_protoc("orm_test").load({"orm_test.proto": ORM_PROTO}, "orm_test_model")
+    return models, importlib.import_module("orm_test_pb2")
+
+
+@pytest.fixture
+def engine(orm_models):
+    models, _ = orm_models
+    engine = create_engine("sqlite://")
+    models.Task.metadata.create_all(engine, tables=[models.Task.__table__])
+    yield engine
+    engine.dispose()
+
+
+def make_tasks(pb, count):
+    tasks = []
+    for i in range(1, count + 1):
+        due = Timestamp()
+        due.FromDatetime(DUE + datetime.timedelta(days=i))
+        task = pb.Task(id=i, title=f"task {i}", status=pb.OPEN if i % 2 else pb.DONE,
+                       note=pb.Note(text=f"note {i}"), due=due)
+        if i % 2:
+            task.priority = i
+            task.email = f"{i}@example.com"
+        else:
+            task.user_id = i * 10
+        tasks.append(task)
+    return tasks
+
+
+@pytest.mark.parametrize("yield_per", [1, 2, 1000])
+def test_stream_query_to_protobufs(orm_models, engine, yield_per):
+    models, pb = orm_models
+    tasks = make_tasks(pb, 5)
+    with Session(engine) as session:
+        orm.bulk_insert(session, models.Task, tasks)
+        session.commit()
+        statement = select(models.Task).where(models.Task.id > 1).order_by(models.Task.id.desc()).limit(3)
+        streamed = list(orm.stream_query_to_protobufs(session, statement, pb.Task, yield_per=yield_per))
+    # NULL 列不设置字段, 与写入前的消息相同(包括 optional 和 oneof 的 presence)
+    assert streamed == tasks[4:1:-1]
+    assert [msg.WhichOneof("target") for msg in streamed] == ["email", "user_id", "email"]
+    assert not streamed[1].HasField("priority")
+
+
+def test_stream_query_pages(orm_models, engine):
+    models, pb = orm_models
+    tasks = make_tasks(pb, 5)
+    with Session(engine) as session:
+        orm.bulk_insert(session, models.Task, tasks)
+        session.commit()
+        statement = select(models.Task).order_by(models.Task.id)
+        pages = list(orm.stream_query_pages(session, statement, pb.ListTasksResponse, "items", page_size=2,
+                                            yield_per=3))
+        assert [len(page.items) for page in pages] == [2, 2, 1]
+        assert [item for page in pages for item in page.items] == tasks
+        empty = select(models.Task).where(models.Task.id > 100)
+        assert list(orm.stream_query_pages(session, empty, pb.ListTasksResponse, "items")) == []
+
+
+def test_stream_query_requires_table_model(orm_models, engine):
+    models, pb = orm_models
+    with Session(engine) as session:
+        with pytest.raises(ValueError, match="statement must select a table model"):
+            list(orm.stream_query_to_protobufs(session, select(models.Task.id), pb.Task))
+        with pytest.raises(ValueError, match="statement must select a table model"):
+            list(orm.stream_query_pages(session, select(models.Task.title), pb.ListTasksResponse, "items"))
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+'''
+@File    :   test_stream.py
+@Time    :   2024/07/29 10:05:42
+@Desc    :   ext 中异步流式转换的预读任务: 提前关闭, 上游异常和取消
+'''
+
+import asyncio
+
+import pytest
+
+import example2_pb2
+from models.constant_model import ExampleType
+from models.example2_model import Example2
+from protobuf_pydantic_gen.ext import astream_models_to_protobufs, astream_protobufs_to_models
+
+# 测试中的流都应该很快结束, 超时说明消费方在等待永远不会到来的结果
+TIMEOUT = 5
+
+
+def run(coro):
+    # 不用 wait_for: 超时的取消会被测试中预期 CancelledError 的 pytest.raises 吞掉
+    async def main():
+        task = asyncio.ensure_future(coro)
+        done, _ = await asyncio.wait({task}, timeout=TIMEOUT)
+        if not done:
+            task.cancel()
+            pytest.fail(f"stream did not finish within {TIMEOUT}s")
+        return task.result()
+    return asyncio.run(main())
+
+
+async def models(count: int, error: BaseException = None, closed: list = None):
+    try:
+        for i in range(count):
+            yield Example2(type=ExampleType(i % 3 + 1))
+            await asyncio.sleep(0)
+        if error is not None:
+            raise error
+    finally:
+        if closed is not None:
+            closed.append(True)
+
+
+@pytest.mark.parametrize("buffer_size", [0, 1, 64])
+def test_converts_all_items(buffer_size):
+    async def consume():
+        return [msg.type async for msg in astream_models_to_protobufs(models(5), example2_pb2.Example2, buffer_size)]
+
+    assert run(consume()) == [1, 2, 3, 1, 2]
+
+
+@pytest.mark.parametrize("buffer_size", [1, 64])
+def test_early_close_cancels_producer(buffer_size):
+    closed = []
+
+    async def consume():
+        stream = astream_models_to_protobufs(models(100, closed=closed), example2_pb2.Example2, buffer_size)
+        first = await stream.__anext__()
+        await stream.aclose()
+        await asyncio.sleep(0)
+        return first
+
+    assert run(consume()).type == 1
+    assert closed == [True]
+
+
+@pytest.mark.parametrize("buffer_size", [1, 64])
+def test_source_exception_is_raised_after_items(buffer_size):
+    async def consume():
+        items = []
+        with pytest.raises(ValueError, match="broken source"):
+            async for msg in astream_models_to_protobufs(models(3, ValueError("broken source")),
+                                                         example2_pb2.Example2,
+                                                         buffer_size):
+                items.append(msg)
+        return items
+
+    assert len(run(consume())) == 3
+
+
+@pytest.mark.parametrize("buffer_size", [1, 2, 64])
+@pytest.mark.parametrize("count", [0, 3])
+def test_source_cancelled_error_ends_stream(buffer_size, count):
+    # CancelledError 不是 Exception, 预读任务也要把它交给消费方, 而不是让消费方一直等待队列
+    async def consume():
+        items = []
+        with pytest.raises(asyncio.CancelledError):
+            async for msg in astream_models_to_protobufs(models(count, asyncio.CancelledError()),
+                                                         example2_pb2.Example2,
+                                                         buffer_size):
+                items.append(msg)
+        return items
+
+    assert len(run(consume())) == count
+
+
+def test_protobufs_to_models_stream():
+    protos = [Example2(type=ExampleType.TYPE2).to_protobuf() for _ in range(3)]
+
+    async def consume():
+        return [model async for model in astream_protobufs_to_models(Example2, protos, buffer_size=2)]
+
+    assert [model.type for model in run(consume())] == [ExampleType.TYPE2] * 3
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+'''
+@File    :   test_timestamp.py
+@Time    :   2024/08/01 11:02:51
+@Desc    :   Timestamp/Duration 按 seconds/nanos 直接转换: 与 protobuf 自带转换的结果一致, 纳秒截断,
+             set_timestamp_timezone 设置的时区
+'''
+
+import datetime
+import importlib
+
+import pytest
+from google.protobuf.duration_pb2 import Duration
+from google.protobuf.timestamp_pb2 import Timestamp
+
+from protobuf_pydantic_gen import ext
+
+UTC = datetime.timezone.utc
+# 不依赖 tzdata 的固定时区
+SHANGHAI = datetime.timezone(datetime.timedelta(hours=8))
+
+TIME_PROTO = '''
+syntax = "proto3";
+import "google/protobuf/duration.proto";
+import "google/protobuf/timestamp.proto";
+package {package};
+
+message Event {{
+    google.protobuf.Timestamp created = 1;
+    google.protobuf.Duration timeout = 2;
+    repeated google.protobuf.Timestamp history = 3;
+    map<string, google.protobuf.Timestamp> deadlines = 4;
+    repeated google.protobuf.Duration retries = 5;
+}}
+'''
+
+DATETIMES = [
+    datetime.datetime(2024, 7, 31, 8, 30, 0, 123456),
+    datetime.datetime(1970, 1, 1),
+    datetime.datetime(1969, 12, 31, 23, 59, 59, 999999),
+    datetime.datetime(1, 1, 1),
+    datetime.datetime(9999, 12, 31, 23, 59, 59, 999999),
+]
+
+TIMEDELTAS = [
+    datetime.timedelta(0),
+    datetime.timedelta(seconds=1, microseconds=500000),
+    datetime.timedelta(microseconds=-1),
+    datetime.timedelta(days=-2, seconds=5, microseconds=7),
+    datetime.timedelta(days=3650),
+]
+
+
+@pytest.fixture
+def timezone():
+    """测试结束后恢复默认时区"""
+    yield ext.set_timestamp_timezone
+    ext.set_timestamp_timezone(None)
+
+
+@pytest.fixture(scope="module", params=["reflect", "inline"])
+def time_models(make_protoc, request):
+    package = f"time_{request.param}"
+    models = make_protoc(package).load({f"{package}.proto": TIME_PROTO.format(package=package)},
+                                       f"{package}_model", parameter=f"converter={request.param}")
+    return models, importlib.import_module(f"{package}_pb2")
+
+
+@pytest.mark.parametrize("value", DATETIMES)
+def test_timestamp_matches_protobuf(value):
+    ts = Timestamp()
+    ext.fill_timestamp(ts, value)
+    expected = Timestamp()
+    expected.FromDatetime(value)
+    assert ts == expected
+    assert ext.timestamp_to_datetime(expected) == expected.ToDatetime() == value
+    ext.fill_timestamp(ts, value.isoformat())
+    assert ts == expected
+
+
+@pytest.mark.parametrize("value", TIMEDELTAS)
+def test_duration_matches_protobuf(value):
+    duration = Duration()
+    ext.fill_duration(duration, value)
+    expected = Duration()
+    expected.FromTimedelta(value)
+    assert duration == expected
+    assert ext.duration_to_timedelta(expected) == expected.ToTimedelta() == value
+
+
+def test_nanos_are_truncated_towards_zero():
+    assert ext.timestamp_to_datetime(Timestamp(seconds=0, nanos=1999)) == datetime.datetime(1970, 1, 1, 0, 0, 0, 1)
+    assert ext.duration_to_timedelta(Duration(seconds=0, nanos=1999)) == datetime.timedelta(microseconds=1)
+    negative = ext.duration_to_timedelta(Duration(seconds=-1, nanos=-1999))
+    assert negative == datetime.timedelta(seconds=-1, microseconds=-1)
+    duration = Duration()
+    ext.fill_duration(duration, 1.25)
+    assert (duration.seconds, duration.nanos) == (1, 250000000)
+
+
+def test_timezone(timezone):
+    ts = Timestamp(seconds=1722414600)
+    assert ext.get_timestamp_timezone() is None
+    assert ext.timestamp_to_datetime(ts) == datetime.datetime(2024, 7, 31, 8, 30)
+    timezone(SHANGHAI)
+    assert ext.get_timestamp_timezone() is SHANGHAI
+    local = ext.timestamp_to_datetime(ts)
+    assert local.tzinfo is SHANGHAI and local.replace(tzinfo=None) == datetime.datetime(2024, 7, 31, 16, 30)
+    # naive datetime 按设置的时区解释, aware datetime 按自身的时区换算
+    for value in (datetime.datetime(2024, 7, 31, 16, 30), local, datetime.datetime(2024, 7, 31, 8, 30, tzinfo=UTC)):
+        written = Timestamp()
+        ext.fill_timestamp(written, value)
+        assert written == ts, value
+    timezone(None)
+    written = Timestamp()
+    ext.fill_timestamp(written, datetime.datetime(2024, 7, 31, 8, 30))
+    assert written == ts
+
+
+def make_event(pb):
+    event = pb.Event(history=[Timestamp(seconds=1), Timestamp(seconds=-86400, nanos=5000)],
+                     deadlines={"a": Timestamp(seconds=1722414600)},
+                     retries=[Duration(seconds=1), Duration(seconds=-2, nanos=-500000000)])
+    event.created.FromDatetime(datetime.datetime(2024, 7, 31, 8, 30, 0, 123456))
+    event.timeout.FromTimedelta(datetime.timedelta(minutes=5))
+    return event
+
+
+def test_generated_models(time_models, timezone):
+    models, pb = time_models
+    event = make_event(pb)
+    model = models.Event.from_protobuf(event)
+    assert model.created == datetime.datetime(2024, 7, 31, 8, 30, 0, 123456)
+    assert model.timeout == datetime.timedelta(minutes=5)
+    assert model.history == [datetime.datetime(1970, 1, 1, 0, 0, 1), datetime.datetime(1969, 12, 31, 0, 0, 0, 5)]
+    assert model.deadlines == {"a": datetime.datetime(2024, 7, 31, 8, 30)}
+    assert model.retries == [datetime.timedelta(seconds=1), datetime.timedelta(seconds=-2.5)]
+    assert model.to_protobuf() == event
+    timezone(SHANGHAI)
+    local = models.Event.from_protobuf(event)
+    assert local.created.tzinfo is SHANGHAI and local.created == model.created.replace(tzinfo=UTC)
+    assert local.deadlines["a"] == datetime.datetime(2024, 7, 31, 16, 30, tzinfo=SHANGHAI)
+    assert local.to_protobuf() == event
+    # naive datetime 按设置的时区写入
+    naive = models.Event(created=datetime.datetime(2024, 7, 31, 16, 30), timeout=None, history=[], deadlines={},
+                         retries=[])
+    assert naive.to_protobuf().created == Timestamp(seconds=1722414600)
+    assert not naive.to_protobuf().HasField("timeout")
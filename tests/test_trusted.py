@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+'''
+@File    :   test_trusted.py
+@Time    :   2024/07/31 10:12:48
+@Desc    :   trusted=True 跳过校验构造的模型必须与校验构造的模型相同: 别名, 默认值, 嵌套, map 和 repeated 字段
+'''
+
+import datetime
+import importlib
+
+import pytest
+from google.protobuf.timestamp_pb2 import Timestamp
+from pydantic import AliasChoices, BaseModel, ConfigDict, Field
+
+import example_pb2
+from protobuf_pydantic_gen.ext import protobuf2model, protobufs_to_models
+
+TRUSTED_PROTO = '''
+syntax = "proto3";
+import "google/protobuf/timestamp.proto";
+import "protobuf_pydantic_gen/pydantic.proto";
+package {package};
+
+enum Level {{
+    LEVEL_UNSET = 0;
+    LOW = 1;
+    HIGH = 2;
+}}
+message Part {{
+    string name = 1 [(pydantic.field) = {{alias: "part_name", default: "unnamed"}}];
+    int32 size = 2;
+}}
+message Order {{
+    string id = 1;
+    string title = 2 [(pydantic.field) = {{alias: "order_title", default: "untitled"}}];
+    int32 count = 3 [(pydantic.field) = {{default: "7"}}];
+    Level level = 4;
+    Part main = 5;
+    repeated Part parts = 6;
+    map<string, Part> by_name = 7;
+    map<string, int32> totals = 8;
+    repeated Level levels = 9;
+    google.protobuf.Timestamp created = 10;
+    optional string note = 11;
+}}
+'''
+
+
+@pytest.fixture(scope="module", params=["reflect", "inline"])
+def trusted_models(make_protoc, request):
+    package = f"trusted_{request.param}"
+    models = make_protoc(package).load({f"{package}.proto": TRUSTED_PROTO.format(package=package)},
+                                       f"{package}_model", parameter=f"converter={request.param}")
+    return models, importlib.import_module(f"{package}_pb2")
+
+
+def make_orders(pb):
+    created = Timestamp()
+    created.FromDatetime(datetime.datetime(2024, 7, 31, 8, 30))
+    full = pb.Order(id="a", title="first", count=3, level=pb.HIGH, main=pb.Part(name="m", size=1),
+                    parts=[pb.Part(name="p1", size=2), pb.Part(size=3)],
+                    by_name={"x": pb.Part(name="x", size=4)}, totals={"x": 5, "y": 6},
+                    levels=[pb.LOW, pb.HIGH], created=created, note="n")
+    return [full, pb.Order(id="b", main=pb.Part())]
+
+
+def assert_same(trusted, validated):
+    assert trusted == validated
+    assert trusted.model_fields_set == validated.model_fields_set
+    assert trusted.model_dump() == validated.model_dump()
+
+
+def test_trusted_matches_validated(trusted_models):
+    models, pb = trusted_models
+    for msg in make_orders(pb):
+        validated = models.Order.from_protobuf(msg)
+        trusted = models.Order.from_protobuf(msg, trusted=True)
+        assert_same(trusted, validated)
+        assert_same(trusted.main, validated.main)
+        for trusted_part, part in zip(trusted.parts, validated.parts):
+            assert_same(trusted_part, part)
+        assert type(trusted.level) is models.Level and trusted.levels == validated.levels
+
+
+def test_aliased_fields_take_defaults(trusted_models):
+    # 校验时带 alias 的字段不接受字段名, 取默认值; 跳过校验时之前会写入消息中的值
+    models, pb = trusted_models
+    full = make_orders(pb)[0]
+    for trusted in (False, True):
+        order = models.Order.from_protobuf(full, trusted=trusted)
+        assert (order.title, order.count, order.main.name) == ("untitled", 3, "unnamed")
+        assert order.by_name["x"].name == "unnamed"
+        assert (order.parts[0].size, order.totals, order.note) == (2, {"x": 5, "y": 6}, "n")
+        assert "title" not in order.model_fields_set
+
+
+def test_batch_trusted_matches_validated(trusted_models):
+    models, pb = trusted_models
+    orders = make_orders(pb)
+    assert protobufs_to_models(models.Order, orders, trusted=True) == protobufs_to_models(models.Order, orders)
+
+
+class ByName(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+    name: str = Field("default", alias="full_name")
+
+
+class ByChoice(BaseModel):
+    name: str = Field("default", validation_alias=AliasChoices("full_name", "name"))
+
+
+class ByAlias(BaseModel):
+    model_config = ConfigDict(extra="allow")
+    name: str = Field("default", alias="full_name")
+
+
+@pytest.mark.parametrize("model_cls, expected", [(ByName, "x"), (ByChoice, "x"), (ByAlias, "default")])
+def test_alias_config(model_cls, expected):
+    msg = example_pb2.Nested(name="x")
+    trusted = protobuf2model(model_cls, msg, trusted=True)
+    assert trusted.name == expected
+    assert protobuf2model(model_cls, msg).name == expected